@@ -0,0 +1,106 @@
+"""
+FastAPI dependencies for AI Studio.
+
+Services are created once in ``create_app`` and stored on ``app.state``;
+these dependencies hand them to the routes.
+"""
+
+import asyncio
+import contextlib
+from typing import AsyncIterator, Optional
+
+from fastapi import Header, HTTPException, Request
+
+from app.core.deadline import RequestContext
+from app.models.manager import ModelManager
+from app.rag.engine import RAGEngine
+from app.server.admission import AdmissionController
+from app.server.profiling import ProfileStore
+from app.server.traces import TraceStore
+
+
+def get_model_manager(request: Request) -> ModelManager:
+    """Return the application's model manager."""
+    return request.app.state.model_manager
+
+
+def get_rag_engine(request: Request) -> RAGEngine:
+    """Return the application's RAG engine."""
+    return request.app.state.rag_engine
+
+
+def get_admission_controller(request: Request) -> AdmissionController:
+    """Return the application's admission controller."""
+    return request.app.state.admission
+
+
+def get_profile_store(
+    request: Request, x_ais_profile: Optional[str] = Header(default=None)
+) -> ProfileStore:
+    """
+    Return the profile store for the developer profiling endpoints.
+
+    Raises:
+        HTTPException: 404 when profiling is disabled, 403 when a profile
+            token is configured and the ``X-AIS-Profile`` header does not match
+    """
+    store = getattr(request.app.state, "profile_store", None)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    token = request.app.state.config_manager.get().profile_token
+    if token is not None and x_ais_profile != token:
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+    return store
+
+
+def get_trace_store(request: Request) -> TraceStore:
+    """
+    Return the trace store for the developer trace endpoints.
+
+    Raises:
+        HTTPException: 404 when traces are not kept
+    """
+    store = getattr(request.app.state, "trace_store", None)
+    if store is None:
+        raise HTTPException(status_code=404, detail="Trace store is disabled")
+    return store
+
+
+# How often a request's connection is checked for a client disconnect
+DISCONNECT_POLL_INTERVAL = 0.1
+
+
+async def _watch_disconnect(request: Request, context: RequestContext) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    context.cancel("client disconnected")
+
+
+async def get_request_context(
+    request: Request,
+    x_ais_timeout: Optional[float] = Header(default=None, gt=0),
+) -> AsyncIterator[RequestContext]:
+    """
+    Create the deadline and cancellation context of a request.
+
+    The deadline is ``request_timeout`` from the configuration, or the
+    ``X-AIS-Timeout`` header (seconds) if that is shorter. The request is
+    cancelled when the client disconnects. Routes activate the context
+    around the work it should bound. When the trace store is enabled, the
+    trace of a request that recorded any steps or MCP calls is appended to it.
+    """
+    timeout = request.app.state.config_manager.get().request_timeout
+    if x_ais_timeout is not None:
+        timeout = min(timeout, x_ais_timeout)
+    context = RequestContext(timeout)
+    watcher = asyncio.create_task(_watch_disconnect(request, context))
+    try:
+        yield context
+    finally:
+        watcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await watcher
+        store = getattr(request.app.state, "trace_store", None)
+        if store is not None and (context.steps or context.mcp_calls):
+            # Compression and flushed writes stay off the event loop
+            await asyncio.to_thread(store.append, request.url.path, context.trace())
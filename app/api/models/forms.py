@@ -5,7 +5,7 @@ This module contains Pydantic models for FastUI forms used throughout
 the application for user input validation and processing.
 """
 
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -17,6 +17,27 @@ class RAGQueryForm(BaseModel):
         description="List of vector stores to search"
     )
     max_results: int = Field(default=5, ge=1, le=20, description="Maximum results to return")
+    filters: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Metadata values every source must have"
+    )
+
+
+class DocumentUpsert(BaseModel):
+    """One document to insert or replace."""
+    key: str = Field(..., min_length=1, description="Key identifying the document in its store")
+    content: str = Field(..., description="Document text")
+    metadata: Dict[str, Any] = Field(default_factory=dict, description="Document metadata")
+
+
+class UpsertDocumentsForm(BaseModel):
+    """Form model for inserting or replacing documents."""
+    documents: List[DocumentUpsert] = Field(..., min_length=1, description="Documents to write")
+
+
+class DeleteDocumentsForm(BaseModel):
+    """Form model for deleting documents."""
+    keys: List[str] = Field(..., min_length=1, description="Keys of the documents to delete")
 
 
 class ModelTestForm(BaseModel):
@@ -31,16 +31,7 @@ class VectorStoreResult(BaseModel):
     scores: List[float]
     retrieval_time: float
     quality_score: float
-
-
-class RAGResponse(BaseModel):
-    """RAG query response model."""
-    query: str
-    answer: str
-    sources: List[Document]
-    retrieval_metrics: Dict[str, float]
-    execution_time: float
-    vector_store_results: Dict[str, VectorStoreResult]
+    metrics: Dict[str, float] = {}
 
 
 class ExecutionStep(BaseModel):
@@ -71,6 +62,40 @@ class ExecutionTrace(BaseModel):
     success: bool
 
 
+class StoredTrace(BaseModel):
+    """Execution trace of a past request, as kept by the trace store."""
+    timestamp: float
+    path: str
+    trace: ExecutionTrace
+
+
+class TracedMCPCall(MCPCall):
+    """MCP tool call of a past request."""
+    timestamp: float
+    path: str
+
+
+class RAGResponse(BaseModel):
+    """RAG query response model."""
+    query: str
+    answer: str
+    sources: List[Document]
+    retrieval_metrics: Dict[str, float]
+    execution_time: float
+    vector_store_results: Dict[str, VectorStoreResult]
+    partial: bool = False
+    trace: Optional[ExecutionTrace] = None
+
+
+class DocumentUpdateResult(BaseModel):
+    """Result of upserting or deleting documents in a vector store."""
+    store_name: str
+    written: int = 0
+    deleted: int = 0
+    documents: int
+    segments: int
+
+
 class ModelResult(BaseModel):
     """Individual model test result."""
     model_name: str
@@ -100,6 +125,58 @@ class EvaluationResult(BaseModel):
     recommendations: List[str] = []
 
 
+class ProbeResult(BaseModel):
+    """Result of a single health probe."""
+    name: str
+    kind: str
+    healthy: bool
+    latency: float
+    message: str = ""
+
+
+class HealthReport(BaseModel):
+    """Aggregated health check result."""
+    status: str
+    service: str = "AI Studio"
+    version: str
+    checked_at: float
+    probes: List[ProbeResult] = []
+
+
+class ProfileSummary(BaseModel):
+    """A captured request profile as listed by the developer endpoints."""
+    id: int
+    method: str
+    path: str
+    status_code: int
+    trigger: str
+    started_at: float
+    duration: float
+    samples: int
+
+
+class RoleAdmission(BaseModel):
+    """Admission limits, load and queue waits of one role."""
+    role: UserRole
+    limit: int
+    max_queue: Optional[int] = None
+    active: int
+    queued: int
+    admitted: int
+    rejected: int
+    queue_wait_mean: float
+    queue_wait_p50: float
+    queue_wait_p99: float
+    service_time: float
+
+
+class AdmissionReport(BaseModel):
+    """Admission controller state as listed by the developer endpoints."""
+    capacity: int
+    active: int
+    roles: List[RoleAdmission]
+
+
 class APIResponse(BaseModel):
     """Generic API response wrapper."""
     success: bool
@@ -0,0 +1,213 @@
+"""
+API routes for AI Studio.
+
+JSON endpoints for RAG queries, document updates and model comparison, the
+FastUI chat form endpoint used by the user page and the developer profiling,
+trace history and admission endpoints.
+
+The responses are built by our own code from validated models, so routes
+return ``ModelResponse`` objects (see ``app.api.serialization``) and keep
+``response_model`` only for the OpenAPI schema.
+"""
+
+import asyncio
+from typing import Annotated, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from fastui import FastUI
+from fastui.components import Div, Heading, Paragraph
+from fastui.forms import fastui_form
+
+from app.api.dependencies import (
+    get_admission_controller,
+    get_model_manager,
+    get_profile_store,
+    get_rag_engine,
+    get_request_context,
+    get_trace_store,
+)
+from app.api.models.forms import (
+    ChatForm,
+    DeleteDocumentsForm,
+    ModelTestForm,
+    RAGQueryForm,
+    UpsertDocumentsForm,
+)
+from app.api.models.responses import (
+    AdmissionReport,
+    DocumentUpdateResult,
+    ModelComparison,
+    ProfileSummary,
+    RAGResponse,
+    StoredTrace,
+    TracedMCPCall,
+)
+from app.api.serialization import ModelResponse, StreamingModelResponse, fastui_response
+from app.core.deadline import RequestContext
+from app.models.manager import ModelManager
+from app.rag.engine import RAGEngine
+from app.server.admission import AdmissionController
+from app.server.profiling import ProfileStore
+from app.server.traces import TraceStore
+
+router = APIRouter()
+
+
+@router.post("/api/rag/query", response_model=RAGResponse)
+async def rag_query(
+    form: RAGQueryForm,
+    engine: RAGEngine = Depends(get_rag_engine),
+    context: RequestContext = Depends(get_request_context),
+) -> ModelResponse:
+    """Execute a RAG query across the selected vector stores."""
+    try:
+        with context.activate():
+            return ModelResponse(
+                await engine.query(
+                    form.query, form.vector_stores, form.max_results, filters=form.filters
+                )
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+@router.put("/api/rag/stores/{store_name}/documents", response_model=DocumentUpdateResult)
+async def upsert_documents(
+    store_name: str, form: UpsertDocumentsForm, engine: RAGEngine = Depends(get_rag_engine)
+) -> ModelResponse:
+    """Insert or replace documents of an updatable vector store by key."""
+    try:
+        return ModelResponse(
+            await engine.upsert_documents(
+                store_name,
+                [document.key for document in form.documents],
+                [document.content for document in form.documents],
+                [document.metadata for document in form.documents],
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+
+@router.post("/api/rag/stores/{store_name}/documents/delete", response_model=DocumentUpdateResult)
+async def delete_documents(
+    store_name: str, form: DeleteDocumentsForm, engine: RAGEngine = Depends(get_rag_engine)
+) -> ModelResponse:
+    """Delete documents of an updatable vector store by key."""
+    try:
+        return ModelResponse(await engine.delete_documents(store_name, form.keys))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e)) from e
+
+
+@router.post("/api/models/test", response_model=ModelComparison)
+async def test_models(
+    form: ModelTestForm,
+    manager: ModelManager = Depends(get_model_manager),
+    context: RequestContext = Depends(get_request_context),
+) -> ModelResponse:
+    """Run the same query on several models and compare the results."""
+    with context.activate():
+        return ModelResponse(
+            await manager.test_models(
+                form.query, form.models, temperature=form.temperature, max_tokens=form.max_tokens
+            )
+        )
+
+
+@router.post("/api/chat", response_model=FastUI, response_model_exclude_none=True)
+async def chat(
+    form: Annotated[ChatForm, fastui_form(ChatForm)],
+    engine: RAGEngine = Depends(get_rag_engine),
+    context: RequestContext = Depends(get_request_context),
+) -> ModelResponse:
+    """Answer a chat message from the user page form."""
+    try:
+        with context.activate():
+            response = await engine.query(form.message)
+    except ValueError as e:
+        return fastui_response([Paragraph(text=f"⚠️ {e}", class_name="text-danger")])
+
+    return fastui_response([
+        Div(
+            components=[
+                Heading(text="Answer", level=4),
+                Paragraph(text=response.answer),
+                Paragraph(
+                    text=f"{len(response.sources)} sources · {response.execution_time:.2f}s"
+                    + (" · cut short by the time limit" if response.partial else ""),
+                    class_name="text-muted",
+                ),
+            ],
+            class_name="my-3",
+        )
+    ])
+
+
+@router.get("/api/developer/profiles", response_model=List[ProfileSummary])
+async def list_profiles(store: ProfileStore = Depends(get_profile_store)) -> StreamingModelResponse:
+    """List the captured request profiles, newest first."""
+    return StreamingModelResponse(store.list())
+
+
+@router.get("/api/developer/profiles/{profile_id}")
+async def download_profile(
+    profile_id: int,
+    format: str = Query("speedscope", pattern="^(speedscope|folded)$"),
+    store: ProfileStore = Depends(get_profile_store),
+) -> Response:
+    """Download a profile as a speedscope file or as folded stacks for flamegraphs."""
+    profile = store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    if format == "folded":
+        return PlainTextResponse(
+            profile.to_folded(),
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'},
+        )
+    return JSONResponse(
+        profile.to_speedscope(),
+        headers={
+            "Content-Disposition": f'attachment; filename="profile-{profile_id}.speedscope.json"'
+        },
+    )
+
+
+@router.get("/api/developer/traces", response_model=List[StoredTrace])
+async def list_traces(
+    since: Optional[float] = Query(None, description="Earliest finish time (epoch seconds)"),
+    until: Optional[float] = Query(None, description="Latest finish time (epoch seconds)"),
+    tool: Optional[str] = Query(None, description="Only traces that called this MCP tool"),
+    success: Optional[bool] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    store: TraceStore = Depends(get_trace_store),
+) -> StreamingModelResponse:
+    """List stored request traces, newest first."""
+    traces = await asyncio.to_thread(store.query, since, until, tool, success, limit)
+    return StreamingModelResponse(traces)
+
+
+@router.get("/api/developer/traces/slowest-calls", response_model=List[TracedMCPCall])
+async def slowest_mcp_calls(
+    tool: str,
+    since: Optional[float] = Query(None, description="Earliest finish time (epoch seconds)"),
+    until: Optional[float] = Query(None, description="Latest finish time (epoch seconds)"),
+    limit: int = Query(10, ge=1, le=1000),
+    store: TraceStore = Depends(get_trace_store),
+) -> StreamingModelResponse:
+    """List the slowest stored calls of an MCP tool."""
+    calls = await asyncio.to_thread(store.slowest_calls, tool, since, until, limit)
+    return StreamingModelResponse(calls)
+
+
+@router.get("/api/developer/admission", response_model=AdmissionReport)
+async def admission_status(
+    controller: AdmissionController = Depends(get_admission_controller),
+) -> ModelResponse:
+    """Show running and queued requests and queue-wait times per role."""
+    return ModelResponse(controller.report())
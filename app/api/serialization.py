@@ -0,0 +1,102 @@
+"""
+Fast JSON responses for models the application built itself.
+
+Routes declared with ``response_model`` make FastAPI validate the returned
+value against the model again and then serialise it. For FastUI component
+trees, ``RAGResponse`` and ``ModelComparison`` the value was already built
+from validated models by our own code, so that second pass is wasted work.
+Returning a ``ModelResponse`` bypasses it: FastAPI passes ``Response``
+instances through untouched, and pydantic-core serialises the models
+straight to bytes. Keep ``response_model`` on the route for the OpenAPI
+schema.
+
+Only return these for trusted internal values; anything that came from a
+client or an upstream service still belongs behind ``response_model``.
+"""
+
+from typing import Any, Iterable, Iterator, List, Mapping, Optional
+
+import pydantic_core
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
+
+
+def dump_json(content: Any, exclude_none: bool = False) -> bytes:
+    """Serialise models (or containers of models) to JSON bytes by alias."""
+    return pydantic_core.to_json(content, by_alias=True, exclude_none=exclude_none)
+
+
+class ModelResponse(Response):
+    """JSON response rendering pydantic models without re-validating them."""
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        exclude_none: bool = False,
+        background: Optional[BackgroundTask] = None,
+    ):
+        # render() runs inside Response.__init__, so set options first
+        self.exclude_none = exclude_none
+        super().__init__(content, status_code, headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(content, exclude_none=self.exclude_none)
+
+
+def iter_json_array(items: Iterable[Any], chunk_size: int = 256, exclude_none: bool = False) -> Iterator[bytes]:
+    """
+    Serialise ``items`` as a JSON array, ``chunk_size`` items per chunk.
+
+    Args:
+        items: Models or plain values; may be a lazy iterator
+        chunk_size: Items serialised per yielded chunk
+        exclude_none: Drop fields that are None
+
+    Yields:
+        bytes: Consecutive pieces of the array
+    """
+    yield b"["
+    first = True
+    chunk: List[Any] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield (b"" if first else b",") + dump_json(chunk, exclude_none)[1:-1]
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + dump_json(chunk, exclude_none)[1:-1]
+    yield b"]"
+
+
+class StreamingModelResponse(StreamingResponse):
+    """
+    JSON array response streamed in chunks.
+
+    Large result lists are sent as they are serialised instead of being
+    rendered into one buffer first.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[Any],
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        chunk_size: int = 256,
+        exclude_none: bool = False,
+    ):
+        super().__init__(
+            iter_json_array(items, chunk_size, exclude_none),
+            status_code=status_code,
+            headers=headers,
+            media_type="application/json",
+        )
+
+
+def fastui_response(components: List[Any]) -> ModelResponse:
+    """Render a FastUI component list the way ``response_model=FastUI`` would."""
+    return ModelResponse(components, exclude_none=True)
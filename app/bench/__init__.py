@@ -0,0 +1 @@
+"""Benchmark suites for AI Studio (`ais bench`)"""
@@ -0,0 +1,329 @@
+"""
+Retrieval quality and latency benchmarks for vector store configurations.
+
+The harness builds every index configuration over the same corpus, runs the
+same labelled queries against each one and measures recall@k, MRR, query
+latency percentiles, build time and memory footprint. Results convert to
+``VectorStoreResult`` so they feed the developer "Vector Store Comparison"
+chart directly.
+"""
+
+import json
+import random
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from app.api.models.responses import VectorStoreResult
+from app.bench.corpus import generate_corpus
+from app.rag.embeddings import Embedder, HashingEmbedder, tokenize
+from app.rag.sharded import SearchPool, ShardedVectorStore
+from app.rag.vector_stores import FlatVectorStore, QuantizedVectorStore, VectorStore
+
+
+class LabelledQuery(BaseModel):
+    """A query with the ids of the documents that answer it."""
+    text: str
+    relevant_ids: List[int]
+
+
+class RetrievalDataset(BaseModel):
+    """Corpus plus labelled queries."""
+    texts: List[str]
+    metadatas: List[Dict[str, Any]]
+    queries: List[LabelledQuery]
+
+
+class IndexConfig(BaseModel):
+    """An index configuration to benchmark."""
+    name: str
+    index_type: str = "flat"
+    embedding_dim: int = 256
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class RetrievalBenchmarkResult(BaseModel):
+    """Measured quality and cost of one index configuration."""
+    name: str
+    index_type: str
+    documents: int
+    queries: int
+    k: int
+    recall_at_k: float
+    mrr: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    qps: float
+    build_time: float
+    index_bytes: int
+    build_peak_bytes: int
+
+    def to_vector_store_result(self) -> VectorStoreResult:
+        """Express the result as a ``VectorStoreResult`` for the developer views."""
+        return VectorStoreResult(
+            store_name=self.name,
+            documents=[],
+            scores=[],
+            retrieval_time=self.p50_ms / 1000,
+            quality_score=self.recall_at_k,
+            metrics={
+                f"recall@{self.k}": self.recall_at_k,
+                "mrr": self.mrr,
+                "p50_ms": self.p50_ms,
+                "p95_ms": self.p95_ms,
+                "p99_ms": self.p99_ms,
+                "qps": self.qps,
+                "build_time": self.build_time,
+                "index_bytes": float(self.index_bytes),
+                "build_peak_bytes": float(self.build_peak_bytes),
+            },
+        )
+
+
+IndexBuilder = Callable[[str, Sequence[str], Sequence[Dict[str, Any]], Embedder, Dict[str, Any]], VectorStore]
+
+# Index type -> function building a store from texts; other modules register
+# their index types here so the harness can compare them
+INDEX_BUILDERS: Dict[str, IndexBuilder] = {}
+
+
+def register_index_builder(index_type: str) -> Callable[[IndexBuilder], IndexBuilder]:
+    """Decorator registering a builder for ``index_type``."""
+    def decorator(builder: IndexBuilder) -> IndexBuilder:
+        INDEX_BUILDERS[index_type] = builder
+        return builder
+    return decorator
+
+
+@register_index_builder("flat")
+def build_flat_index(
+    name: str,
+    texts: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    embedder: Embedder,
+    params: Dict[str, Any],
+) -> VectorStore:
+    return FlatVectorStore.from_texts(name, texts, metadatas, embedder)
+
+
+def quantized_index_builder(quantizer: str) -> IndexBuilder:
+    """Builder for a ``QuantizedVectorStore``; ``params`` are quantizer settings."""
+    def build(
+        name: str,
+        texts: Sequence[str],
+        metadatas: Sequence[Dict[str, Any]],
+        embedder: Embedder,
+        params: Dict[str, Any],
+    ) -> VectorStore:
+        flat = FlatVectorStore.from_texts(name, texts, metadatas, embedder)
+        return QuantizedVectorStore.from_flat(flat, quantizer, **params)
+    return build
+
+
+register_index_builder("int8")(quantized_index_builder("int8"))
+register_index_builder("pq")(quantized_index_builder("pq"))
+
+
+@register_index_builder("sharded")
+def build_sharded_index(
+    name: str,
+    texts: Sequence[str],
+    metadatas: Sequence[Dict[str, Any]],
+    embedder: Embedder,
+    params: Dict[str, Any],
+) -> VectorStore:
+    """Flat store searched in ``params["shards"]`` worker processes."""
+    flat = FlatVectorStore.from_texts(name, texts, metadatas, embedder)
+    pool = SearchPool(params.get("shards", 4))
+    pool.warm_up()
+    return ShardedVectorStore(flat, pool, owns_pool=True)
+
+
+DEFAULT_INDEX_CONFIGS = [
+    IndexConfig(name="flat-d128", index_type="flat", embedding_dim=128),
+    IndexConfig(name="flat-d256", index_type="flat", embedding_dim=256),
+    IndexConfig(name="flat-d512", index_type="flat", embedding_dim=512),
+    IndexConfig(name="int8-d256", index_type="int8"),
+    IndexConfig(name="pq32-d256", index_type="pq", params={"subspaces": 32}),
+    IndexConfig(
+        name="pq32-d256-norescore", index_type="pq", params={"subspaces": 32, "rescore_factor": 0}
+    ),
+    IndexConfig(name="sharded4-d256", index_type="sharded", params={"shards": 4}),
+]
+
+
+def generate_dataset(
+    num_documents: int = 2000,
+    num_queries: int = 200,
+    query_words: int = 6,
+    noise_words: int = 2,
+    seed: int = 0,
+) -> RetrievalDataset:
+    """
+    Generate a synthetic corpus with labelled queries.
+
+    Each query samples words from one target document and adds unrelated
+    words, and is labelled with that document.
+    """
+    texts, metadatas = generate_corpus(num_documents=num_documents, seed=seed)
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(num_queries):
+        doc_id = rng.randrange(num_documents)
+        words = rng.sample(tokenize(texts[doc_id]), query_words)
+        noise = rng.sample(tokenize(texts[rng.randrange(num_documents)]), noise_words)
+        queries.append(LabelledQuery(text=" ".join(words + noise), relevant_ids=[doc_id]))
+    return RetrievalDataset(texts=texts, metadatas=metadatas, queries=queries)
+
+
+def load_dataset(path: Path) -> RetrievalDataset:
+    """
+    Load a dataset from JSON.
+
+    Expected format::
+
+        {"documents": [{"content": "...", "metadata": {...}}, ...],
+         "queries": [{"text": "...", "relevant_ids": [0, 5]}, ...]}
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return RetrievalDataset(
+        texts=[doc["content"] for doc in data["documents"]],
+        metadatas=[doc.get("metadata", {}) for doc in data["documents"]],
+        queries=[LabelledQuery(**query) for query in data["queries"]],
+    )
+
+
+def evaluate_index(
+    config: IndexConfig, dataset: RetrievalDataset, k: int = 10
+) -> RetrievalBenchmarkResult:
+    """
+    Build one index configuration and measure its quality and cost.
+
+    Args:
+        config: Index configuration
+        dataset: Corpus and labelled queries
+        k: Cut-off for recall@k and MRR
+
+    Returns:
+        RetrievalBenchmarkResult: Measured numbers
+    """
+    if config.index_type not in INDEX_BUILDERS:
+        raise ValueError(f"Unknown index type: {config.index_type}")
+    embedder = HashingEmbedder(dim=config.embedding_dim)
+
+    tracemalloc.start()
+    try:
+        start_time = time.perf_counter()
+        store = INDEX_BUILDERS[config.index_type](
+            config.name, dataset.texts, dataset.metadatas, embedder, config.params
+        )
+        build_time = time.perf_counter() - start_time
+        _, build_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    # Embedding is the same for every configuration with the same embedder,
+    # so it is kept out of the per-query search latency
+    query_vectors = embedder.embed([query.text for query in dataset.queries])
+    latencies = []
+    recalls = []
+    reciprocal_ranks = []
+    try:
+        for query, vector in zip(dataset.queries, query_vectors, strict=True):
+            start_time = time.perf_counter()
+            ids, _ = store.search_vectors(vector, k)
+            latencies.append(time.perf_counter() - start_time)
+
+            relevant = set(query.relevant_ids)
+            ranked = ids.tolist()
+            recalls.append(len(relevant.intersection(ranked)) / len(relevant) if relevant else 0.0)
+            first_hit = next((rank for rank, doc_id in enumerate(ranked, 1) if doc_id in relevant), None)
+            reciprocal_ranks.append(1.0 / first_hit if first_hit else 0.0)
+        index_bytes = store.index_nbytes()
+    finally:
+        store.close()
+
+    latencies_ms = np.array(latencies) * 1000
+    total_time = float(np.sum(latencies))
+    return RetrievalBenchmarkResult(
+        name=config.name,
+        index_type=config.index_type,
+        documents=len(store),
+        queries=len(dataset.queries),
+        k=k,
+        recall_at_k=float(np.mean(recalls)),
+        mrr=float(np.mean(reciprocal_ranks)),
+        p50_ms=float(np.percentile(latencies_ms, 50)),
+        p95_ms=float(np.percentile(latencies_ms, 95)),
+        p99_ms=float(np.percentile(latencies_ms, 99)),
+        qps=len(latencies) / total_time if total_time > 0 else 0.0,
+        build_time=build_time,
+        index_bytes=index_bytes,
+        build_peak_bytes=build_peak,
+    )
+
+
+class QuantizationReport(BaseModel):
+    """Memory and recall of a quantized store compared with its exact version."""
+    store: str
+    quantizer: str
+    documents: int
+    k: int
+    float_bytes: int
+    resident_bytes: int
+    recall_at_k: float
+    recall_at_k_codes_only: float
+
+
+def quantization_report(
+    flat: FlatVectorStore,
+    quantized: QuantizedVectorStore,
+    k: int = 10,
+    sample: int = 200,
+    seed: int = 0,
+) -> QuantizationReport:
+    """
+    Measure how closely a quantized store reproduces exact search.
+
+    Queries are stored vectors sampled from the store itself; recall is the
+    overlap of the quantized top-k with the exact top-k, with and without
+    exact rescoring of the shortlist.
+    """
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(len(flat), min(sample, len(flat)), replace=False)
+    rescored = []
+    codes_only = []
+    for query_id in ids:
+        query = np.asarray(flat.vectors[query_id], dtype=np.float32)
+        exact = set(flat.search_vectors(query, k)[0].tolist())
+        if not exact:
+            continue
+        rescored.append(len(exact.intersection(quantized.search_vectors(query, k)[0].tolist())) / len(exact))
+        codes_only.append(
+            len(exact.intersection(quantized.search_vectors(query, k, rescore=False)[0].tolist())) / len(exact)
+        )
+    return QuantizationReport(
+        store=flat.name,
+        quantizer=quantized.quantizer.kind,
+        documents=len(flat),
+        k=k,
+        float_bytes=flat.index_nbytes(),
+        resident_bytes=quantized.index_nbytes(),
+        recall_at_k=float(np.mean(rescored)) if rescored else 1.0,
+        recall_at_k_codes_only=float(np.mean(codes_only)) if codes_only else 1.0,
+    )
+
+
+def run_retrieval_benchmark(
+    dataset: RetrievalDataset,
+    configs: Optional[List[IndexConfig]] = None,
+    k: int = 10,
+) -> List[RetrievalBenchmarkResult]:
+    """Evaluate every configuration on the same dataset."""
+    return [evaluate_index(config, dataset, k) for config in (configs or DEFAULT_INDEX_CONFIGS)]
@@ -0,0 +1,307 @@
+"""
+End-to-end load benchmarks for `ais bench`.
+
+The benchmark drives the real FastAPI application in-process through httpx's
+ASGI transport. Model providers are replaced with ``FakeProvider`` and the
+vector stores with synthetic in-memory stores, so the numbers measure our
+own request path (routing, validation, retrieval, serialisation) rather than
+an upstream API. Results are written as JSON and compared against a
+committed baseline; a scenario that regresses past the threshold fails the
+run.
+"""
+
+import asyncio
+import json
+import platform
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.bench.corpus import generate_corpus
+from app.models.llm import FakeProvider
+from app.models.manager import ModelManager
+from app.rag.engine import RAGEngine
+from app.rag.vector_stores import FlatVectorStore, VectorStore
+
+BENCH_FORMAT_VERSION = 1
+FAKE_MODELS = ["fake-small", "fake-medium", "fake-large"]
+STORE_NAMES = ["store_a", "store_b", "store_c", "common"]
+
+
+class Scenario:
+    """A single benchmarked request."""
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        path: str,
+        json_body: Optional[Dict[str, Any]] = None,
+        form_data: Optional[Dict[str, str]] = None,
+    ):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.json_body = json_body
+        self.form_data = form_data
+
+    async def send(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.request(
+            self.method, self.path, json=self.json_body, data=self.form_data
+        )
+
+
+DEFAULT_SCENARIOS = [
+    Scenario("page_home", "GET", "/api/"),
+    Scenario("page_developer", "GET", "/api/developer"),
+    Scenario("page_user", "GET", "/api/user"),
+    Scenario("chat", "POST", "/api/chat", form_data={"message": "t3w1 t3w7 vector store"}),
+    Scenario(
+        "rag_query",
+        "POST",
+        "/api/rag/query",
+        json_body={"query": "t5w2 t5w9 t5w11 model answer", "max_results": 5},
+    ),
+    Scenario(
+        "model_compare",
+        "POST",
+        "/api/models/test",
+        json_body={"query": "Compare these models", "models": FAKE_MODELS, "max_tokens": 64},
+    ),
+]
+
+
+class ScenarioResult(BaseModel):
+    """Measured numbers for one scenario."""
+    name: str
+    requests: int
+    errors: int
+    rps: float
+    mean_ms: float
+    p50_ms: float
+    p99_ms: float
+    alloc_kib_per_request: float
+    cpu_ms_per_request: float = 0.0
+
+
+class BenchReport(BaseModel):
+    """Result of a benchmark run."""
+    version: int = BENCH_FORMAT_VERSION
+    created_at: float
+    python: str
+    machine: str
+    scenarios: Dict[str, ScenarioResult]
+
+
+def build_bench_stores(num_documents: int = 2000) -> Dict[str, VectorStore]:
+    """Build the synthetic stores A, B, C and the common store."""
+    texts, metadatas = generate_corpus(num_documents=num_documents)
+    per_store = len(texts) // len(STORE_NAMES)
+    stores = {}
+    for index, name in enumerate(STORE_NAMES):
+        chunk = slice(index * per_store, (index + 1) * per_store)
+        stores[name] = FlatVectorStore.from_texts(name, texts[chunk], metadatas[chunk])
+    return stores
+
+
+def build_bench_app(num_documents: int = 2000, provider_latency: float = 0.0) -> FastAPI:
+    """
+    Create the application wired to fake providers and synthetic stores.
+
+    Args:
+        num_documents: Total documents across the synthetic stores
+        provider_latency: Simulated upstream latency per model call, seconds
+
+    Returns:
+        FastAPI: Application ready to be driven through ASGI
+    """
+    from app.server.app import create_app
+
+    app = create_app()
+    manager = ModelManager({name: FakeProvider(latency=provider_latency) for name in FAKE_MODELS})
+    app.state.model_manager = manager
+    app.state.rag_engine = RAGEngine(build_bench_stores(num_documents), manager, FAKE_MODELS[0])
+    return app
+
+
+async def _measure_allocations(
+    client: httpx.AsyncClient, scenario: Scenario, samples: int
+) -> float:
+    """Return the mean peak traced allocation per request, in KiB."""
+    tracemalloc.start()
+    try:
+        peaks = []
+        for _ in range(samples):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await scenario.send(client)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+    return float(np.mean(peaks)) / 1024 if peaks else 0.0
+
+
+async def _run_round(
+    client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int
+) -> Tuple[List[float], int, float]:
+    """Send ``requests`` requests; return latencies, error count and wall time."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start_time = time.perf_counter()
+            response = await scenario.send(client)
+            latencies.append(time.perf_counter() - start_time)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    requests: int = 200,
+    concurrency: int = 8,
+    rounds: int = 3,
+    warmup: int = 10,
+    allocation_samples: int = 20,
+) -> ScenarioResult:
+    """
+    Load one scenario and measure throughput, latency, CPU time and allocations.
+
+    The scenario is run ``rounds`` times. Throughput is the median across
+    rounds and latency percentiles are computed over all rounds' requests,
+    which keeps single-round scheduling noise out of the comparison.
+
+    Args:
+        client: Client bound to the application under test
+        scenario: Scenario to run
+        requests: Measured requests per round
+        concurrency: Concurrent in-flight requests
+        rounds: Number of measured rounds
+        warmup: Unmeasured requests sent first
+        allocation_samples: Requests measured under tracemalloc afterwards
+
+    Returns:
+        ScenarioResult: Measured numbers
+    """
+    for _ in range(warmup):
+        await scenario.send(client)
+
+    latencies: List[float] = []
+    errors = 0
+    round_rps = []
+    # Client and application share this process, so CPU time per request
+    # includes the (constant) client cost; compare it across runs, not absolutely
+    cpu_start = time.process_time()
+    for _ in range(max(1, rounds)):
+        round_latencies, round_errors, elapsed = await _run_round(
+            client, scenario, requests, concurrency
+        )
+        latencies.extend(round_latencies)
+        errors += round_errors
+        round_rps.append(len(round_latencies) / elapsed if elapsed > 0 else 0.0)
+    cpu_time = time.process_time() - cpu_start
+
+    latencies_ms = np.array(latencies) * 1000
+    return ScenarioResult(
+        name=scenario.name,
+        requests=len(latencies),
+        errors=errors,
+        rps=float(np.median(round_rps)),
+        mean_ms=float(latencies_ms.mean()),
+        p50_ms=float(np.percentile(latencies_ms, 50)),
+        p99_ms=float(np.percentile(latencies_ms, 99)),
+        alloc_kib_per_request=await _measure_allocations(client, scenario, allocation_samples),
+        cpu_ms_per_request=cpu_time * 1000 / len(latencies) if latencies else 0.0,
+    )
+
+
+async def run_benchmarks(
+    app: FastAPI,
+    scenarios: List[Scenario],
+    requests: int = 200,
+    concurrency: int = 8,
+    rounds: int = 3,
+) -> BenchReport:
+    """Run every scenario against ``app`` and collect a report."""
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in scenarios:
+            results[scenario.name] = await run_scenario(
+                client, scenario, requests=requests, concurrency=concurrency, rounds=rounds
+            )
+    return BenchReport(
+        created_at=time.time(),
+        python=platform.python_version(),
+        machine=platform.machine(),
+        scenarios=results,
+    )
+
+
+def compare_to_baseline(
+    report: BenchReport,
+    baseline: BenchReport,
+    threshold: float = 0.3,
+    min_latency_delta_ms: float = 1.0,
+) -> List[str]:
+    """
+    Find scenarios that regressed against the baseline.
+
+    A scenario regresses when its throughput drops, or its median latency
+    grows, by more than ``threshold`` (a fraction), or when it has more errors.
+    p99 is reported but not gated on: with a few hundred requests per round
+    it mostly measures scheduler noise. Latency changes smaller than
+    ``min_latency_delta_ms`` are ignored as timer noise.
+
+    Returns:
+        List[str]: One message per regression (empty if none)
+    """
+    regressions = []
+    for name, result in report.scenarios.items():
+        base = baseline.scenarios.get(name)
+        if base is None:
+            continue
+        if result.errors > base.errors:
+            regressions.append(f"{name}: {result.errors} errors (baseline {base.errors})")
+        if result.rps < base.rps * (1 - threshold):
+            regressions.append(
+                f"{name}: {result.rps:.0f} rps is {1 - result.rps / base.rps:.0%} "
+                f"below baseline {base.rps:.0f} rps"
+            )
+        if (
+            result.p50_ms > base.p50_ms * (1 + threshold)
+            and result.p50_ms - base.p50_ms > min_latency_delta_ms
+        ):
+            regressions.append(
+                f"{name}: p50 {result.p50_ms:.1f} ms exceeds baseline "
+                f"{base.p50_ms:.1f} ms by more than {threshold:.0%}"
+            )
+    return regressions
+
+
+def load_report(path: Path) -> BenchReport:
+    """Load a report (or baseline) from JSON."""
+    with open(path, encoding="utf-8") as f:
+        return BenchReport.model_validate(json.load(f))
+
+
+def save_report(report: BenchReport, path: Path) -> None:
+    """Write a report as JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(report.model_dump_json(indent=2), encoding="utf-8")
@@ -0,0 +1,148 @@
+"""
+Response serialisation micro-benchmark.
+
+Times the server-side step that turns a route's return value into a
+response, for the same payloads on both paths: FastAPI's
+``serialize_response`` against the route's ``response_model`` (as a route
+returning the bare value runs it), and ``ModelResponse``. Whole requests
+are not timed, since an ASGI round-trip costs one to three milliseconds,
+which would swamp a difference of tens of microseconds.
+"""
+
+import asyncio
+import inspect
+import time
+from typing import Any, Dict, List, Tuple, Type
+
+from fastapi import FastAPI
+from fastapi.routing import APIRoute, serialize_response
+from fastui import FastUI
+from pydantic import BaseModel
+from starlette.responses import JSONResponse, Response
+
+from app.api.models.responses import ModelComparison, RAGResponse
+from app.api.serialization import ModelResponse
+from app.bench.runner import FAKE_MODELS, build_bench_stores
+from app.models.llm import FakeProvider
+from app.models.manager import ModelManager
+from app.rag.engine import RAGEngine
+
+# FastAPI versions that can dump the response model straight to JSON bytes
+# use that path for routes without a custom response class
+_DUMP_JSON = "dump_json" in inspect.signature(serialize_response).parameters
+
+
+class SerializationResult(BaseModel):
+    """CPU time per response of both response paths for one payload."""
+    name: str
+    payload_bytes: int
+    validated_ms: float
+    direct_ms: float
+
+    @property
+    def saved_fraction(self) -> float:
+        return 1 - self.direct_ms / self.validated_ms if self.validated_ms else 0.0
+
+
+async def build_payloads(max_results: int = 20) -> Dict[str, Tuple[Type[Any], Any, bool]]:
+    """
+    Build representative payloads: (response model, value, exclude_none).
+    """
+    from app.frontend.pages.developer import create_developer_page
+
+    manager = ModelManager({name: FakeProvider() for name in FAKE_MODELS})
+    engine = RAGEngine(build_bench_stores(), manager, FAKE_MODELS[0])
+    return {
+        "fastui_page": (FastUI, create_developer_page(), True),
+        "rag_response": (
+            RAGResponse,
+            await engine.query("t5w2 t5w9 t5w11 model answer", max_results=max_results),
+            False,
+        ),
+        "model_comparison": (
+            ModelComparison,
+            await manager.test_models("Compare these models", FAKE_MODELS),
+            False,
+        ),
+    }
+
+
+def build_serialization_app(payloads: Dict[str, Tuple[Type[Any], Any, bool]]) -> FastAPI:
+    """Create ``/validated/<name>`` and ``/direct/<name>`` routes per payload."""
+    app = FastAPI()
+    for name, (model, value, exclude_none) in payloads.items():
+
+        async def validated(value: Any = value) -> Any:
+            return value
+
+        async def direct(value: Any = value, exclude_none: bool = exclude_none) -> ModelResponse:
+            return ModelResponse(value, exclude_none=exclude_none)
+
+        app.add_api_route(
+            f"/validated/{name}", validated, response_model=model,
+            response_model_exclude_none=exclude_none,
+        )
+        app.add_api_route(f"/direct/{name}", direct, response_model=model)
+    return app
+
+
+async def validated_response(route: APIRoute, value: Any) -> Response:
+    """Build the response FastAPI builds for a route that returns ``value``."""
+    options = {"dump_json": True} if _DUMP_JSON else {}
+    content = await serialize_response(
+        field=route.response_field,
+        response_content=value,
+        exclude_none=route.response_model_exclude_none,
+        **options,
+    )
+    if _DUMP_JSON:
+        return Response(content, media_type="application/json")
+    return JSONResponse(content)
+
+
+async def _validated_ms(route: APIRoute, value: Any, calls: int) -> float:
+    start_time = time.process_time()
+    for _ in range(calls):
+        await validated_response(route, value)
+    return (time.process_time() - start_time) * 1000 / calls
+
+
+def _direct_ms(value: Any, exclude_none: bool, calls: int) -> float:
+    start_time = time.process_time()
+    for _ in range(calls):
+        ModelResponse(value, exclude_none=exclude_none)
+    return (time.process_time() - start_time) * 1000 / calls
+
+
+async def measure_serialization(requests: int = 500, rounds: int = 3) -> List[SerializationResult]:
+    """
+    Measure both response paths for every payload.
+
+    Each round times ``requests`` responses per path. The paths are
+    measured alternately ``rounds`` times and the fastest round of each is
+    kept, which filters out scheduling noise.
+    """
+    payloads = await build_payloads()
+    routes = {route.path: route for route in build_serialization_app(payloads).routes}
+    results = []
+    for name, (_, value, exclude_none) in payloads.items():
+        route = routes[f"/validated/{name}"]
+        # Warm up both paths (schema caches, allocator)
+        size = len((await validated_response(route, value)).body)
+        await _validated_ms(route, value, max(1, requests // 10))
+        _direct_ms(value, exclude_none, max(1, requests // 10))
+        validated, direct = [], []
+        for _ in range(rounds):
+            validated.append(await _validated_ms(route, value, requests))
+            direct.append(_direct_ms(value, exclude_none, requests))
+        results.append(
+            SerializationResult(
+                name=name, payload_bytes=size, validated_ms=min(validated), direct_ms=min(direct)
+            )
+        )
+    return results
+
+
+def run_serialization_benchmark(requests: int = 500, rounds: int = 3) -> List[SerializationResult]:
+    """Synchronous entry point for the CLI."""
+    return asyncio.run(measure_serialization(requests, rounds))
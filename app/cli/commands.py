@@ -4,42 +4,190 @@ CLI Commands Implementation
 This module contains the implementation of all CLI commands for AI Studio.
 """
 
+import contextlib
+import importlib.util
+import os
+
 import typer
-from typing import Optional
-import uvicorn
+from typing import Dict, Iterator, List, Optional
+
+
+# Event loop / HTTP parser implementations accepted by ``ais run``.
+# "auto" keeps uvicorn's own detection; the production mode resolves it to the
+# fastest implementation that is actually installed.
+LOOP_IMPLEMENTATIONS = {"auto": None, "uvloop": "uvloop", "asyncio": None}
+HTTP_IMPLEMENTATIONS = {"auto": None, "httptools": "httptools", "h11": "h11"}
+
+
+def resolve_server_implementation(
+    kind: str, choice: str, production: bool
+) -> str:
+    """
+    Resolve the loop or HTTP implementation uvicorn should use.
+
+    Args:
+        kind: Either ``"loop"`` or ``"http"``
+        choice: Implementation requested on the command line
+        production: Whether the multi-worker production mode is active
+
+    Returns:
+        str: Implementation name to pass to uvicorn
+
+    Raises:
+        typer.BadParameter: If the choice is unknown or its package is missing
+    """
+    implementations = LOOP_IMPLEMENTATIONS if kind == "loop" else HTTP_IMPLEMENTATIONS
+    if choice not in implementations:
+        raise typer.BadParameter(
+            f"Unknown {kind} implementation '{choice}' "
+            f"(choose from: {', '.join(implementations)})"
+        )
+
+    if choice == "auto":
+        if not production:
+            return "auto"
+        # Prefer the C implementations in production, fall back silently
+        fast = "uvloop" if kind == "loop" else "httptools"
+        fallback = "asyncio" if kind == "loop" else "h11"
+        return fast if importlib.util.find_spec(fast) is not None else fallback
+
+    module_name = implementations[choice]
+    if module_name and importlib.util.find_spec(module_name) is None:
+        raise typer.BadParameter(
+            f"{kind} implementation '{choice}' requested but '{module_name}' "
+            "is not installed"
+        )
+    return choice
+
+
+@contextlib.contextmanager
+def _scoped_environ(values: Dict[str, str]) -> Iterator[None]:
+    """
+    Set environment variables for the duration of a block.
+
+    Processes spawned inside the block (uvicorn workers, the reloader)
+    inherit them; afterwards the previous values are restored.
+    """
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def run_server(
+    host: str,
+    port: int,
+    debug: bool,
+    reload: bool,
+    workers: int = 1,
+    loop: str = "auto",
+    http: str = "auto",
+    graceful_timeout: int = 30,
+    profile: bool = False,
+    profile_sample_rate: Optional[float] = None,
+) -> None:
+    """
+    Run the FastAPI server with FastUI interface.
+
+    With ``workers > 1`` uvicorn's preforking supervisor starts one process per
+    worker, each building its own app through the ``create_app`` factory. On
+    SIGTERM every worker stops accepting connections and drains in-flight
+    (including streaming) responses for up to ``graceful_timeout`` seconds.
 
+    ``profile`` installs the request profiling middleware. It is passed on
+    through the environment of the server (and so of preforked workers),
+    which is restored when the server stops. Off the loopback interface it
+    requires a ``profile_token``.
+    """
+    # Imported here so that `ais version`, `ais config` and `ais --help` do
+    # not pay for the web stack
+    import uvicorn
 
-def run_server(host: str, port: int, debug: bool, reload: bool) -> None:
-    """Run the FastAPI server with FastUI interface"""
     try:
+        if workers < 1:
+            raise typer.BadParameter("--workers must be at least 1")
+        if reload and workers > 1:
+            raise typer.BadParameter("--reload cannot be combined with --workers")
+
+        if profile_sample_rate is not None and not 0.0 <= profile_sample_rate <= 1.0:
+            raise typer.BadParameter("--profile-sample-rate must be between 0 and 1")
+        if profile and not _is_loopback(host):
+            from app.core.config import get_config_manager
+
+            # Profiles expose code paths and request timings to anyone who can
+            # reach the server, so a shared server must gate them
+            if get_config_manager().get().profile_token is None:
+                raise typer.BadParameter(
+                    f"--profile on {host} needs AIS_PROFILE_TOKEN (or bind to 127.0.0.1)"
+                )
+
+        production = workers > 1
+        loop_impl = resolve_server_implementation("loop", loop, production)
+        http_impl = resolve_server_implementation("http", http, production)
+
         typer.echo(f"🚀 Starting AI Studio on http://{host}:{port}")
         typer.echo("📱 FastUI interface will be available at the above URL")
         
         if debug:
             typer.echo("🐛 Debug mode enabled")
-        
-        if reload:
-            # Use import string for reload functionality
-            uvicorn.run(
-                "app.server.app:create_app",
-                factory=True,
-                host=host,
-                port=port,
-                reload=reload,
-                log_level="debug" if debug else "info",
+
+        server_env: Dict[str, str] = {}
+        if profile:
+            server_env["AIS_PROFILING_ENABLED"] = "true"
+            if profile_sample_rate is not None:
+                server_env["AIS_PROFILE_SAMPLE_RATE"] = str(profile_sample_rate)
+            typer.echo(
+                "🔬 Request profiling enabled (send X-AIS-Profile to profile a request; "
+                f"profiles at http://{host}:{port}/api/developer/profiles)"
             )
-        else:
-            # Use app object for normal operation
-            from app.server.app import create_app
-            app = create_app()
-            uvicorn.run(
-                app,
-                host=host,
-                port=port,
-                reload=False,
-                log_level="debug" if debug else "info",
+
+        if production:
+            typer.echo(
+                f"🏭 Production mode: {workers} workers "
+                f"(loop={loop_impl}, http={http_impl}, "
+                f"graceful drain={graceful_timeout}s)"
             )
         
+        with _scoped_environ(server_env):
+            if reload or production:
+                # Reload and the worker supervisor both need an import string so
+                # every (re)spawned process can build its own application
+                uvicorn.run(
+                    "app.server.app:create_app",
+                    factory=True,
+                    host=host,
+                    port=port,
+                    reload=reload,
+                    workers=workers if production else None,
+                    loop=loop_impl,
+                    http=http_impl,
+                    timeout_graceful_shutdown=graceful_timeout,
+                    log_level="debug" if debug else "info",
+                )
+            else:
+                # Use app object for normal operation
+                from app.server.app import create_app
+                app = create_app()
+                uvicorn.run(
+                    app,
+                    host=host,
+                    port=port,
+                    reload=False,
+                    loop=loop_impl,
+                    http=http_impl,
+                    timeout_graceful_shutdown=graceful_timeout,
+                    log_level="debug" if debug else "info",
+                )
+        
+    except typer.BadParameter as e:
+        typer.echo(f"❌ Invalid server option: {e}", err=True)
+        raise typer.Exit(2) from e
     except ImportError as e:
         typer.echo(f"❌ Error importing server components: {e}", err=True)
         typer.echo("💡 Make sure all dependencies are installed with: uv sync", err=True)
@@ -49,15 +197,29 @@ def run_server(host: str, port: int, debug: bool, reload: bool) -> None:
         raise typer.Exit(1)
 
 
-def check_health() -> None:
-    """Check system health and dependencies"""
-    typer.echo("🏥 AI Studio Health Check")
-    typer.echo("=" * 40)
-    
-    # Check Python version
+def _is_loopback(host: str) -> bool:
+    """Whether ``host`` only accepts connections from this machine."""
+    import ipaddress
+
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def check_health(json_output: bool = False, timeout: float = 2.0) -> None:
+    """
+    Check system health and dependencies.
+
+    Besides the import check, this runs the deep probes (vector stores, MCP
+    servers, model providers) concurrently and reports each probe's latency.
+    Exits with 1 if a dependency is missing or the report is "unhealthy"; a
+    "degraded" report exits with 0, as ``/api/health/ready`` answers 200.
+    """
     import sys
-    typer.echo(f"🐍 Python version: {sys.version}")
-    
+
     # Check core dependencies
     dependencies = [
         ("fastapi", "FastAPI"),
@@ -65,39 +227,408 @@ def check_health() -> None:
         ("plotly", "Plotly"),
         ("typer", "Typer"),
         ("uvicorn", "Uvicorn"),
+        ("numpy", "NumPy"),
     ]
     
-    missing_deps = []
-    
-    for module_name, display_name in dependencies:
+    available = {}
+    for module_name, _ in dependencies:
         try:
             __import__(module_name)
-            typer.echo(f"✅ {display_name}: Available")
+            available[module_name] = True
         except ImportError:
-            typer.echo(f"❌ {display_name}: Missing")
-            missing_deps.append(module_name)
-    
+            available[module_name] = False
+    missing_deps = [name for name, ok in available.items() if not ok]
+
+    report = None
+    if not missing_deps:
+        import asyncio
+
+        from app.models.base import Configuration
+        from app.server.health import HealthChecker
+
+        checker = HealthChecker(Configuration(), ttl=0, probe_timeout=timeout)
+        report = asyncio.run(checker.check())
+
+    if json_output:
+        import json
+
+        payload = {
+            "python": sys.version.split()[0],
+            "dependencies": available,
+            **(report.model_dump() if report else {"status": "unhealthy", "probes": []}),
+        }
+        typer.echo(json.dumps(payload, indent=2))
+    else:
+        typer.echo("🏥 AI Studio Health Check")
+        typer.echo("=" * 40)
+        typer.echo(f"🐍 Python version: {sys.version}")
+
+        for module_name, display_name in dependencies:
+            if available[module_name]:
+                typer.echo(f"✅ {display_name}: Available")
+            else:
+                typer.echo(f"❌ {display_name}: Missing")
+
+        if report is not None:
+            typer.echo("\n🔎 Dependency probes")
+            if not report.probes:
+                typer.echo("   No vector stores, MCP servers or providers configured")
+            for probe in report.probes:
+                icon = "✅" if probe.healthy else "❌"
+                typer.echo(
+                    f"{icon} [{probe.kind}] {probe.name}: {probe.message} "
+                    f"({probe.latency * 1000:.0f} ms)"
+                )
+
     if missing_deps:
-        typer.echo("\n💡 To install missing dependencies:")
-        typer.echo("   uv sync")
+        if not json_output:
+            typer.echo("\n💡 To install missing dependencies:")
+            typer.echo("   uv sync")
         raise typer.Exit(1)
-    else:
-        typer.echo("\n🎉 All core dependencies are available!")
+    # Same meaning as /api/health/ready: a degraded instance still serves
+    if report.status == "unhealthy":
+        if not json_output:
+            typer.echo("\n⚠️  Some dependencies are unhealthy")
+        raise typer.Exit(1)
+    if not json_output:
+        if report.status == "degraded":
+            typer.echo("\n⚠️  Some external dependencies are unreachable")
+        else:
+            typer.echo("\n🎉 All core dependencies are available!")
+
+
+def _mask_secret(value: Optional[str]) -> str:
+    """Mask a secret for display, keeping only its last four characters."""
+    if not value:
+        return "(not set)"
+    return "*" * 8 + value[-4:]
 
 
 def manage_config(api_key: Optional[str], model: Optional[str], show: bool) -> None:
     """Manage configuration settings"""
-    if show:
-        typer.echo("📋 Current Configuration")
-        typer.echo("=" * 30)
-        typer.echo("🔧 Configuration management will be implemented in task 6")
-        return
-    
-    if api_key:
-        typer.echo("🔑 API key configuration will be implemented in task 6")
-    
-    if model:
-        typer.echo("🤖 Model configuration will be implemented in task 6")
-    
+    from app.core.config import get_config_manager
+    from app.core.keystore import KeyStoreError
+
+    try:
+        manager = get_config_manager()
+
+        if api_key:
+            manager.set_api_key("openai", api_key)
+            typer.echo(f"🔑 API key stored encrypted in {manager.keystore.path}")
+
+        if model:
+            manager.update(default_model=model)
+            typer.echo(f"🤖 Default model set to {model}")
+
+        if show:
+            config = manager.get()
+            typer.echo("📋 Current Configuration")
+            typer.echo("=" * 30)
+            typer.echo(f"📁 Config directory: {manager.config_dir}")
+            for name, value in config.model_dump().items():
+                if name.endswith("api_key"):
+                    value = _mask_secret(value)
+                typer.echo(f"   {name}: {value}")
+            stored_keys = manager.keystore.list_keys()
+            typer.echo(f"🔐 Encrypted keys: {', '.join(stored_keys) or '(none)'}")
+    except KeyStoreError as e:
+        typer.echo(f"❌ {e}", err=True)
+        raise typer.Exit(1) from e
+
     if not any([api_key, model, show]):
-        typer.echo("💡 Use --help to see available configuration options")
\ No newline at end of file
+        typer.echo("💡 Use --help to see available configuration options")
+
+
+def run_bench(
+    scenarios: Optional[List[str]],
+    requests: int,
+    concurrency: int,
+    rounds: int,
+    output: Optional[str],
+    baseline: Optional[str],
+    threshold: float,
+    update_baseline: bool,
+    provider_latency: float,
+    serialization: bool = False,
+) -> None:
+    """Run the end-to-end load benchmarks and compare them to a baseline"""
+    import asyncio
+    from pathlib import Path
+
+    if serialization:
+        from app.bench.serialization import run_serialization_benchmark
+
+        typer.echo(
+            f"⏱️  Timing response serialisation ({rounds} x {requests} responses per payload)"
+        )
+        typer.echo(
+            f"\n{'payload':<18}{'bytes':>8}{'validated µs':>14}{'direct µs':>11}"
+            f"{'saved µs':>10}{'saved':>8}"
+        )
+        for result in run_serialization_benchmark(requests=requests, rounds=rounds):
+            typer.echo(
+                f"{result.name:<18}{result.payload_bytes:>8}{result.validated_ms * 1000:>14.1f}"
+                f"{result.direct_ms * 1000:>11.1f}"
+                f"{(result.validated_ms - result.direct_ms) * 1000:>10.1f}"
+                f"{result.saved_fraction:>8.0%}"
+            )
+        return
+
+    from app.bench.runner import (
+        DEFAULT_SCENARIOS,
+        build_bench_app,
+        compare_to_baseline,
+        load_report,
+        run_benchmarks,
+        save_report,
+    )
+
+    selected = DEFAULT_SCENARIOS
+    if scenarios:
+        known = {scenario.name: scenario for scenario in DEFAULT_SCENARIOS}
+        unknown = [name for name in scenarios if name not in known]
+        if unknown:
+            typer.echo(f"❌ Unknown scenarios: {', '.join(unknown)}", err=True)
+            typer.echo(f"💡 Available: {', '.join(known)}", err=True)
+            raise typer.Exit(2)
+        selected = [known[name] for name in scenarios]
+
+    typer.echo(
+        f"⏱️  Running {len(selected)} scenarios "
+        f"({rounds} x {requests} requests, concurrency {concurrency})"
+    )
+    app = build_bench_app(provider_latency=provider_latency)
+    report = asyncio.run(
+        run_benchmarks(app, selected, requests=requests, concurrency=concurrency, rounds=rounds)
+    )
+
+    typer.echo(
+        f"\n{'scenario':<16}{'rps':>10}{'p50 ms':>10}{'p99 ms':>10}"
+        f"{'CPU ms/req':>12}{'KiB/req':>10}{'errors':>8}"
+    )
+    for result in report.scenarios.values():
+        typer.echo(
+            f"{result.name:<16}{result.rps:>10.0f}{result.p50_ms:>10.2f}"
+            f"{result.p99_ms:>10.2f}{result.cpu_ms_per_request:>12.3f}"
+            f"{result.alloc_kib_per_request:>10.1f}{result.errors:>8}"
+        )
+
+    if output:
+        save_report(report, Path(output))
+        typer.echo(f"\n💾 Results written to {output}")
+
+    if not baseline:
+        return
+    baseline_path = Path(baseline)
+    if update_baseline:
+        save_report(report, baseline_path)
+        typer.echo(f"📌 Baseline updated: {baseline_path}")
+        return
+    if not baseline_path.exists():
+        typer.echo(f"⚠️  No baseline at {baseline_path}; run with --update-baseline to create one")
+        return
+
+    regressions = compare_to_baseline(report, load_report(baseline_path), threshold=threshold)
+    if regressions:
+        typer.echo(f"\n❌ {len(regressions)} regression(s) against {baseline_path}:", err=True)
+        for message in regressions:
+            typer.echo(f"   • {message}", err=True)
+        raise typer.Exit(1)
+    typer.echo(f"\n✅ No regressions beyond {threshold:.0%} against {baseline_path}")
+
+
+def run_retrieval_bench(
+    indexes: Optional[List[str]],
+    documents: int,
+    queries: int,
+    k: int,
+    dataset: Optional[str],
+    output: Optional[str],
+    chart: Optional[str],
+) -> None:
+    """Benchmark retrieval quality and latency of vector store configurations"""
+    import json
+    from pathlib import Path
+
+    from app.bench.retrieval import (
+        DEFAULT_INDEX_CONFIGS,
+        generate_dataset,
+        load_dataset,
+        run_retrieval_benchmark,
+    )
+
+    configs = DEFAULT_INDEX_CONFIGS
+    if indexes:
+        known = {config.name: config for config in DEFAULT_INDEX_CONFIGS}
+        unknown = [name for name in indexes if name not in known]
+        if unknown:
+            typer.echo(f"❌ Unknown index configurations: {', '.join(unknown)}", err=True)
+            typer.echo(f"💡 Available: {', '.join(known)}", err=True)
+            raise typer.Exit(2)
+        configs = [known[name] for name in indexes]
+
+    if dataset:
+        data = load_dataset(Path(dataset))
+    else:
+        data = generate_dataset(num_documents=documents, num_queries=queries)
+    typer.echo(
+        f"🔬 Benchmarking {len(configs)} index configurations on "
+        f"{len(data.texts)} documents / {len(data.queries)} queries (k={k})"
+    )
+    results = run_retrieval_benchmark(data, configs, k=k)
+
+    typer.echo(
+        f"\n{'index':<22}{'recall':>8}{'mrr':>8}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'qps':>9}{'build s':>9}{'index MiB':>11}"
+    )
+    for result in results:
+        typer.echo(
+            f"{result.name:<22}{result.recall_at_k:>8.3f}{result.mrr:>8.3f}"
+            f"{result.p50_ms:>9.3f}{result.p99_ms:>9.3f}{result.qps:>9.0f}"
+            f"{result.build_time:>9.2f}{result.index_bytes / 2**20:>11.2f}"
+        )
+
+    if output:
+        Path(output).write_text(
+            json.dumps([result.model_dump() for result in results], indent=2), encoding="utf-8"
+        )
+        typer.echo(f"\n💾 Results written to {output}")
+
+    if chart:
+        from app.frontend.components.charts import ChartFactory
+
+        figure = ChartFactory.create_vector_comparison_chart(
+            ChartFactory.vector_comparison_data(
+                [result.to_vector_store_result() for result in results]
+            )
+        )
+        figure.write_html(chart, include_plotlyjs="cdn")
+        typer.echo(f"📊 Comparison chart written to {chart}")
+
+
+def quantize_stores(
+    stores: Optional[List[str]],
+    method: str,
+    subspaces: int,
+    rescore_factor: int,
+    k: int,
+    sample: int,
+    write: bool,
+) -> None:
+    """Quantize vector stores and report their memory and recall tradeoff"""
+    from pathlib import Path
+
+    from app.bench.retrieval import quantization_report
+    from app.core.config import get_config_manager
+    from app.rag.vector_stores import (
+        FlatVectorStore,
+        QuantizedVectorStore,
+        discover_vector_stores,
+        open_vector_store,
+        staging_directory,
+        swap_store_directory,
+    )
+
+    available = discover_vector_stores(Path(get_config_manager().get().vector_store_path))
+    paths = {}
+    for name in stores or list(available):
+        path = available.get(name, Path(name))
+        if not path.is_dir():
+            typer.echo(f"❌ Vector store not found: {name}", err=True)
+            raise typer.Exit(2)
+        paths[path.name] = path
+    if not paths:
+        typer.echo("⚠️  No vector stores found")
+        return
+
+    params = {"subspaces": subspaces} if method == "pq" else {}
+    typer.echo(f"🗜️  Quantizing {len(paths)} store(s) with {method} (rescore x{rescore_factor})")
+    typer.echo(
+        f"\n{'store':<16}{'docs':>9}{'float32 MiB':>13}{'resident MiB':>14}"
+        f"{'ratio':>8}{f'recall@{k}':>11}{'codes only':>12}"
+    )
+    total_float = 0
+    total_resident = 0
+    for name, path in paths.items():
+        store = open_vector_store(path)
+        if not isinstance(store, FlatVectorStore):
+            typer.echo(f"{name:<16} skipped: already {store.format_name}")
+            continue
+        try:
+            quantized = QuantizedVectorStore.from_flat(store, method, rescore_factor, **params)
+        except ValueError as e:
+            typer.echo(f"❌ {name}: {e}", err=True)
+            raise typer.Exit(2) from e
+        report = quantization_report(store, quantized, k=k, sample=sample)
+        total_float += report.float_bytes
+        total_resident += report.resident_bytes
+        typer.echo(
+            f"{name:<16}{report.documents:>9}{report.float_bytes / 2**20:>13.2f}"
+            f"{report.resident_bytes / 2**20:>14.2f}"
+            f"{report.float_bytes / max(report.resident_bytes, 1):>7.1f}x"
+            f"{report.recall_at_k:>11.3f}{report.recall_at_k_codes_only:>12.3f}"
+        )
+        if write:
+            # Built next to the store and swapped in, so the store is never
+            # half-written; see swap_store_directory for crash recovery
+            staging = staging_directory(path)
+            quantized.save(staging)
+            swap_store_directory(path, staging)
+
+    typer.echo(
+        f"\n📦 Total resident index memory: {total_resident / 2**20:.2f} MiB "
+        f"(float32: {total_float / 2**20:.2f} MiB)"
+    )
+    if write:
+        typer.echo("💾 Stores rewritten in quantized format")
+    else:
+        typer.echo("💡 Run with --write to store the quantized format")
+
+
+def segment_stores(stores: Optional[List[str]], key_field: Optional[str]) -> None:
+    """Convert vector stores to the updatable segmented format"""
+    import shutil
+    from pathlib import Path
+
+    from app.core.config import get_config_manager
+    from app.rag.vector_stores import (
+        SegmentedVectorStore,
+        discover_vector_stores,
+        open_vector_store,
+        staging_directory,
+        swap_store_directory,
+    )
+
+    available = discover_vector_stores(Path(get_config_manager().get().vector_store_path))
+    paths = {}
+    for name in stores or list(available):
+        path = available.get(name, Path(name))
+        if not path.is_dir():
+            typer.echo(f"❌ Vector store not found: {name}", err=True)
+            raise typer.Exit(2)
+        paths[path.name] = path
+    if not paths:
+        typer.echo("⚠️  No vector stores found")
+        return
+
+    for name, path in paths.items():
+        store = open_vector_store(path)
+        if isinstance(store, SegmentedVectorStore):
+            typer.echo(f"⏭️  {name}: already segmented")
+            continue
+        keys = None
+        if key_field:
+            keys = [store.chunks.metadata(row).get(key_field) for row in range(len(store))]
+            if any(key is None for key in keys):
+                typer.echo(f"❌ {name}: not every document has a '{key_field}' field", err=True)
+                raise typer.Exit(2)
+        # Built next to the store and swapped in, as quantize --write does
+        staging = staging_directory(path)
+        try:
+            SegmentedVectorStore.from_flat(store, staging, keys).close()
+        except ValueError as e:
+            shutil.rmtree(staging, ignore_errors=True)
+            typer.echo(f"❌ {name}: {e}", err=True)
+            raise typer.Exit(2) from e
+        swap_store_directory(path, staging)
+        typer.echo(f"✅ {name}: {len(store)} documents, now updatable")
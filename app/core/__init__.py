@@ -0,0 +1 @@
+"""Core runtime services shared across AI Studio components"""
@@ -0,0 +1,168 @@
+"""
+Configuration management with hot reload.
+
+``ConfigManager`` loads ``Configuration`` once through pydantic-settings and
+re-loads it when ``config.json`` or the encrypted key store changes on disk.
+The check is a throttled ``stat`` (at most once per ``check_interval``), so
+``get()`` is cheap enough to call on every request. Components that hold
+pooled clients built from the configuration subscribe to be told when it
+changes so they can rebuild them.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.core.keystore import KeyStore
+from app.models.base import CONFIG_FILE_NAME, Configuration, get_config_dir
+
+logger = logging.getLogger(__name__)
+
+ConfigListener = Callable[[Configuration], None]
+
+
+class ConfigManager:
+    """Holds the current configuration and hot-reloads it from disk."""
+
+    def __init__(self, check_interval: float = 1.0):
+        self.config_dir = get_config_dir()
+        self.config_file = self.config_dir / CONFIG_FILE_NAME
+        self.keystore = KeyStore(self.config_dir)
+        self.check_interval = check_interval
+        # Re-entrant so listeners may call get() while being notified
+        self._lock = threading.RLock()
+        self._listeners: List[ConfigListener] = []
+        self._last_check = time.monotonic()
+        self._config_stamp = self._file_stamp()
+        self._config = self._load()
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.config_file.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> Configuration:
+        config = Configuration()
+        if not config.openai_api_key:
+            api_key = self.keystore.get_key("openai")
+            if api_key:
+                config = config.model_copy(update={"openai_api_key": api_key})
+        return config
+
+    def get(self) -> Configuration:
+        """
+        Return the current configuration.
+
+        At most once per ``check_interval`` this checks the files on disk and
+        reloads them if they changed.
+        """
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.reload_if_changed()
+        return self._config
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the configuration if the config file or key store changed.
+
+        Returns:
+            bool: Whether a reload happened
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            stamp = self._file_stamp()
+            try:
+                keys_changed = self.keystore.refresh()
+            except Exception:
+                logger.exception("Failed to reload key store %s", self.keystore.path)
+                keys_changed = False
+            if stamp == self._config_stamp and not keys_changed:
+                return False
+            return self._reload_locked(stamp)
+
+    def _reload_locked(self, stamp: Optional[Tuple[int, int]]) -> bool:
+        try:
+            config = self._load()
+        except Exception:
+            # Keep serving the last good configuration
+            logger.exception("Failed to reload configuration from %s", self.config_file)
+            return False
+        self._config_stamp = stamp
+        self._config = config
+        listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(config)
+            except Exception:
+                logger.exception("Configuration listener %r failed", listener)
+        return True
+
+    def subscribe(self, listener: ConfigListener) -> Callable[[], None]:
+        """
+        Register a callback invoked with the new configuration after a reload.
+
+        Returns:
+            Callable[[], None]: Function that removes the listener
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def update(self, **values: Any) -> Configuration:
+        """
+        Persist values to ``config.json`` and reload.
+
+        Args:
+            **values: Configuration fields to set
+
+        Returns:
+            Configuration: The reloaded configuration
+        """
+        with self._lock:
+            data = {}
+            if self.config_file.exists():
+                with open(self.config_file, encoding="utf-8") as f:
+                    data = json.load(f)
+            data.update(values)
+
+            self.config_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.config_file.with_name(self.config_file.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config_file)
+
+            self._reload_locked(self._file_stamp())
+            return self._config
+
+    def set_api_key(self, provider: str, api_key: str) -> None:
+        """Store an API key encrypted and reload the configuration."""
+        self.keystore.set_key(provider, api_key)
+        with self._lock:
+            self._reload_locked(self._file_stamp())
+
+    async def watch(self, interval: Optional[float] = None) -> None:
+        """Poll for changes forever; run as a background task in the server."""
+        while True:
+            await asyncio.sleep(interval or self.check_interval)
+            await asyncio.to_thread(self.reload_if_changed)
+
+
+@functools.cache
+def get_config_manager() -> ConfigManager:
+    """Return the process-wide configuration manager."""
+    return ConfigManager()
@@ -0,0 +1,242 @@
+"""
+Request-scoped deadlines and cancellation.
+
+A ``RequestContext`` is created for each API request (see
+``app.api.dependencies.get_request_context``) and activated for the code
+serving it. Retrieval, MCP calls and model calls look it up with
+``current_context()`` and run their work through ``guard``, so when the
+deadline passes or the client disconnects the outstanding work is cancelled
+instead of running on. Each pipeline stage is recorded as an
+``ExecutionStep`` with the time that was left when it started and ended.
+
+Outside a request ``current_context()`` returns a context without a
+deadline, so the same code runs unbounded in the CLI and in tests.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import time
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from app.api.models.responses import ExecutionStep, ExecutionTrace, MCPCall
+
+T = TypeVar("T")
+
+_current: contextvars.ContextVar[Optional["RequestContext"]] = contextvars.ContextVar(
+    "ais_request_context", default=None
+)
+
+
+class RequestInterrupted(Exception):
+    """Base class for work stopped by its request context."""
+
+
+class DeadlineExceeded(RequestInterrupted):
+    """Raised when the request deadline passes."""
+
+
+class RequestCancelled(RequestInterrupted):
+    """Raised when the request was cancelled, e.g. because the client left."""
+
+
+class RequestContext:
+    """
+    Deadline, cancellation flag and execution trace of one request.
+
+    Args:
+        timeout: Seconds the request may take (None for no deadline)
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.started = time.monotonic()
+        self.timeout = timeout
+        self.deadline = None if timeout is None else self.started + timeout
+        self.cancel_reason: Optional[str] = None
+        self.steps: List[ExecutionStep] = []
+        self.mcp_calls: List[MCPCall] = []
+        self._cancelled: Optional[asyncio.Event] = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None without a deadline)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def interrupted(self) -> bool:
+        """Whether the deadline passed or the request was cancelled."""
+        return self.cancel_reason is not None or self.expired
+
+    def timeout_for(self, timeout: float) -> float:
+        """Clamp a per-call timeout to the time left."""
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the request; work waiting in ``guard`` stops immediately."""
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        if self._cancelled is not None:
+            self._cancelled.set()
+
+    def check(self) -> None:
+        """
+        Raise if the request should not do any more work.
+
+        Raises:
+            RequestCancelled: If the request was cancelled
+            DeadlineExceeded: If the deadline has passed
+        """
+        if self.cancel_reason is not None:
+            raise RequestCancelled(self.cancel_reason)
+        if self.expired:
+            raise DeadlineExceeded(f"Deadline of {self.timeout:.3f}s exceeded")
+
+    def _cancel_event(self) -> asyncio.Event:
+        if self._cancelled is None:
+            self._cancelled = asyncio.Event()
+            if self.cancel_reason is not None:
+                self._cancelled.set()
+        return self._cancelled
+
+    async def guard(self, awaitable: Awaitable[T]) -> T:
+        """
+        Await ``awaitable`` unless the deadline passes or the request is cancelled first.
+
+        The awaited work is cancelled when the request is interrupted, so
+        streams and HTTP calls are closed rather than left running.
+
+        Raises:
+            RequestCancelled: If the request is cancelled first
+            DeadlineExceeded: If the deadline passes first
+        """
+        task = asyncio.ensure_future(awaitable)
+        try:
+            self.check()
+        except RequestInterrupted:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            raise
+        waiter = asyncio.ensure_future(self._cancel_event().wait())
+        try:
+            await asyncio.wait({task, waiter}, timeout=self.remaining(), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            if not task.done():
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        if task.cancelled():
+            self.check()
+        if not task.done() or task.cancelled():
+            raise DeadlineExceeded(f"Deadline of {self.timeout:.3f}s exceeded")
+        return task.result()
+
+    async def gather_partial(self, awaitables: List[Awaitable[T]]) -> List[Optional[T]]:
+        """
+        Run ``awaitables`` concurrently and keep what finished in time.
+
+        Returns:
+            List[Optional[T]]: Results in order, None for work that was
+                cancelled by the deadline or a cancellation (exceptions of
+                finished work are raised)
+        """
+        tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+        if not tasks:
+            return []
+        waiter = asyncio.ensure_future(self._cancel_event().wait())
+        pending = set(tasks)
+        try:
+            while pending and not self.interrupted:
+                _, pending = await asyncio.wait(
+                    pending | {waiter}, timeout=self.remaining(), return_when=asyncio.FIRST_COMPLETED
+                )
+                pending.discard(waiter)
+        finally:
+            waiter.cancel()
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+        return [None if task.cancelled() else task.result() for task in tasks]
+
+    @contextlib.asynccontextmanager
+    async def stage(self, step_type: str, description: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Record the enclosed work as an ``ExecutionStep``.
+
+        Yields a details dict the stage can add to. The step records the
+        time left at its start and end; an interruption is recorded as an
+        unsuccessful step and re-raised.
+        """
+        details: Dict[str, Any] = {"time_left_start": self.remaining()}
+        timestamp = time.time()
+        start_time = time.perf_counter()
+        success = True
+        try:
+            yield details
+        except RequestInterrupted as e:
+            success = False
+            details["interrupted"] = str(e)
+            raise
+        except Exception as e:
+            success = False
+            details["error"] = str(e)
+            raise
+        finally:
+            details["time_left_end"] = self.remaining()
+            self.steps.append(
+                ExecutionStep(
+                    step_id=f"{len(self.steps) + 1}-{step_type}",
+                    step_type=step_type,
+                    description=description,
+                    timestamp=timestamp,
+                    duration=time.perf_counter() - start_time,
+                    success=success,
+                    details=details,
+                )
+            )
+
+    def trace(self) -> ExecutionTrace:
+        """The steps and MCP calls recorded so far."""
+        return ExecutionTrace(
+            steps=list(self.steps),
+            mcp_calls=list(self.mcp_calls),
+            total_time=time.monotonic() - self.started,
+            success=all(step.success for step in self.steps),
+        )
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["RequestContext"]:
+        """Make this the context returned by ``current_context`` in this task."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def active_context() -> Optional[RequestContext]:
+    """The activated request context, if any."""
+    return _current.get()
+
+
+def current_context() -> RequestContext:
+    """The activated request context, or an unbounded one outside requests."""
+    context = _current.get()
+    return context if context is not None else RequestContext()
@@ -0,0 +1,212 @@
+"""
+Encrypted API key store.
+
+Keys are stored as Fernet tokens in ``keys.json`` inside the configuration
+directory. The Fernet key is derived from a master secret with scrypt, which
+is deliberately slow, so the derivation runs once per process and the
+decrypted keys are kept in a lock-protected in-memory cache: reading a key
+on the request path is a dictionary lookup, not a decrypt.
+
+The master secret comes from ``$AIS_MASTER_KEY`` or, if unset, from a
+randomly generated key file (mode 0600): ``$AIS_MASTER_KEY_FILE``, or
+``master.key`` next to the store by default. The default only keeps keys
+out of plaintext copies of ``keys.json``; anyone who can read the
+configuration directory can read the master key too. To protect the keys
+at rest, set ``AIS_MASTER_KEY`` (e.g. from a secrets manager) or point
+``AIS_MASTER_KEY_FILE`` at a location outside the configuration directory.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import secrets
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+MASTER_KEY_ENV = "AIS_MASTER_KEY"
+MASTER_KEY_FILE_ENV = "AIS_MASTER_KEY_FILE"
+KEYS_FILE_NAME = "keys.json"
+MASTER_KEY_FILE_NAME = "master.key"
+
+# scrypt cost parameters (~32 MiB, tens of milliseconds per derivation)
+SCRYPT_N = 2**15
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+# Derived Fernet instances, keyed by (secret digest, salt, n, r, p)
+_derived_keys: Dict[Tuple[bytes, bytes, int, int, int], Fernet] = {}
+_derived_keys_lock = threading.Lock()
+
+
+class KeyStoreError(Exception):
+    """Raised when the key store cannot be read or decrypted."""
+
+
+def derive_fernet(
+    secret: bytes, salt: bytes, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P
+) -> Fernet:
+    """
+    Derive (once per process) the Fernet cipher for a master secret and salt.
+
+    Args:
+        secret: Master secret
+        salt: Per-store random salt
+        n: scrypt CPU/memory cost
+        r: scrypt block size
+        p: scrypt parallelism
+
+    Returns:
+        Fernet: Cipher for encrypting and decrypting stored keys
+    """
+    cache_key = (hashlib.sha256(secret).digest(), salt, n, r, p)
+    with _derived_keys_lock:
+        fernet = _derived_keys.get(cache_key)
+        if fernet is None:
+            key = Scrypt(salt=salt, length=32, n=n, r=r, p=p).derive(secret)
+            fernet = Fernet(base64.urlsafe_b64encode(key))
+            _derived_keys[cache_key] = fernet
+        return fernet
+
+
+class KeyStore:
+    """Encrypted, file-backed store of named API keys."""
+
+    def __init__(self, directory: Path, master_secret: Optional[str] = None):
+        self.directory = Path(directory)
+        self.path = self.directory / KEYS_FILE_NAME
+        self._master_secret = master_secret
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict[str, str]] = None
+        self._loaded_stamp: Optional[Tuple[int, int]] = None
+
+    def _secret(self) -> bytes:
+        secret = self._master_secret or os.environ.get(MASTER_KEY_ENV)
+        if secret:
+            return secret.encode("utf-8")
+
+        master_file = Path(
+            os.environ.get(MASTER_KEY_FILE_ENV) or self.directory / MASTER_KEY_FILE_NAME
+        )
+        if not master_file.exists():
+            master_file.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(master_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_urlsafe(32))
+        return master_file.read_text().strip().encode("utf-8")
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_file(self) -> Dict:
+        if not self.path.exists():
+            return {"version": 1, "salt": None, "keys": {}}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _fernet(self, data: Dict) -> Fernet:
+        kdf = data.get("kdf", {})
+        return derive_fernet(
+            self._secret(),
+            base64.b64decode(data["salt"]),
+            kdf.get("n", SCRYPT_N),
+            kdf.get("r", SCRYPT_R),
+            kdf.get("p", SCRYPT_P),
+        )
+
+    def _load_locked(self, check_disk: bool = False) -> Dict[str, str]:
+        if self._cache is not None and not check_disk:
+            return self._cache
+        stamp = self._file_stamp()
+        if self._cache is not None and stamp == self._loaded_stamp:
+            return self._cache
+
+        data = self._read_file()
+        decrypted = {}
+        if data.get("keys"):
+            fernet = self._fernet(data)
+            try:
+                for name, token in data["keys"].items():
+                    decrypted[name] = fernet.decrypt(token.encode("ascii")).decode("utf-8")
+            except InvalidToken as e:
+                raise KeyStoreError(
+                    f"Cannot decrypt {self.path}: wrong master key?"
+                ) from e
+        self._cache = decrypted
+        self._loaded_stamp = stamp
+        return decrypted
+
+    def get_key(self, name: str) -> Optional[str]:
+        """
+        Return a decrypted key from the in-memory cache.
+
+        The file is decrypted on first use only; call ``refresh`` to pick up
+        changes made on disk by another process.
+        """
+        with self._lock:
+            return self._load_locked().get(name)
+
+    def refresh(self) -> bool:
+        """
+        Re-read the store if the file changed on disk.
+
+        Returns:
+            bool: Whether the cached keys were reloaded
+        """
+        with self._lock:
+            previous = self._loaded_stamp
+            loaded = self._cache is not None
+            self._load_locked(check_disk=True)
+            return loaded and self._loaded_stamp != previous
+
+    def list_keys(self) -> List[str]:
+        """Return the names of the stored keys."""
+        with self._lock:
+            return sorted(self._load_locked())
+
+    def set_key(self, name: str, value: str) -> None:
+        """Encrypt and store a key, replacing any previous value."""
+        with self._lock:
+            keys = dict(self._load_locked())
+            keys[name] = value
+            self._write_locked(keys)
+
+    def delete_key(self, name: str) -> bool:
+        """Remove a key. Returns whether it existed."""
+        with self._lock:
+            keys = dict(self._load_locked())
+            if keys.pop(name, None) is None:
+                return False
+            self._write_locked(keys)
+            return True
+
+    def _write_locked(self, keys: Dict[str, str]) -> None:
+        data = self._read_file()
+        if not data.get("salt"):
+            data["salt"] = base64.b64encode(secrets.token_bytes(16)).decode("ascii")
+            data["kdf"] = {"name": "scrypt", "n": SCRYPT_N, "r": SCRYPT_R, "p": SCRYPT_P}
+        fernet = self._fernet(data)
+        data["keys"] = {
+            name: fernet.encrypt(value.encode("utf-8")).decode("ascii")
+            for name, value in keys.items()
+        }
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+        self._cache = dict(keys)
+        self._loaded_stamp = self._file_stamp()
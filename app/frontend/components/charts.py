@@ -5,30 +5,57 @@ This module provides factory functions for creating various types of
 Plotly charts used throughout the AI Studio application.
 """
 
-from typing import Dict, List, Any
-import plotly.graph_objects as go
-from plotly.graph_objects import Figure
+from typing import TYPE_CHECKING, Dict, List, Any
+
+if TYPE_CHECKING:
+    from plotly.graph_objects import Figure
+
+    from app.api.models.responses import VectorStoreResult
+
+# plotly is imported inside each factory method so that importing this module
+# (and the CLI paths that reach it) stays cheap until a chart is drawn.
 
 
 class ChartFactory:
     """Factory class for creating standardized Plotly charts."""
     
     @staticmethod
-    def create_vector_comparison_chart(data: Dict[str, Any]) -> Figure:
+    def vector_comparison_data(results: List["VectorStoreResult"]) -> Dict[str, Any]:
+        """
+        Convert measured vector store results into chart data.
+        
+        Args:
+            results: Results from live queries or the retrieval benchmark
+            
+        Returns:
+            Dict[str, Any]: Data for ``create_vector_comparison_chart``
+        """
+        return {
+            'stores': [result.store_name for result in results],
+            'relevance_scores': [result.quality_score for result in results],
+            'retrieval_times': [result.retrieval_time * 1000 for result in results],
+        }
+    
+    @staticmethod
+    def create_vector_comparison_chart(data: Dict[str, Any]) -> "Figure":
         """
         Create a vector store comparison chart.
         
         Args:
-            data: Dictionary containing vector store comparison data
+            data: Dictionary with ``stores`` and ``relevance_scores`` and,
+                optionally, ``retrieval_times`` in milliseconds (see
+                ``vector_comparison_data``)
             
         Returns:
             Figure: Plotly figure for vector store comparison
         """
+        import plotly.graph_objects as go
+
         fig = go.Figure()
         
-        # Add placeholder data structure
-        stores = data.get('stores', ['Store A', 'Store B', 'Store C'])
-        relevance_scores = data.get('relevance_scores', [0.8, 0.7, 0.9])
+        stores = data.get('stores', [])
+        relevance_scores = data.get('relevance_scores', [])
+        retrieval_times = data.get('retrieval_times')
         
         fig.add_trace(go.Bar(
             x=stores,
@@ -37,6 +64,19 @@ class ChartFactory:
             marker_color='lightblue'
         ))
         
+        if retrieval_times:
+            fig.add_trace(go.Scatter(
+                x=stores,
+                y=retrieval_times,
+                name='Retrieval Time (ms)',
+                mode='markers+lines',
+                marker=dict(size=10, color='coral'),
+                yaxis='y2'
+            ))
+            fig.update_layout(
+                yaxis2=dict(title='Retrieval Time (ms)', overlaying='y', side='right')
+            )
+        
         fig.update_layout(
             title='Vector Store Comparison',
             xaxis_title='Vector Stores',
@@ -47,7 +87,7 @@ class ChartFactory:
         return fig
     
     @staticmethod
-    def create_execution_flow_diagram(data: Dict[str, Any]) -> Figure:
+    def create_execution_flow_diagram(data: Dict[str, Any]) -> "Figure":
         """
         Create an execution flow diagram for MCP operations.
         
@@ -57,6 +97,8 @@ class ChartFactory:
         Returns:
             Figure: Plotly figure for execution flow visualization
         """
+        import plotly.graph_objects as go
+
         fig = go.Figure()
         
         # Add placeholder network diagram
@@ -83,7 +125,7 @@ class ChartFactory:
         return fig
     
     @staticmethod
-    def create_model_performance_chart(data: Dict[str, Any]) -> Figure:
+    def create_model_performance_chart(data: Dict[str, Any]) -> "Figure":
         """
         Create a model performance comparison chart.
         
@@ -93,6 +135,8 @@ class ChartFactory:
         Returns:
             Figure: Plotly figure for model performance comparison
         """
+        import plotly.graph_objects as go
+
         fig = go.Figure()
         
         models = data.get('models', ['GPT-4', 'GPT-3.5', 'Claude'])
@@ -8,8 +8,6 @@ and handling Plotly-FastUI interactions.
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
 from fastui.components import Div
-from plotly.graph_objects import Figure
-import plotly.io as pio
 
 
 class PlotlyChart(BaseModel):
@@ -19,7 +17,8 @@ class PlotlyChart(BaseModel):
     This component renders Plotly figures within FastUI containers
     with proper styling and interaction handling.
     """
-    figure: Figure
+    # A plotly ``Figure``; typed as Any so plotly is only imported on render
+    figure: Any
     height: int = 400
     width: Optional[int] = None
     config: Dict[str, Any] = {}
@@ -31,6 +30,8 @@ class PlotlyChart(BaseModel):
         Returns:
             Div: FastUI Div component containing the Plotly chart
         """
+        import plotly.io as pio
+
         chart_config = {
             'displayModeBar': True,
             'responsive': True,
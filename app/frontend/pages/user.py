@@ -36,7 +36,7 @@ def create_user_page() -> List[AnyComponent]:
                 Form(
                     form_fields=[
                         FormFieldInput(
-                            name='query', 
+                            name='message', 
                             title='Ask me anything...', 
                             placeholder='Type your question and press Enter...'
                         )
@@ -6,7 +6,7 @@ No other main.py files should be created in any subdirectories.
 """
 
 import typer
-from typing import Optional
+from typing import List, Optional
 
 app = typer.Typer(
     name="ais",
@@ -21,19 +21,51 @@ def run(
     port: int = typer.Option(8000, "--port", "-p", help="Port to bind to"),
     debug: bool = typer.Option(False, "--debug", "-d", help="Enable debug mode"),
     reload: bool = typer.Option(False, "--reload", "-r", help="Enable auto-reload"),
+    workers: int = typer.Option(
+        1, "--workers", "-w", help="Number of worker processes (production mode if > 1)"
+    ),
+    loop: str = typer.Option(
+        "auto", "--loop", help="Event loop implementation: auto, uvloop or asyncio"
+    ),
+    http: str = typer.Option(
+        "auto", "--http", help="HTTP parser implementation: auto, httptools or h11"
+    ),
+    graceful_timeout: int = typer.Option(
+        30, "--graceful-timeout", help="Seconds to drain in-flight responses on SIGTERM"
+    ),
+    profile: bool = typer.Option(
+        False, "--profile", help="Enable on-demand request profiling"
+    ),
+    profile_sample_rate: Optional[float] = typer.Option(
+        None, "--profile-sample-rate", help="Fraction of requests profiled automatically (0-1)"
+    ),
 ) -> None:
     """Run the AI Studio FastUI web interface"""
     from app.cli.commands import run_server
     
-    run_server(host=host, port=port, debug=debug, reload=reload)
+    run_server(
+        host=host,
+        port=port,
+        debug=debug,
+        reload=reload,
+        workers=workers,
+        loop=loop,
+        http=http,
+        graceful_timeout=graceful_timeout,
+        profile=profile,
+        profile_sample_rate=profile_sample_rate,
+    )
 
 
 @app.command()
-def health() -> None:
+def health(
+    json_output: bool = typer.Option(False, "--json", help="Print the report as JSON"),
+    timeout: float = typer.Option(2.0, "--timeout", help="Timeout per probe in seconds"),
+) -> None:
     """Check system health and dependencies"""
     from app.cli.commands import check_health
     
-    check_health()
+    check_health(json_output=json_output, timeout=timeout)
 
 
 @app.command()
@@ -48,6 +80,121 @@ def config(
     manage_config(api_key=api_key, model=model, show=show)
 
 
+@app.command()
+def bench(
+    scenario: Optional[List[str]] = typer.Option(
+        None, "--scenario", "-s", help="Scenario to run (repeatable; default: all)"
+    ),
+    requests: int = typer.Option(200, "--requests", "-n", help="Measured requests per scenario"),
+    concurrency: int = typer.Option(8, "--concurrency", "-c", help="Concurrent requests"),
+    rounds: int = typer.Option(3, "--rounds", help="Measured rounds per scenario"),
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="Write results as JSON"),
+    baseline: Optional[str] = typer.Option(
+        "benchmarks/baseline.json", "--baseline", help="Baseline JSON to compare against"
+    ),
+    threshold: float = typer.Option(
+        0.3, "--threshold", help="Allowed regression as a fraction (0.3 = 30%)"
+    ),
+    update_baseline: bool = typer.Option(
+        False, "--update-baseline", help="Overwrite the baseline with this run"
+    ),
+    provider_latency: float = typer.Option(
+        0.0, "--provider-latency", help="Simulated model latency in seconds"
+    ),
+    serialization: bool = typer.Option(
+        False, "--serialization", help="Only compare response serialisation CPU per request"
+    ),
+) -> None:
+    """Run end-to-end load benchmarks against fake providers"""
+    from app.cli.commands import run_bench
+
+    run_bench(
+        scenarios=scenario,
+        requests=requests,
+        concurrency=concurrency,
+        rounds=rounds,
+        output=output,
+        baseline=baseline,
+        threshold=threshold,
+        update_baseline=update_baseline,
+        provider_latency=provider_latency,
+        serialization=serialization,
+    )
+
+
+@app.command("retrieval-bench")
+def retrieval_bench(
+    index: Optional[List[str]] = typer.Option(
+        None, "--index", "-i", help="Index configuration to run (repeatable; default: all)"
+    ),
+    documents: int = typer.Option(2000, "--documents", help="Synthetic corpus size"),
+    queries: int = typer.Option(200, "--queries", help="Number of labelled queries"),
+    k: int = typer.Option(10, "--k", help="Cut-off for recall@k and MRR"),
+    dataset: Optional[str] = typer.Option(
+        None, "--dataset", help="JSON corpus with labelled queries instead of synthetic data"
+    ),
+    output: Optional[str] = typer.Option(None, "--output", "-o", help="Write results as JSON"),
+    chart: Optional[str] = typer.Option(
+        None, "--chart", help="Write the vector store comparison chart as HTML"
+    ),
+) -> None:
+    """Benchmark retrieval quality and latency of vector store configurations"""
+    from app.cli.commands import run_retrieval_bench
+
+    run_retrieval_bench(
+        indexes=index,
+        documents=documents,
+        queries=queries,
+        k=k,
+        dataset=dataset,
+        output=output,
+        chart=chart,
+    )
+
+
+@app.command()
+def quantize(
+    stores: Optional[List[str]] = typer.Argument(
+        None, help="Store names or directories (default: all configured stores)"
+    ),
+    method: str = typer.Option("int8", "--method", "-m", help="Quantizer: int8 or pq"),
+    subspaces: int = typer.Option(32, "--subspaces", help="Product quantization subspaces"),
+    rescore_factor: int = typer.Option(
+        4, "--rescore", help="Exactly rescored shortlist as a multiple of top-k (0 = off)"
+    ),
+    k: int = typer.Option(10, "--k", help="Cut-off for the recall report"),
+    sample: int = typer.Option(200, "--sample", help="Sampled queries per store"),
+    write: bool = typer.Option(False, "--write", help="Rewrite the stores in quantized format"),
+) -> None:
+    """Quantize vector stores and report their memory and recall tradeoff"""
+    from app.cli.commands import quantize_stores
+
+    quantize_stores(
+        stores=stores,
+        method=method,
+        subspaces=subspaces,
+        rescore_factor=rescore_factor,
+        k=k,
+        sample=sample,
+        write=write,
+    )
+
+
+@app.command()
+def segment(
+    stores: Optional[List[str]] = typer.Argument(
+        None, help="Store names or directories (default: all configured stores)"
+    ),
+    key_field: Optional[str] = typer.Option(
+        None, "--key-field", help="Metadata field holding document keys (default: row numbers)"
+    ),
+) -> None:
+    """Convert vector stores to the updatable segmented format"""
+    from app.cli.commands import segment_stores
+
+    segment_stores(stores=stores, key_field=key_field)
+
+
 @app.command()
 def version() -> None:
     """Show AI Studio version"""
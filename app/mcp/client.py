@@ -0,0 +1,124 @@
+"""
+MCP client for AI Studio.
+
+This module talks to MCP servers configured in ``Configuration.mcp_servers``
+over the streamable HTTP transport (JSON-RPC 2.0 requests POSTed to the
+server URL) and records every tool call as an ``MCPCall``. Calls honour the
+deadline of the active request context and are recorded in its trace.
+"""
+
+import itertools
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.api.models.responses import MCPCall
+from app.core.deadline import RequestInterrupted, current_context
+
+
+class MCPError(Exception):
+    """Raised when an MCP server returns an error or cannot be reached."""
+
+
+class MCPClient:
+    """
+    Client for a single MCP server.
+
+    Server configuration example::
+
+        {"url": "http://localhost:9000/mcp", "headers": {"Authorization": "..."}}
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: Dict[str, Any],
+        http_client: Optional[httpx.AsyncClient] = None,
+    ):
+        self.name = name
+        self.config = config
+        self.url: Optional[str] = config.get("url")
+        self._http_client = http_client
+        self._ids = itertools.count(1)
+
+    async def _request(
+        self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10.0
+    ) -> Dict[str, Any]:
+        if not self.url:
+            raise MCPError(f"MCP server '{self.name}' has no HTTP url configured")
+
+        payload: Dict[str, Any] = {"jsonrpc": "2.0", "id": next(self._ids), "method": method}
+        if params is not None:
+            payload["params"] = params
+        headers = {
+            "Accept": "application/json, text/event-stream",
+            **self.config.get("headers", {}),
+        }
+
+        context = current_context()
+        timeout = context.timeout_for(timeout)
+        try:
+            if self._http_client is not None:
+                response = await context.guard(
+                    self._http_client.post(self.url, json=payload, headers=headers, timeout=timeout)
+                )
+            else:
+                async with httpx.AsyncClient(timeout=timeout) as client:
+                    response = await context.guard(client.post(self.url, json=payload, headers=headers))
+            response.raise_for_status()
+            body = response.json()
+        except (httpx.HTTPError, ValueError) as e:
+            raise MCPError(f"MCP server '{self.name}' request '{method}' failed: {e}") from e
+
+        if "error" in body:
+            raise MCPError(f"MCP server '{self.name}' returned error: {body['error']}")
+        return body.get("result", {})
+
+    async def ping(self, timeout: float = 2.0) -> None:
+        """
+        Check that the server answers a JSON-RPC ``ping``.
+
+        Raises:
+            MCPError: If the server is unreachable or returns an error
+        """
+        await self._request("ping", timeout=timeout)
+
+    async def list_tools(self) -> List[Dict[str, Any]]:
+        """List the tools exposed by the server."""
+        result = await self._request("tools/list")
+        return result.get("tools", [])
+
+    async def call_tool(self, tool_name: str, parameters: Dict[str, Any]) -> MCPCall:
+        """
+        Execute a tool and record the call.
+
+        Failures, including calls stopped by the request deadline, are
+        reported in the returned ``MCPCall`` rather than raised so a trace
+        can include them.
+
+        Args:
+            tool_name: Tool to call
+            parameters: Tool arguments
+
+        Returns:
+            MCPCall: Call record including result and execution time
+        """
+        start_time = time.perf_counter()
+        try:
+            result = await self._request(
+                "tools/call", {"name": tool_name, "arguments": parameters}
+            )
+            success = not result.get("isError", False)
+        except (MCPError, RequestInterrupted) as e:
+            result = {"error": str(e)}
+            success = False
+        call = MCPCall(
+            tool_name=tool_name,
+            parameters=parameters,
+            result=result,
+            execution_time=time.perf_counter() - start_time,
+            success=success,
+        )
+        current_context().mcp_calls.append(call)
+        return call
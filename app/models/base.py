@@ -5,10 +5,30 @@ This module contains base Pydantic models and common data structures
 used throughout the application.
 """
 
-from typing import Dict, Any, Optional
+import os
+from pathlib import Path
+from typing import Dict, Any, Literal, Optional, Tuple, Type
 from pydantic import BaseModel, Field
+from pydantic_settings import (
+    BaseSettings,
+    JsonConfigSettingsSource,
+    PydanticBaseSettingsSource,
+    SettingsConfigDict,
+)
 from datetime import datetime
 
+from app.api.models.responses import UserRole
+
+CONFIG_DIR_ENV = "AIS_CONFIG_DIR"
+CONFIG_FILE_NAME = "config.json"
+
+
+def get_config_dir() -> Path:
+    """Return the AI Studio configuration directory (``$AIS_CONFIG_DIR``)."""
+    return Path(
+        os.environ.get(CONFIG_DIR_ENV, Path.home() / ".config" / "ai-studio")
+    ).expanduser()
+
 
 class BaseEntity(BaseModel):
     """Base entity model with common fields."""
@@ -18,8 +38,23 @@ class BaseEntity(BaseModel):
     metadata: Dict[str, Any] = Field(default_factory=dict)
 
 
-class Configuration(BaseModel):
-    """Application configuration model."""
+class Configuration(BaseSettings):
+    """
+    Application configuration model.
+
+    Values are resolved, highest priority first, from init arguments,
+    ``AIS_*`` environment variables, ``.env`` and ``config.json`` in the
+    configuration directory. Use ``app.core.config.get_config_manager()``
+    rather than instantiating this directly so the file is loaded once and
+    hot-reloaded on change.
+    """
+    model_config = SettingsConfigDict(
+        env_prefix="AIS_",
+        env_file=".env",
+        env_file_encoding="utf-8",
+        extra="ignore",
+    )
+
     api_host: str = Field(default="localhost", description="API server host")
     api_port: int = Field(default=8000, description="API server port")
     debug: bool = Field(default=False, description="Debug mode")
@@ -27,6 +62,31 @@ class Configuration(BaseModel):
     # OpenAI Configuration
     openai_api_key: Optional[str] = Field(default=None, description="OpenAI API key")
     default_model: str = Field(default="gpt-3.5-turbo", description="Default AI model")
+    provider_endpoints: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Model provider base URLs keyed by provider name"
+    )
+    
+    request_timeout: float = Field(
+        default=60.0,
+        gt=0,
+        description="Seconds an API request may run before its remaining work is cancelled"
+    )
+    
+    # Admission Control
+    admission_capacity: int = Field(
+        default=64,
+        ge=1,
+        description="Requests to the model and RAG endpoints allowed to run at once"
+    )
+    admission_limits: Dict[UserRole, int] = Field(
+        default_factory=lambda: {UserRole.EVALUATOR: 16, UserRole.DEVELOPER: 8},
+        description="Running requests allowed per role (roles left out may use the whole capacity)"
+    )
+    admission_queue_limits: Dict[UserRole, int] = Field(
+        default_factory=lambda: {UserRole.USER: 256, UserRole.EVALUATOR: 64, UserRole.DEVELOPER: 32},
+        description="Queued requests per role beyond which new ones get 429 Too Many Requests"
+    )
     
     # Vector Store Configuration
     vector_store_path: str = Field(
@@ -34,12 +94,105 @@ class Configuration(BaseModel):
         description="Path to vector store data"
     )
     
+    search_shards: int = Field(
+        default=1,
+        ge=1,
+        description="Worker processes flat stores are searched with (1 = in-process; takes effect at startup)"
+    )
+    compaction_interval: float = Field(
+        default=30.0,
+        gt=0,
+        description="Seconds between checks whether updatable stores need compaction"
+    )
+    
+    context_token_budget: Optional[int] = Field(
+        default=2000,
+        ge=1,
+        description="Tokens of retrieved context passed to the model (unset: no budget)"
+    )
+    context_dedup_distance: Optional[int] = Field(
+        default=8,
+        ge=0,
+        le=64,
+        description="SimHash bits within which chunks count as near-duplicates (unset: keep duplicates)"
+    )
+    
     # MCP Configuration
     mcp_servers: Dict[str, Any] = Field(
         default_factory=dict, 
         description="MCP server configurations"
     )
 
+    # Trace Store Configuration
+    traces_enabled: bool = Field(
+        default=False,
+        description="Persist the execution trace of each request (takes effect at startup)"
+    )
+    trace_store_path: str = Field(
+        default="./data/traces",
+        description="Directory of the trace store segments"
+    )
+    trace_segment_seconds: float = Field(
+        default=3600.0, gt=0, description="Time span of a trace segment before it is rotated"
+    )
+    trace_segment_bytes: int = Field(
+        default=16 * 1024 * 1024, ge=1, description="Size at which a trace segment is rotated early"
+    )
+    trace_retention_hours: float = Field(
+        default=168.0, gt=0, description="Hours trace segments are kept after their span ends"
+    )
+
+    # Response Replay Configuration
+    replay_mode: Literal["off", "record", "replay", "auto"] = Field(
+        default="off",
+        description="Record model responses, replay them offline, or replay with recording of misses (auto)"
+    )
+    replay_store_path: str = Field(
+        default="./data/replay",
+        description="Directory of the recorded model responses"
+    )
+    replay_latency: bool = Field(
+        default=False,
+        description="Pace replayed responses as they were originally streamed"
+    )
+
+    # Profiling Configuration
+    profiling_enabled: bool = Field(
+        default=False,
+        description="Install the request profiling middleware (takes effect at startup)"
+    )
+    profile_sample_rate: float = Field(
+        default=0.0,
+        ge=0.0,
+        le=1.0,
+        description="Fraction of requests profiled automatically"
+    )
+    profile_token: Optional[str] = Field(
+        default=None,
+        description="Value required in the X-AIS-Profile header and by the profile endpoints"
+    )
+    profile_capacity: int = Field(
+        default=50, ge=1, description="Number of recent profiles kept in memory"
+    )
+
+    @classmethod
+    def settings_customise_sources(
+        cls,
+        settings_cls: Type[BaseSettings],
+        init_settings: PydanticBaseSettingsSource,
+        env_settings: PydanticBaseSettingsSource,
+        dotenv_settings: PydanticBaseSettingsSource,
+        file_secret_settings: PydanticBaseSettingsSource,
+    ) -> Tuple[PydanticBaseSettingsSource, ...]:
+        config_file = get_config_dir() / CONFIG_FILE_NAME
+        return (
+            init_settings,
+            env_settings,
+            dotenv_settings,
+            JsonConfigSettingsSource(settings_cls, json_file=config_file),
+            file_secret_settings,
+        )
+
 
 class MonitoringData(BaseModel):
     """Monitoring data structure for developer interface."""
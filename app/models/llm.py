@@ -0,0 +1,157 @@
+"""
+Language model providers for AI Studio.
+
+This module defines the provider interface used by the model manager, an
+OpenAI-compatible HTTP provider and a deterministic local ``FakeProvider``
+used by tests and benchmarks so they never call (or pay for) a real model.
+"""
+
+import asyncio
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from pydantic import BaseModel, Field
+
+from app.rag.embeddings import tokenize
+
+
+class CompletionRequest(BaseModel):
+    """Request sent to a language model provider."""
+    model: str
+    prompt: str
+    system: Optional[str] = None
+    temperature: float = Field(default=0.7, ge=0.0, le=2.0)
+    max_tokens: int = Field(default=1000, ge=1)
+
+
+class CompletionResponse(BaseModel):
+    """Completed response from a language model provider."""
+    model: str
+    text: str
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class LLMProvider(ABC):
+    """Base class for language model providers."""
+
+    @abstractmethod
+    def stream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        """Yield the response text in chunks as the provider produces them."""
+
+    async def complete(self, request: CompletionRequest) -> CompletionResponse:
+        """
+        Run a request to completion.
+
+        Args:
+            request: Completion request
+
+        Returns:
+            CompletionResponse: The full response with its latency
+        """
+        start_time = time.perf_counter()
+        chunks = [chunk async for chunk in self.stream(request)]
+        text = "".join(chunks)
+        return CompletionResponse(
+            model=request.model,
+            text=text,
+            latency=time.perf_counter() - start_time,
+            prompt_tokens=len(tokenize(request.prompt)),
+            completion_tokens=len(tokenize(text)),
+        )
+
+    async def aclose(self) -> None:  # noqa: B027 - optional hook, most providers hold nothing
+        """Release pooled connections held by the provider."""
+
+
+class FakeProvider(LLMProvider):
+    """
+    Deterministic local provider.
+
+    The answer is built from the prompt's own words so it is stable across
+    runs. ``latency`` is paid before the first chunk and ``chunk_delay``
+    between chunks, to imitate time-to-first-token and streaming speed.
+    """
+
+    def __init__(self, latency: float = 0.0, chunk_delay: float = 0.0, chunk_words: int = 4):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+
+    def _answer_words(self, request: CompletionRequest) -> List[str]:
+        words = tokenize(request.prompt)
+        question = words[-32:] if words else ["empty"]
+        return [f"[{request.model}]", "Answer", "about:", *question][: request.max_tokens]
+
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        words = self._answer_words(request)
+        for start in range(0, len(words), self.chunk_words):
+            if start and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            chunk = " ".join(words[start : start + self.chunk_words])
+            yield chunk if start == 0 else " " + chunk
+
+
+class OpenAIProvider(LLMProvider):
+    """Provider for the OpenAI (or any OpenAI-compatible) chat completions API."""
+
+    def __init__(self, api_key: str, base_url: str = "https://api.openai.com/v1", timeout: float = 60.0):
+        self.base_url = base_url.rstrip("/")
+        # One pooled client per provider; rebuilt by the model manager when
+        # the configuration (and therefore the key or URL) changes
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=timeout,
+        )
+
+    def _payload(self, request: CompletionRequest, stream: bool) -> Dict[str, Any]:
+        messages = []
+        if request.system:
+            messages.append({"role": "system", "content": request.system})
+        messages.append({"role": "user", "content": request.prompt})
+        return {
+            "model": request.model,
+            "messages": messages,
+            "temperature": request.temperature,
+            "max_tokens": request.max_tokens,
+            "stream": stream,
+        }
+
+    async def complete(self, request: CompletionRequest) -> CompletionResponse:
+        start_time = time.perf_counter()
+        response = await self._client.post("/chat/completions", json=self._payload(request, False))
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage", {})
+        return CompletionResponse(
+            model=request.model,
+            text=body["choices"][0]["message"]["content"] or "",
+            latency=time.perf_counter() - start_time,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+        )
+
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        async with self._client.stream(
+            "POST", "/chat/completions", json=self._payload(request, True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                delta = json.loads(data)["choices"][0].get("delta", {})
+                if delta.get("content"):
+                    yield delta["content"]
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,266 @@
+"""
+Model manager for AI Studio.
+
+The ``ModelManager`` maps model names to providers and runs single requests
+or side-by-side model comparisons. With ``replay_mode`` set, every model is
+served through the response store of ``app.models.replay``.
+
+Providers built from the configuration are rebuilt on every reload; the
+ones replaced are closed as soon as no request is using them any more.
+Providers passed in or added with ``register`` are kept across reloads.
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from app.api.models.responses import ModelComparison, ModelResult
+from app.core.deadline import current_context
+from app.models.base import Configuration
+from app.models.llm import (
+    CompletionRequest,
+    CompletionResponse,
+    LLMProvider,
+    OpenAIProvider,
+)
+from app.models.replay import ReplayStore
+
+# Models served by the OpenAI provider when an OpenAI key is configured
+OPENAI_MODELS = ["gpt-4o", "gpt-4o-mini", "gpt-4-turbo", "gpt-3.5-turbo"]
+
+
+class ModelManager:
+    """Registry of language models and the providers that serve them."""
+
+    def __init__(
+        self,
+        providers: Optional[Dict[str, LLMProvider]] = None,
+        replay: Optional[ReplayStore] = None,
+    ):
+        self.providers: Dict[str, LLMProvider] = dict(providers or {})
+        self.replay = replay
+        self._registered: Dict[str, LLMProvider] = dict(self.providers)
+        # Requests running per provider, and replaced providers left to close;
+        # both are only changed on the event loop (``_retired`` also by
+        # ``configure``, which may run on a config reload thread)
+        self._in_flight: Counter = Counter()
+        self._retired: Set[LLMProvider] = set()
+        self._retired_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_config(cls, config: Configuration) -> "ModelManager":
+        """Create a manager with the providers the configuration enables."""
+        manager = cls()
+        manager.configure(config)
+        return manager
+
+    def configure(self, config: Configuration) -> None:
+        """
+        (Re)build provider clients from the configuration.
+
+        The provider map is swapped in one assignment, so requests already in
+        flight finish on the old clients while new ones use the rebuilt pool.
+        Registered providers are carried over; the replaced clients are
+        closed once their in-flight requests finish.
+        """
+        providers: Dict[str, LLMProvider] = {}
+        if config.openai_api_key:
+            openai = OpenAIProvider(
+                config.openai_api_key,
+                base_url=config.provider_endpoints.get("openai", "https://api.openai.com/v1"),
+            )
+            for model_name in {*OPENAI_MODELS, config.default_model}:
+                providers[model_name] = openai
+        providers.update(self._registered)
+        replaced = set(self.providers.values()) - set(providers.values())
+        self.providers = providers
+        self._configure_replay(config)
+        if replaced:
+            with self._retired_lock:
+                self._retired |= replaced
+            self._schedule_close()
+
+    def _schedule_close(self) -> None:
+        """Close idle retired providers on the event loop that serves requests."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            # Not serving yet: the next request or ``aclose`` closes them
+            return
+        try:
+            loop.call_soon_threadsafe(lambda: loop.create_task(self._close_retired()))
+        except RuntimeError:
+            # The loop closed in between
+            pass
+
+    async def _close_retired(self) -> None:
+        with self._retired_lock:
+            idle = {provider for provider in self._retired if not self._in_flight[provider]}
+            self._retired -= idle
+        for provider in idle:
+            await provider.aclose()
+
+    @contextlib.asynccontextmanager
+    async def _serving(self, model_name: str) -> AsyncIterator[LLMProvider]:
+        """Provider for one request, counted as in flight until it finishes."""
+        self._loop = asyncio.get_running_loop()
+        if self._retired:
+            await self._close_retired()
+        # One lookup: a reload on the config-watch thread swaps the map
+        provider = self.providers.get(model_name)
+        served = self._served_by(model_name, provider)
+        if provider is None:
+            yield served
+            return
+        self._in_flight[provider] += 1
+        try:
+            yield served
+        finally:
+            self._in_flight[provider] -= 1
+            if not self._in_flight[provider]:
+                del self._in_flight[provider]
+                if provider in self._retired:
+                    await self._close_retired()
+
+    def _configure_replay(self, config: Configuration) -> None:
+        """Open, retune or close the response store for ``replay_mode``."""
+        replay = self.replay
+        if config.replay_mode == "off":
+            self.replay = None
+        elif replay is not None and replay.path == Path(config.replay_store_path):
+            replay.mode = config.replay_mode
+            replay.reproduce_latency = config.replay_latency
+            return
+        else:
+            self.replay = ReplayStore.from_config(config)
+        if replay is not None:
+            replay.close()
+
+    def on_config_reload(self, config: Configuration) -> None:
+        """Rebuild pooled provider clients after a configuration reload."""
+        self.configure(config)
+
+    def register(self, model_name: str, provider: LLMProvider) -> None:
+        """Serve ``model_name`` with ``provider``, also after configuration reloads."""
+        self._registered[model_name] = provider
+        self.providers[model_name] = provider
+
+    def available_models(self) -> List[str]:
+        """Return the names of all registered models."""
+        return sorted(self.providers)
+
+    def get_provider(self, model_name: str) -> LLMProvider:
+        """
+        Return the provider for a model.
+
+        In replay mode the provider is wrapped by the response store, and
+        recorded models are served even when no provider is configured.
+
+        Raises:
+            ValueError: If no provider serves the model
+        """
+        return self._served_by(model_name, self.providers.get(model_name))
+
+    def _served_by(self, model_name: str, provider: Optional[LLMProvider]) -> LLMProvider:
+        """What serves ``model_name`` given its configured provider (see ``get_provider``)."""
+        replay = self.replay
+        if replay is not None and (provider is not None or replay.mode != "record"):
+            return replay.wrap(provider)
+        if provider is None:
+            raise ValueError(f"No provider configured for model '{model_name}'")
+        return provider
+
+    async def complete(self, request: CompletionRequest) -> CompletionResponse:
+        """
+        Run a completion request on the model's provider.
+
+        Raises:
+            RequestInterrupted: If the request context's deadline passes or
+                it is cancelled first (the provider call is cancelled)
+        """
+        async with self._serving(request.model) as provider:
+            return await current_context().guard(provider.complete(request))
+
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        """Stream a completion from the model's provider."""
+        async with self._serving(request.model) as provider:
+            async for chunk in provider.stream(request):
+                yield chunk
+
+    async def _test_model(
+        self, query: str, model_name: str, temperature: float, max_tokens: int
+    ) -> ModelResult:
+        start_time = time.perf_counter()
+        try:
+            response = await self.complete(
+                CompletionRequest(
+                    model=model_name, prompt=query, temperature=temperature, max_tokens=max_tokens
+                )
+            )
+            return ModelResult(
+                model_name=model_name,
+                response=response.text,
+                response_time=response.latency,
+                success=True,
+            )
+        except Exception as e:
+            return ModelResult(
+                model_name=model_name,
+                response="",
+                response_time=time.perf_counter() - start_time,
+                success=False,
+                error_message=str(e),
+            )
+
+    async def test_models(
+        self,
+        query: str,
+        model_names: List[str],
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> ModelComparison:
+        """
+        Run the same query on several models concurrently.
+
+        Args:
+            query: Query to send to every model
+            model_names: Models to compare
+            temperature: Sampling temperature
+            max_tokens: Maximum response tokens
+
+        Returns:
+            ModelComparison: Per-model results; the fastest successful model
+            is reported as ``best_model`` until quality scoring exists
+        """
+        results = await asyncio.gather(
+            *(self._test_model(query, name, temperature, max_tokens) for name in model_names)
+        )
+        by_name = {result.model_name: result for result in results}
+        succeeded = [result for result in results if result.success]
+        summary_metrics = {
+            "success_rate": len(succeeded) / len(results) if results else 0.0,
+        }
+        if succeeded:
+            summary_metrics["average_response_time"] = sum(
+                result.response_time for result in succeeded
+            ) / len(succeeded)
+        best = min(succeeded, key=lambda result: result.response_time) if succeeded else None
+        return ModelComparison(
+            query=query,
+            results=by_name,
+            best_model=best.model_name if best else None,
+            summary_metrics=summary_metrics,
+        )
+
+    async def aclose(self) -> None:
+        """Close all provider clients."""
+        with self._retired_lock:
+            retired, self._retired = self._retired, set()
+        for provider in set(self.providers.values()) | retired:
+            await provider.aclose()
+        if self.replay is not None:
+            self.replay.close()
@@ -0,0 +1,384 @@
+"""
+Record and replay of model responses.
+
+Re-running an evaluation or a model comparison after a scoring change
+should not pay for every LLM call again. With ``replay_mode`` set, the
+model manager serves models through a ``ReplayProvider`` backed by a
+``ReplayStore`` under ``replay_store_path``:
+
+* ``record``: requests go to the provider and each finished response is
+  recorded, with its streamed chunks and when each of them arrived;
+* ``replay``: requests are answered from the recordings only (offline; a
+  request that was never recorded fails with ``ReplayMiss``);
+* ``auto``: recorded requests are replayed, the others recorded.
+
+Recordings are content-addressed by model and canonical request, so any
+change to the prompt, system prompt or sampling parameters is a different
+recording. Replays report the recorded latency as the response's
+``latency``, so ``ModelResult.response_time`` keeps its meaning. With
+``replay_latency`` the chunks are also paced as they originally arrived.
+
+On disk the store is a directory of append-only segments, one per writing
+process::
+
+    <created ms>-<pid>.seg   zlib-compressed JSON recordings, each framed as
+                             <length:u32><crc32:u32><payload>
+    <created ms>-<pid>.idx   fixed 20-byte entries: key prefix (u64),
+                             record offset (u64), record length (u32)
+
+The indexes are loaded into sorted arrays, so finding a recording is a
+binary search and one read, and hundreds of thousands of recordings cost a
+few megabytes of memory. Within one worker a later recording of the same
+request wins.
+
+Server workers record into their own segments. A lookup that misses reads
+the entries other processes appended to their indexes since, so a
+recording made by any worker is replayed by all of them; a request that
+still hits an older recording keeps it until the store is reopened. When
+two workers both recorded a request, a reopened store replays the one in
+the later-named segment, i.e. of the worker whose segment was started
+last, which need not be the later recording.
+
+Lookups and recordings read, compress and write files, so the provider
+runs them in a worker thread rather than on the event loop.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.models.base import Configuration
+from app.models.llm import CompletionRequest, CompletionResponse, LLMProvider
+from app.rag.embeddings import tokenize
+
+REPLAY_MODES = ("off", "record", "replay", "auto")
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+_HEADER = struct.Struct(">II")
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("offset", "<u8"), ("length", "<u4")])
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode for a request that was never recorded."""
+
+
+def request_key(request: CompletionRequest) -> str:
+    """Content address of a request: SHA-256 of its canonical JSON."""
+    canonical = json.dumps(request.model_dump(), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class Recording(BaseModel):
+    """A recorded model response."""
+    key: str
+    request: CompletionRequest
+    chunks: List[str]
+    offsets: List[float]  # seconds from the request to each chunk
+    latency: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    recorded_at: float
+
+    @property
+    def text(self) -> str:
+        return "".join(self.chunks)
+
+
+class ReplayStore:
+    """
+    Content-addressed store of recorded model responses.
+
+    Args:
+        path: Directory holding the segments
+        mode: One of ``REPLAY_MODES`` except "off"
+        reproduce_latency: Pace replayed chunks as they originally arrived
+        segment_bytes: Size at which this process starts a new segment
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        mode: str = "auto",
+        reproduce_latency: bool = False,
+        segment_bytes: int = 64 * 1024 * 1024,
+    ):
+        if mode not in REPLAY_MODES[1:]:
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.reproduce_latency = reproduce_latency
+        self.segment_bytes = segment_bytes
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segments: List[Path] = []
+        self._numbers: Dict[Path, int] = {}
+        # Bytes of each index file loaded so far
+        self._indexed: Dict[Path, int] = {}
+        self._fds: Dict[int, int] = {}
+        self._closed = False
+        self._keys, self._locations = self._load_indexes()
+        # Recordings made (here or by other processes) since the indexes were loaded
+        self._recent: Dict[int, Tuple[int, int, int]] = {}
+        self._data = None
+        self._index = None
+
+    @classmethod
+    def from_config(cls, config: Configuration) -> "ReplayStore":
+        return cls(Path(config.replay_store_path), config.replay_mode, config.replay_latency)
+
+    def _load_indexes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted key prefixes and their (segment, offset, length), newest last per key."""
+        keys, locations = [], []
+        for data_path in sorted(self.path.glob(f"*{SEGMENT_SUFFIX}")):
+            index_path = data_path.with_suffix(INDEX_SUFFIX)
+            if not index_path.is_file():
+                continue
+            raw = index_path.read_bytes()
+            # A torn last entry (a crash mid-append) is ignored
+            entries = np.frombuffer(raw[: len(raw) - len(raw) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+            number = self._number(data_path)
+            self._indexed[data_path] = entries.nbytes
+            keys.append(entries["key"])
+            locations.append(
+                np.column_stack(
+                    [np.full(len(entries), number, dtype=np.uint64), entries["offset"], entries["length"]]
+                )
+            )
+        if not keys:
+            return np.empty(0, dtype=np.uint64), np.empty((0, 3), dtype=np.uint64)
+        all_keys = np.concatenate(keys)
+        order = np.argsort(all_keys, kind="stable")
+        return all_keys[order], np.concatenate(locations)[order]
+
+    def _number(self, data_path: Path) -> int:
+        number = self._numbers.get(data_path)
+        if number is None:
+            number = self._numbers[data_path] = len(self._segments)
+            self._segments.append(data_path)
+        return number
+
+    def _refresh(self) -> None:
+        """Load the index entries appended by other processes since they were last read."""
+        with self._lock:
+            for index_path in sorted(self.path.glob(f"*{INDEX_SUFFIX}")):
+                data_path = index_path.with_suffix(SEGMENT_SUFFIX)
+                loaded = self._indexed.get(data_path, 0)
+                try:
+                    size = index_path.stat().st_size
+                    if size - loaded < INDEX_DTYPE.itemsize:
+                        continue
+                    with open(index_path, "rb") as f:
+                        f.seek(loaded)
+                        raw = f.read(size - loaded)
+                except FileNotFoundError:
+                    continue
+                # An entry still being appended is picked up by a later refresh
+                entries = np.frombuffer(raw[: len(raw) - len(raw) % INDEX_DTYPE.itemsize], dtype=INDEX_DTYPE)
+                number = self._number(data_path)
+                for prefix, offset, length in entries.tolist():
+                    self._recent[prefix] = (number, offset, length)
+                self._indexed[data_path] = loaded + entries.nbytes
+
+    def __len__(self) -> int:
+        """Number of distinct recorded requests."""
+        with self._lock:
+            recent = np.fromiter(self._recent, dtype=np.uint64, count=len(self._recent))
+        loaded = np.unique(self._keys)
+        return len(loaded) + int(np.count_nonzero(~np.isin(recent, loaded)))
+
+    def _locate(self, prefix: int) -> Optional[Tuple[int, int, int]]:
+        location = self._recent.get(prefix)
+        if location is not None:
+            return location
+        end = int(np.searchsorted(self._keys, np.uint64(prefix), side="right"))
+        if end == 0 or self._keys[end - 1] != prefix:
+            return None
+        segment, offset, length = self._locations[end - 1].tolist()
+        return segment, offset, length
+
+    def _read(self, location: Tuple[int, int, int]) -> Optional[Recording]:
+        segment, offset, length = location
+        # Under the lock, so close() never closes (and the OS never reuses)
+        # a descriptor while it is being read
+        with self._lock:
+            if self._closed:
+                # Requests still in flight when the store was closed
+                fd = os.open(self._segments[segment], os.O_RDONLY)
+                try:
+                    data = os.pread(fd, _HEADER.size + length, offset)
+                finally:
+                    os.close(fd)
+            else:
+                fd = self._fds.get(segment)
+                if fd is None:
+                    fd = self._fds[segment] = os.open(self._segments[segment], os.O_RDONLY)
+                data = os.pread(fd, _HEADER.size + length, offset)
+        if len(data) < _HEADER.size + length:
+            return None
+        stored_length, checksum = _HEADER.unpack_from(data)
+        payload = data[_HEADER.size :]
+        if stored_length != length or zlib.crc32(payload) != checksum:
+            return None
+        return Recording.model_validate_json(zlib.decompress(payload))
+
+    def get(self, request: CompletionRequest) -> Optional[Recording]:
+        """Return the latest recording of ``request``, if any."""
+        key = request_key(request)
+        prefix = int(key[:16], 16)
+        location = self._locate(prefix)
+        if location is None:
+            # Another worker may have recorded it since
+            self._refresh()
+            location = self._locate(prefix)
+            if location is None:
+                return None
+        recording = self._read(location)
+        # The index holds 64-bit prefixes; the full key rules out collisions
+        return recording if recording is not None and recording.key == key else None
+
+    def put(self, recording: Recording) -> None:
+        """Append a recording; it replaces earlier recordings of the same request."""
+        payload = zlib.compress(recording.model_dump_json().encode("utf-8"))
+        prefix = int(recording.key[:16], 16)
+        with self._lock:
+            if self._data is None or self._data.tell() >= self.segment_bytes:
+                self._start_segment()
+            offset = self._data.tell()
+            self._data.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._data.flush()
+            # The index entry follows its record, so it never points at
+            # bytes that did not reach the segment
+            entry = np.array([(prefix, offset, len(payload))], dtype=INDEX_DTYPE)
+            self._index.write(entry.tobytes())
+            self._index.flush()
+            data_path = Path(self._data.name)
+            self._indexed[data_path] += entry.nbytes
+            self._recent[prefix] = (self._numbers[data_path], offset, len(payload))
+            if self._closed:
+                # Recorded by a request still in flight when the store was closed
+                self._close_writer()
+
+    def _start_segment(self) -> None:
+        self._close_writer()
+        data_path = self.path / f"{int(time.time() * 1000):013d}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._data = open(data_path, "ab")
+        self._index = open(data_path.with_suffix(INDEX_SUFFIX), "ab")
+        self._number(data_path)
+        self._indexed[data_path] = 0
+
+    def _close_writer(self) -> None:
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = self._index = None
+
+    def close(self) -> None:
+        """Close the files; requests still in flight keep working without cached descriptors."""
+        with self._lock:
+            self._closed = True
+            self._close_writer()
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+
+    def wrap(self, provider: Optional[LLMProvider]) -> "ReplayProvider":
+        """Serve through the store, falling back to ``provider`` as the mode allows."""
+        return ReplayProvider(self, provider)
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Provider that records or replays the responses of another provider.
+
+    Args:
+        store: Recordings and the replay mode
+        provider: Provider that serves misses (None when only replaying)
+    """
+
+    def __init__(self, store: ReplayStore, provider: Optional[LLMProvider]):
+        self.store = store
+        self.provider = provider
+
+    async def _lookup(self, request: CompletionRequest) -> Optional[Recording]:
+        """The recording to replay, or None if the provider should be called."""
+        if self.store.mode == "record":
+            return None
+        recording = await asyncio.to_thread(self.store.get, request)
+        if recording is None and (self.store.mode == "replay" or self.provider is None):
+            raise ReplayMiss(f"No recorded response of '{request.model}' for this request")
+        return recording
+
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        recording = await self._lookup(request)
+        if recording is not None:
+            start_time = time.perf_counter()
+            for chunk, offset in zip(recording.chunks, recording.offsets, strict=True):
+                if self.store.reproduce_latency:
+                    delay = offset - (time.perf_counter() - start_time)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                yield chunk
+            return
+
+        chunks: List[str] = []
+        offsets: List[float] = []
+        start_time = time.perf_counter()
+        async for chunk in self.provider.stream(request):
+            chunks.append(chunk)
+            offsets.append(time.perf_counter() - start_time)
+            yield chunk
+        # Only responses streamed to the end are recorded
+        text = "".join(chunks)
+        recording = Recording(
+            key=request_key(request),
+            request=request,
+            chunks=chunks,
+            offsets=offsets,
+            latency=time.perf_counter() - start_time,
+            prompt_tokens=len(tokenize(request.prompt)),
+            completion_tokens=len(tokenize(text)),
+            recorded_at=time.time(),
+        )
+        await asyncio.to_thread(self.store.put, recording)
+
+    async def complete(self, request: CompletionRequest) -> CompletionResponse:
+        recording = await self._lookup(request)
+        if recording is not None:
+            if self.store.reproduce_latency:
+                await asyncio.sleep(recording.latency)
+            return CompletionResponse(
+                model=request.model,
+                text=recording.text,
+                latency=recording.latency,
+                prompt_tokens=recording.prompt_tokens,
+                completion_tokens=recording.completion_tokens,
+            )
+
+        response = await self.provider.complete(request)
+        recording = Recording(
+            key=request_key(request),
+            request=request,
+            chunks=[response.text],
+            offsets=[response.latency],
+            latency=response.latency,
+            prompt_tokens=response.prompt_tokens,
+            completion_tokens=response.completion_tokens,
+            recorded_at=time.time(),
+        )
+        await asyncio.to_thread(self.store.put, recording)
+        return response
+
+    async def aclose(self) -> None:
+        if self.provider is not None:
+            await self.provider.aclose()
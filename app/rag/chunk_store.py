@@ -0,0 +1,296 @@
+"""
+Columnar storage for document chunks.
+
+Chunk texts are kept back to back in one UTF-8 buffer with an offsets array,
+and metadata is split into one typed column per key (numbers and booleans
+as numpy arrays, strings and other values dictionary-encoded as integer
+codes). Filters therefore run as array comparisons, and a chunk is decoded
+into a ``Document`` only when it is actually returned. Each chunk's SimHash
+and token count are computed when it is stored, for context packing
+(``app.rag.context``).
+
+On disk a chunk store is a directory::
+
+    text.bin          concatenated UTF-8 texts
+    offsets.npy       int64, len(store) + 1 byte offsets into text.bin
+    columns.json      column names, kinds and dictionaries
+    col-<i>.npy       values (or codes) of column i
+    col-<i>-present.npy  bool, whether a chunk has a value for column i
+    simhash.npy       uint64 SimHash per chunk
+    tokens.npy        int32 token count per chunk
+
+Stores saved before the signatures existed compute them when asked.
+
+Loaded stores memory-map every file, so texts are read zero-copy through a
+``memoryview`` and several worker processes share one copy in the page cache.
+"""
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.api.models.responses import Document
+from app.rag.context import text_signatures
+
+COLUMNS_FILE = "columns.json"
+
+# Numeric column kinds hold values directly; the "str" and "json" kinds hold
+# int32 codes into a dictionary of distinct (JSON-encoded for "json") values
+NUMERIC_KINDS = {"int": np.int64, "float": np.float64, "bool": np.bool_}
+
+
+def _column_kind(values: List[Any]) -> str:
+    """Choose the narrowest column kind that holds every (non-missing) value."""
+    kinds = set()
+    for value in values:
+        if isinstance(value, bool):
+            kinds.add("bool")
+        elif isinstance(value, int):
+            kinds.add("int")
+        elif isinstance(value, float):
+            kinds.add("float")
+        elif isinstance(value, str):
+            kinds.add("str")
+        else:
+            kinds.add("json")
+    if len(kinds) == 1:
+        return kinds.pop()
+    if kinds == {"int", "float"}:
+        return "float"
+    return "json"
+
+
+def _encode_json(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+class Column:
+    """One metadata key stored as a typed array plus a presence mask."""
+
+    def __init__(
+        self,
+        name: str,
+        kind: str,
+        values: np.ndarray,
+        present: np.ndarray,
+        dictionary: Optional[List[str]] = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.values = values
+        self.present = present
+        self.dictionary = dictionary
+        self._codes: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def build(cls, name: str, raw: List[Any], present: np.ndarray) -> "Column":
+        """Build a column from per-chunk values (``None`` where absent)."""
+        kind = _column_kind([value for value, has in zip(raw, present, strict=True) if has])
+        if kind in NUMERIC_KINDS:
+            values = np.array(
+                [value if has else 0 for value, has in zip(raw, present, strict=True)], dtype=NUMERIC_KINDS[kind]
+            )
+            return cls(name, kind, values, present)
+
+        dictionary: List[str] = []
+        codes: Dict[str, int] = {}
+        values = np.full(len(raw), -1, dtype=np.int32)
+        for index, (value, has) in enumerate(zip(raw, present, strict=True)):
+            if not has:
+                continue
+            key = value if kind == "str" else _encode_json(value)
+            if key not in codes:
+                codes[key] = len(dictionary)
+                dictionary.append(key)
+            values[index] = codes[key]
+        return cls(name, kind, values, present, dictionary)
+
+    def value(self, index: int) -> Any:
+        """Decode the value of chunk ``index`` (the column must be present)."""
+        if self.kind in NUMERIC_KINDS:
+            return self.values[index].item()
+        encoded = self.dictionary[self.values[index]]
+        return encoded if self.kind == "str" else json.loads(encoded)
+
+    def equals(self, value: Any) -> np.ndarray:
+        """Boolean mask of chunks whose value equals ``value``."""
+        none = np.zeros(len(self.values), dtype=bool)
+        if self.kind in NUMERIC_KINDS:
+            # bool is an int subclass; keep True from matching 1 and vice versa
+            if not isinstance(value, (int, float)) or isinstance(value, bool) != (self.kind == "bool"):
+                return none
+            return self.present & (self.values == value)
+        if self.kind == "str" and not isinstance(value, str):
+            return none
+        if self._codes is None:
+            self._codes = {key: code for code, key in enumerate(self.dictionary)}
+        code = self._codes.get(value if self.kind == "str" else _encode_json(value))
+        return none if code is None else self.values == code
+
+
+class ChunkStore:
+    """
+    Chunk texts and metadata in columnar form.
+
+    Args:
+        text: Concatenated UTF-8 texts (bytes, memoryview or mmap)
+        offsets: ``len + 1`` byte offsets into ``text``
+        columns: Metadata columns in first-seen key order
+        simhashes: SimHash per chunk (computed on demand if None)
+        token_counts: Token count per chunk (computed on demand if None)
+    """
+
+    def __init__(
+        self,
+        text: bytes | memoryview | mmap.mmap,
+        offsets: np.ndarray,
+        columns: List[Column],
+        simhashes: Optional[np.ndarray] = None,
+        token_counts: Optional[np.ndarray] = None,
+    ):
+        self._text = memoryview(text)
+        self.offsets = offsets
+        self.columns = {column.name: column for column in columns}
+        self.simhashes = simhashes
+        self.token_counts = token_counts
+
+    @classmethod
+    def from_records(
+        cls, texts: Sequence[str], metadatas: Optional[Sequence[Dict[str, Any]]] = None
+    ) -> "ChunkStore":
+        """
+        Build an in-memory chunk store.
+
+        Args:
+            texts: Chunk contents
+            metadatas: Optional metadata per chunk
+
+        Returns:
+            ChunkStore: The new store
+        """
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+
+        metadatas = metadatas or [{} for _ in texts]
+        if len(metadatas) != len(texts):
+            raise ValueError("Number of texts and metadatas must match")
+        names: Dict[str, None] = {}
+        for metadata in metadatas:
+            names.update(dict.fromkeys(metadata))
+        columns = []
+        for name in names:
+            present = np.array([name in metadata for metadata in metadatas], dtype=bool)
+            raw = [metadata.get(name) for metadata in metadatas]
+            columns.append(Column.build(name, raw, present))
+        simhashes, token_counts = text_signatures(texts)
+        return cls(b"".join(encoded), offsets, columns, simhashes, token_counts)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def text_view(self, index: int) -> memoryview:
+        """UTF-8 bytes of chunk ``index`` without copying."""
+        return self._text[self.offsets[index] : self.offsets[index + 1]]
+
+    def text(self, index: int) -> str:
+        return str(self.text_view(index), "utf-8")
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        return {
+            name: column.value(index)
+            for name, column in self.columns.items()
+            if column.present[index]
+        }
+
+    def match(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Boolean mask of chunks whose metadata equals every filter value.
+
+        Args:
+            filters: Metadata key to required value
+
+        Returns:
+            np.ndarray: One bool per chunk
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for name, value in filters.items():
+            column = self.columns.get(name)
+            if column is None:
+                return np.zeros(len(self), dtype=bool)
+            mask &= column.equals(value)
+        return mask
+
+    def materialize(self, ids: Sequence[int], scores: Sequence[float]) -> List[Document]:
+        """Build ``Document`` objects for the given chunks only."""
+        return [
+            Document(
+                content=self.text(doc_id),
+                metadata={**self.metadata(doc_id), "id": int(doc_id)},
+                score=float(score),
+            )
+            for doc_id, score in zip(ids, scores, strict=True)
+        ]
+
+    def signatures(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """SimHashes and token counts of the given chunks."""
+        if self.simhashes is None or self.token_counts is None:
+            return text_signatures([self.text(doc_id) for doc_id in ids])
+        index = np.asarray(ids, dtype=np.int64)
+        return np.asarray(self.simhashes[index]), np.asarray(self.token_counts[index])
+
+    def nbytes(self) -> int:
+        """Bytes held by texts, offsets and columns."""
+        total = self._text.nbytes + self.offsets.nbytes
+        for column in self.columns.values():
+            total += column.values.nbytes + column.present.nbytes
+        return int(total)
+
+    def save(self, path: Path) -> None:
+        """Write the chunk store to the directory ``path``."""
+        path.mkdir(parents=True, exist_ok=True)
+        with open(path / "text.bin", "wb") as f:
+            f.write(self._text)
+            f.flush()
+            os.fsync(f.fileno())
+        np.save(path / "offsets.npy", np.asarray(self.offsets, dtype=np.int64))
+        schema = []
+        for index, column in enumerate(self.columns.values()):
+            np.save(path / f"col-{index}.npy", np.asarray(column.values))
+            np.save(path / f"col-{index}-present.npy", np.asarray(column.present))
+            schema.append({"name": column.name, "kind": column.kind, "dictionary": column.dictionary})
+        (path / COLUMNS_FILE).write_text(json.dumps({"columns": schema}), encoding="utf-8")
+        if self.simhashes is not None and self.token_counts is not None:
+            np.save(path / "simhash.npy", np.asarray(self.simhashes, dtype=np.uint64))
+            np.save(path / "tokens.npy", np.asarray(self.token_counts, dtype=np.int32))
+
+    @classmethod
+    def load(cls, path: Path) -> "ChunkStore":
+        """Open a chunk store written with ``save``, memory-mapping its files."""
+        path = Path(path)
+        with open(path / "text.bin", "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap refuses empty files; an empty store has no text to map
+            text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        with open(path / COLUMNS_FILE, encoding="utf-8") as f:
+            schema = json.load(f)["columns"]
+        columns = [
+            Column(
+                entry["name"],
+                entry["kind"],
+                np.load(path / f"col-{index}.npy", mmap_mode="r"),
+                np.load(path / f"col-{index}-present.npy", mmap_mode="r"),
+                entry.get("dictionary"),
+            )
+            for index, entry in enumerate(schema)
+        ]
+        simhashes = token_counts = None
+        if (path / "simhash.npy").is_file() and (path / "tokens.npy").is_file():
+            simhashes = np.load(path / "simhash.npy", mmap_mode="r")
+            token_counts = np.load(path / "tokens.npy", mmap_mode="r")
+        return cls(text, offsets, columns, simhashes, token_counts)
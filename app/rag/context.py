@@ -0,0 +1,129 @@
+"""
+Context assembly between retrieval and generation.
+
+Stores A, B, C and the common store often return the same or nearly the
+same chunk. Before the prompt is built, the merged candidates are packed:
+
+* a candidate whose SimHash is within ``max_distance`` bits of a chunk
+  already kept is dropped as a near-duplicate (the better-scoring copy is
+  kept, as candidates arrive best first);
+* chunks are taken in score order while their token counts fit into
+  ``token_budget``; a chunk that does not fit is skipped and smaller ones
+  after it may still be taken;
+* at most ``max_results`` chunks are kept.
+
+Signatures and token counts are computed once when chunks are stored (see
+``ChunkStore``), so packing only compares integers. Token counts are an
+approximation without a model tokenizer: words and punctuation marks.
+"""
+
+import hashlib
+import re
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.rag.embeddings import tokenize
+
+# Words and punctuation marks, the unit token budgets are counted in
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+# Words per shingle hashed into the SimHash
+SHINGLE_SIZE = 2
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of model tokens in ``text``."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of the word shingles of ``text``.
+
+    Copies of a text have the same hash and texts that differ in a word or
+    two are a few bits apart; unrelated texts differ in about half the bits.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return 0
+    shingles = [
+        " ".join(tokens[i : i + SHINGLE_SIZE]) for i in range(max(1, len(tokens) - SHINGLE_SIZE + 1))
+    ]
+    digests = b"".join(
+        hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles
+    )
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+
+def text_signatures(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    SimHashes and token counts of ``texts``.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: uint64 SimHashes and int32 token counts
+    """
+    hashes = np.fromiter((simhash(text) for text in texts), dtype=np.uint64, count=len(texts))
+    tokens = np.fromiter((count_tokens(text) for text in texts), dtype=np.int32, count=len(texts))
+    return hashes, tokens
+
+
+class PackedContext(NamedTuple):
+    """Outcome of packing candidates; entries are candidate positions."""
+    kept: List[int]
+    duplicates: List[Tuple[int, int, int]]  # (position, position of the kept copy, differing bits)
+    over_budget: List[int]
+    tokens: int
+
+
+def pack_context(
+    simhashes: np.ndarray,
+    token_counts: np.ndarray,
+    max_results: int,
+    token_budget: Optional[int] = None,
+    max_distance: Optional[int] = 8,
+) -> PackedContext:
+    """
+    Choose the candidates that go into the prompt.
+
+    Args:
+        simhashes: SimHash per candidate, best candidate first
+        token_counts: Token count per candidate
+        max_results: Maximum number of chunks kept
+        token_budget: Maximum total tokens of the kept chunks (None: no budget)
+        max_distance: Largest SimHash distance, in bits, that counts as a
+            near-duplicate (None: keep duplicates)
+
+    Returns:
+        PackedContext: Kept, duplicate and over-budget positions and the
+            kept chunks' total tokens
+    """
+    kept: List[int] = []
+    kept_hashes: List[int] = []
+    duplicates = []
+    over_budget = []
+    total = 0
+    pairs = zip(simhashes.tolist(), token_counts.tolist(), strict=True)
+    for position, (signature, tokens) in enumerate(pairs):
+        if len(kept) == max_results:
+            break
+        if max_distance is not None:
+            match = next(
+                (
+                    (index, distance)
+                    for index, other in enumerate(kept_hashes)
+                    if (distance := (signature ^ other).bit_count()) <= max_distance
+                ),
+                None,
+            )
+            if match is not None:
+                duplicates.append((position, kept[match[0]], match[1]))
+                continue
+        if token_budget is not None and total + tokens > token_budget:
+            over_budget.append(position)
+            continue
+        kept.append(position)
+        kept_hashes.append(signature)
+        total += tokens
+    return PackedContext(kept, duplicates, over_budget, total)
@@ -0,0 +1,106 @@
+"""
+Embedding models for the RAG system.
+
+This module provides the embedding interface used by the vector stores and a
+dependency-free hashing embedder that works offline, so stores can be built,
+probed and benchmarked without calling an external embedding provider.
+"""
+
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder(ABC):
+    """Base class for text embedding models."""
+
+    dim: int
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            np.ndarray: L2-normalised float32 matrix of shape (len(texts), dim)
+        """
+
+    @abstractmethod
+    def to_config(self) -> Dict[str, Any]:
+        """Return a JSON-serialisable description used to re-create the embedder."""
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """Embed a single query and return a 1-D vector."""
+        return self.embed([text])[0]
+
+
+class HashingEmbedder(Embedder):
+    """
+    Feature-hashing bag-of-words embedder.
+
+    Each token is hashed (with a stable hash, so vectors are identical across
+    processes) to a signed bucket. It has no model weights and needs no network
+    access, which makes it the default for tests, probes and fake providers.
+    """
+
+    def __init__(self, dim: int = 256):
+        if dim < 1:
+            raise ValueError("Embedding dimension must be positive")
+        self.dim = dim
+
+    def _bucket(self, token: str) -> Tuple[int, float]:
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as normalised signed token-hash counts."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                bucket, sign = self._bucket(token)
+                matrix[row, bucket] += sign
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+    def to_config(self) -> Dict[str, Any]:
+        return {"type": "hashing", "dim": self.dim}
+
+
+EMBEDDERS = {
+    "hashing": HashingEmbedder,
+}
+
+
+def create_embedder(config: Dict[str, Any]) -> Embedder:
+    """
+    Create an embedder from its stored configuration.
+
+    Args:
+        config: Output of ``Embedder.to_config()``
+
+    Returns:
+        Embedder: The re-created embedder
+
+    Raises:
+        ValueError: If the embedder type is unknown
+    """
+    params = dict(config)
+    embedder_type = params.pop("type", None)
+    if embedder_type not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder type: {embedder_type}")
+    return EMBEDDERS[embedder_type](**params)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into the lowercase word tokens used by the local embedders."""
+    return TOKEN_PATTERN.findall(text.lower())
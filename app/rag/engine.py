@@ -0,0 +1,407 @@
+"""
+RAG engine for AI Studio.
+
+The ``RAGEngine`` searches the configured vector stores concurrently, packs
+their results into the answer context and asks a language model to answer
+with that context. Candidates are merged as id and score arrays and packed
+by their stored signatures (``app.rag.context``): near-duplicates across
+stores are dropped and the context is kept within a token budget. Only the
+final sources are materialised into ``Document`` objects.
+
+Queries honour the active request context (``app.core.deadline``): stores
+that have not answered by the deadline are left out, an answer cut off by
+the deadline is returned as far as it was generated, and the response is
+then marked ``partial``.
+"""
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.api.models.responses import (
+    Document,
+    DocumentUpdateResult,
+    RAGResponse,
+    VectorStoreResult,
+)
+from app.core.deadline import (
+    RequestContext,
+    RequestInterrupted,
+    active_context,
+    current_context,
+)
+from app.models.base import Configuration
+from app.models.llm import CompletionRequest
+from app.models.manager import ModelManager
+from app.rag.context import PackedContext, pack_context
+from app.rag.sharded import SearchPool, ShardedVectorStore
+from app.rag.vector_stores import (
+    FlatVectorStore,
+    SegmentedVectorStore,
+    VectorStore,
+    discover_vector_stores,
+    open_vector_store,
+    top_k_indices,
+)
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant. Answer the question using the numbered "
+    "context passages and cite them by number."
+)
+
+
+def build_prompt(query: str, sources: List[Document]) -> str:
+    """Format the retrieved sources and the question into a prompt."""
+    context = "\n".join(f"[{i}] {doc.content}" for i, doc in enumerate(sources, start=1))
+    return f"Context:\n{context}\n\nQuestion: {query}"
+
+
+def merge_candidates(
+    hits: List[Tuple[np.ndarray, np.ndarray]], top_k: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pick the best ``top_k`` candidates across stores.
+
+    Args:
+        hits: Ids and scores per store
+        top_k: Number of candidates to keep
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Store position, id and
+            score of each kept candidate, best first (ties keep store order)
+    """
+    if not hits:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+    ids = np.concatenate([store_ids for store_ids, _ in hits])
+    scores = np.concatenate([store_scores for _, store_scores in hits])
+    stores = np.repeat(np.arange(len(hits)), [len(store_ids) for store_ids, _ in hits])
+    selected = top_k_indices(scores, top_k)
+    return stores[selected], ids[selected], scores[selected]
+
+
+class RAGEngine:
+    """Retrieval-augmented generation over several vector stores."""
+
+    def __init__(
+        self,
+        vector_stores: Dict[str, VectorStore],
+        model_manager: ModelManager,
+        default_model: str,
+        search_pool: Optional[SearchPool] = None,
+        compaction_interval: float = 30.0,
+        context_token_budget: Optional[int] = 2000,
+        context_dedup_distance: Optional[int] = 8,
+    ):
+        self.vector_stores = vector_stores
+        self.model_manager = model_manager
+        self.default_model = default_model
+        self.search_pool = search_pool
+        self.compaction_interval = compaction_interval
+        self.context_token_budget = context_token_budget
+        self.context_dedup_distance = context_dedup_distance
+
+    @classmethod
+    def from_config(cls, config: Configuration, model_manager: ModelManager) -> "RAGEngine":
+        """
+        Open every vector store under ``config.vector_store_path``.
+
+        Stores that fail to open are skipped (and reported by the health
+        check) so one broken store does not prevent the server from starting.
+        With ``config.search_shards > 1`` flat stores are searched in a
+        shared pool of that many worker processes.
+        """
+        stores: Dict[str, VectorStore] = {}
+        for name, path in discover_vector_stores(Path(config.vector_store_path)).items():
+            try:
+                stores[name] = open_vector_store(path)
+            except Exception:
+                logger.exception("Failed to open vector store %s", path)
+
+        search_pool = None
+        if config.search_shards > 1 and any(isinstance(s, FlatVectorStore) for s in stores.values()):
+            search_pool = SearchPool(config.search_shards)
+            stores = {
+                name: ShardedVectorStore(store, search_pool) if isinstance(store, FlatVectorStore) else store
+                for name, store in stores.items()
+            }
+        return cls(
+            stores,
+            model_manager,
+            config.default_model,
+            search_pool,
+            config.compaction_interval,
+            config.context_token_budget,
+            config.context_dedup_distance,
+        )
+
+    def on_config_reload(self, config: Configuration) -> None:
+        """Follow default model, compaction and context packing changes from a configuration reload."""
+        self.default_model = config.default_model
+        self.compaction_interval = config.compaction_interval
+        self.context_token_budget = config.context_token_budget
+        self.context_dedup_distance = config.context_dedup_distance
+
+    def close(self) -> None:
+        """Release the stores' shared resources and stop the search pool."""
+        for store in self.vector_stores.values():
+            store.close()
+        if self.search_pool is not None:
+            self.search_pool.close()
+
+    def _updatable_store(self, store_name: str) -> SegmentedVectorStore:
+        store = self.vector_stores.get(store_name)
+        if store is None:
+            raise ValueError(f"Unknown vector stores: {store_name}")
+        if not isinstance(store, SegmentedVectorStore):
+            raise ValueError(
+                f"Vector store {store_name} is read-only ({store.format_name}); "
+                "convert it with `ais segment`"
+            )
+        return store
+
+    async def upsert_documents(
+        self,
+        store_name: str,
+        keys: List[str],
+        texts: List[str],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> DocumentUpdateResult:
+        """
+        Insert or replace documents in an updatable store.
+
+        The update is logged and fsynced before this returns, and searches
+        see it immediately.
+
+        Raises:
+            ValueError: If the store is unknown or not updatable
+        """
+        store = self._updatable_store(store_name)
+        written = await asyncio.to_thread(store.upsert, keys, texts, metadatas)
+        return DocumentUpdateResult(
+            store_name=store_name, written=written, documents=len(store), segments=store.segment_count
+        )
+
+    async def delete_documents(self, store_name: str, keys: List[str]) -> DocumentUpdateResult:
+        """
+        Delete documents from an updatable store by key.
+
+        Raises:
+            ValueError: If the store is unknown or not updatable
+        """
+        store = self._updatable_store(store_name)
+        deleted = await asyncio.to_thread(store.delete, keys)
+        return DocumentUpdateResult(
+            store_name=store_name, deleted=deleted, documents=len(store), segments=store.segment_count
+        )
+
+    async def compact_stores(self) -> List[str]:
+        """Compact the updatable stores that need it and return their names."""
+        compacted = []
+        for name, store in self.vector_stores.items():
+            if isinstance(store, SegmentedVectorStore) and store.needs_compaction():
+                try:
+                    if await asyncio.to_thread(store.compact):
+                        compacted.append(name)
+                except Exception:
+                    logger.exception("Compacting vector store %s failed", name)
+        return compacted
+
+    async def compact_periodically(self) -> None:
+        """Compact stores forever; run as a background task in the server."""
+        while True:
+            await asyncio.sleep(self.compaction_interval)
+            await self.compact_stores()
+
+    def _check_store_names(self, store_names: Optional[List[str]]) -> List[str]:
+        names = store_names or list(self.vector_stores)
+        unknown = [name for name in names if name not in self.vector_stores]
+        if unknown:
+            raise ValueError(f"Unknown vector stores: {', '.join(unknown)}")
+        return names
+
+    async def _search_ids(
+        self, store: VectorStore, query: str, top_k: int, filters: Optional[Dict[str, Any]]
+    ) -> Tuple[np.ndarray, np.ndarray, float]:
+        def search() -> Tuple[np.ndarray, np.ndarray]:
+            # The thread cannot be cancelled; skip the work if the request
+            # was interrupted before the thread got to it
+            current_context().check()
+            return store.search_vectors(store.embedder.embed_query(query), top_k, filters)
+
+        start_time = time.perf_counter()
+        ids, scores = await asyncio.to_thread(search)
+        return ids, scores, time.perf_counter() - start_time
+
+    async def query(
+        self,
+        query: str,
+        store_names: Optional[List[str]] = None,
+        max_results: int = 5,
+        model: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> RAGResponse:
+        """
+        Retrieve context and generate an answer.
+
+        Args:
+            query: User question
+            store_names: Stores to search (all stores if None)
+            max_results: Maximum number of sources passed to the model
+            model: Model to answer with (defaults to the configured model)
+            filters: Metadata values every source must have
+
+        Returns:
+            RAGResponse: Answer, sources, retrieval metrics and the execution
+                trace. Each store's ``VectorStoreResult`` carries the scores of
+                all its candidates but only those of its documents that became
+                sources. If the request deadline passed or the request was
+                cancelled, the response holds what was done and is ``partial``.
+        """
+        if not query.strip():
+            raise ValueError("Query cannot be empty")
+        names = self._check_store_names(store_names)
+        context = active_context() or RequestContext()
+        with context.activate():
+            return await self._query(context, query, names, max_results, model, filters)
+
+    def _pack(
+        self,
+        names: List[str],
+        store_positions: np.ndarray,
+        candidate_ids: np.ndarray,
+        max_results: int,
+        details: Dict[str, Any],
+    ) -> PackedContext:
+        """Pack the merged candidates and record what was dropped in ``details``."""
+        simhashes = np.zeros(len(candidate_ids), dtype=np.uint64)
+        token_counts = np.zeros(len(candidate_ids), dtype=np.int32)
+        for index, name in enumerate(names):
+            positions = np.flatnonzero(store_positions == index)
+            if positions.size:
+                store = self.vector_stores[name]
+                simhashes[positions], token_counts[positions] = store.get_signatures(
+                    candidate_ids[positions].tolist()
+                )
+        packed = pack_context(
+            simhashes, token_counts, max_results, self.context_token_budget, self.context_dedup_distance
+        )
+
+        def describe(position: int) -> Dict[str, Any]:
+            return {"store": names[store_positions[position]], "id": int(candidate_ids[position])}
+
+        details.update(
+            candidates=len(candidate_ids),
+            kept=len(packed.kept),
+            tokens=packed.tokens,
+            token_budget=self.context_token_budget,
+            duplicates=[
+                {**describe(position), "duplicate_of": describe(original), "distance": distance}
+                for position, original, distance in packed.duplicates
+            ],
+            over_budget=[
+                {**describe(position), "tokens": int(token_counts[position])}
+                for position in packed.over_budget
+            ],
+        )
+        return packed
+
+    async def _query(
+        self,
+        context: RequestContext,
+        query: str,
+        names: List[str],
+        max_results: int,
+        model: Optional[str],
+        filters: Optional[Dict[str, Any]],
+    ) -> RAGResponse:
+        start_time = time.perf_counter()
+        async with context.stage("retrieval", f"Search {len(names)} vector store(s)") as details:
+            results = await context.gather_partial(
+                [self._search_ids(self.vector_stores[name], query, max_results, filters) for name in names]
+            )
+            details["timed_out"] = [name for name, hit in zip(names, results, strict=True) if hit is None]
+        partial = bool(details["timed_out"])
+        answered = [name for name, hit in zip(names, results, strict=True) if hit is not None]
+        hits = [hit for hit in results if hit is not None]
+
+        # Every candidate, best first; packing decides which become sources
+        store_positions, candidate_ids, candidate_scores = merge_candidates(
+            [(ids, scores) for ids, scores, _ in hits], sum(len(ids) for ids, _, _ in hits)
+        )
+        async with context.stage("context", "Pack the context into the token budget") as details:
+            packed = self._pack(answered, store_positions, candidate_ids, max_results, details)
+        kept = np.asarray(packed.kept, dtype=np.int64)
+        store_positions = store_positions[kept]
+        source_ids = candidate_ids[kept]
+        source_scores = candidate_scores[kept]
+
+        store_documents: Dict[str, List[Document]] = {name: [] for name in answered}
+        sources: List[Document] = [None] * len(source_ids)
+        for index, name in enumerate(answered):
+            positions = np.flatnonzero(store_positions == index)
+            if positions.size == 0:
+                continue
+            documents = self.vector_stores[name].get_documents(
+                source_ids[positions].tolist(), source_scores[positions].tolist()
+            )
+            store_documents[name] = documents
+            for position, document in zip(positions.tolist(), documents, strict=True):
+                sources[position] = document
+        retrieval_time = time.perf_counter() - start_time
+
+        model_name = model or self.default_model
+        request = CompletionRequest(
+            model=model_name, prompt=build_prompt(query, sources), system=SYSTEM_PROMPT
+        )
+        chunks: List[str] = []
+
+        async def generate() -> None:
+            async for chunk in self.model_manager.stream(request):
+                chunks.append(chunk)
+
+        generation_start = time.perf_counter()
+        try:
+            async with context.stage("generation", f"Generate the answer with {model_name}") as details:
+                self.model_manager.get_provider(model_name)
+                await context.guard(generate())
+                details["chunks"] = len(chunks)
+        except RequestInterrupted:
+            # Keep whatever was streamed before the deadline or cancellation
+            partial = True
+        generation_time = time.perf_counter() - generation_start
+
+        store_results = {}
+        for name, (_, scores, elapsed) in zip(answered, hits, strict=True):
+            score_list = scores.tolist()
+            store_results[name] = VectorStoreResult(
+                store_name=name,
+                documents=store_documents[name],
+                scores=score_list,
+                retrieval_time=elapsed,
+                quality_score=sum(score_list) / len(score_list) if score_list else 0.0,
+            )
+
+        return RAGResponse(
+            query=query,
+            answer="".join(chunks),
+            sources=sources,
+            retrieval_metrics={
+                "retrieval_time": retrieval_time,
+                "generation_time": generation_time,
+                "candidates": float(sum(len(ids) for ids, _, _ in hits)),
+                "context_tokens": float(packed.tokens),
+                "dropped_duplicates": float(len(packed.duplicates)),
+                "dropped_over_budget": float(len(packed.over_budget)),
+            },
+            execution_time=time.perf_counter() - start_time,
+            vector_store_results=store_results,
+            partial=partial,
+            trace=context.trace(),
+        )
@@ -0,0 +1,299 @@
+"""
+Sharded vector search across a process pool.
+
+A ``ShardedVectorStore`` splits a flat store's vectors into contiguous row
+segments and searches them in parallel worker processes, so brute-force
+search is not limited to the one core the GIL allows a single process.
+
+Workers never receive the vectors themselves. Stores opened from disk hand
+out (file, offset) descriptors and each worker memory-maps its segment of
+``vectors.npy``; in-memory stores copy their vectors once into
+``multiprocessing.shared_memory`` blocks that workers attach to. Per query
+only the query vector and each shard's top-k ids and scores cross process
+boundaries.
+
+Each shard returns its top-k ordered by score and then id, and the merge
+uses the same tie-break, so results are identical to ``FlatVectorStore``.
+
+Workers cache the segments they attach. Every sharded store is a new
+generation of the store it shards; attaching a segment of a newer
+generation releases the worker's segments of older ones, and the cache is
+capped at ``MAX_ATTACHED`` segments, least recently used out first. So
+shared memory unlinked by a closed store is unmapped in the workers too.
+"""
+
+import itertools
+import multiprocessing
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.api.models.responses import Document
+from app.rag.vector_stores import FlatVectorStore, VectorStore, top_k_indices
+
+
+class SegmentSpec(NamedTuple):
+    """Where a worker finds one shard's vectors."""
+    source: str  # "file" (memory-mapped .npy) or "shm" (shared memory block)
+    name: str  # file path or shared memory name
+    offset: int  # byte offset of the shard's first row
+    rows: int
+    dim: int
+    start: int  # store id of the shard's first row
+    owner: str  # name of the sharded store
+    generation: int  # increases with every sharded store the parent creates
+
+
+# Segments a worker keeps attached at most
+MAX_ATTACHED = 256
+
+# Worker-side cache of attached segments (and the handles keeping them
+# alive), least recently used first
+_ATTACHED: "OrderedDict[SegmentSpec, Tuple[Any, np.ndarray]]" = OrderedDict()
+
+# Parent-side source of segment generations
+_generations = itertools.count(1)
+
+
+def _release(spec: SegmentSpec) -> None:
+    handle, array = _ATTACHED.pop(spec)
+    # The view must go before the block it points into can be closed
+    del array
+    if handle is not None:
+        handle.close()
+
+
+def _attach(spec: SegmentSpec) -> np.ndarray:
+    cached = _ATTACHED.get(spec)
+    if cached is not None:
+        _ATTACHED.move_to_end(spec)
+        return cached[1]
+
+    for old in [s for s in _ATTACHED if s.owner == spec.owner and s.generation < spec.generation]:
+        _release(old)
+    while len(_ATTACHED) >= MAX_ATTACHED:
+        _release(next(iter(_ATTACHED)))
+    if spec.source == "shm":
+        handle = shared_memory.SharedMemory(name=spec.name)
+        array = np.ndarray(
+            (spec.rows, spec.dim), dtype=np.float32, buffer=handle.buf, offset=spec.offset
+        )
+    else:
+        handle = None
+        array = np.memmap(
+            spec.name, dtype=np.float32, mode="r", offset=spec.offset, shape=(spec.rows, spec.dim)
+        )
+    _ATTACHED[spec] = (handle, array)
+    return array
+
+
+def search_segment(
+    spec: SegmentSpec,
+    query_vector: np.ndarray,
+    top_k: int,
+    mask_bits: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search one shard (runs in a worker process).
+
+    Args:
+        spec: Shard location
+        query_vector: float32 query embedding
+        top_k: Results to return from this shard
+        mask_bits: ``np.packbits`` of the shard's filter mask, if filtering
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Store ids and scores, best first
+    """
+    scores = _attach(spec) @ query_vector
+    if mask_bits is not None:
+        mask = np.unpackbits(mask_bits, count=spec.rows).astype(bool)
+        top_k = min(top_k, int(mask.sum()))
+        scores = np.where(mask, scores, -np.inf).astype(np.float32, copy=False)
+    ids = top_k_indices(scores, top_k)
+    return ids + spec.start, scores[ids]
+
+
+def _ready() -> bool:
+    return True
+
+
+class SearchPool:
+    """
+    Worker processes shared by every sharded store of an application.
+
+    Workers are started with ``spawn`` so they never inherit the server's
+    threads or event loop.
+    """
+
+    def __init__(self, processes: int):
+        if processes < 1:
+            raise ValueError("A search pool needs at least one process")
+        self.processes = processes
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def warm_up(self) -> None:
+        """Start every worker now instead of on the first queries."""
+        for future in [self._executor.submit(_ready) for _ in range(self.processes * 2)]:
+            future.result()
+
+    def map_segments(
+        self,
+        segments: Sequence[SegmentSpec],
+        query_vector: np.ndarray,
+        top_k: int,
+        masks: Optional[Sequence[np.ndarray]] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Search ``segments`` in parallel and return their results in order."""
+        futures = [
+            self._executor.submit(
+                search_segment, spec, query_vector, top_k, None if masks is None else masks[index]
+            )
+            for index, spec in enumerate(segments)
+        ]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ShardedVectorStore(VectorStore):
+    """
+    A flat store searched shard by shard in a ``SearchPool``.
+
+    Documents, filters and persistence are delegated to the wrapped store;
+    only the scoring is distributed.
+
+    Args:
+        store: Flat store to search
+        pool: Worker processes to search in
+        shards: Number of segments (default: one per pool process)
+        owns_pool: Shut the pool down in ``close``
+    """
+
+    def __init__(
+        self,
+        store: FlatVectorStore,
+        pool: SearchPool,
+        shards: Optional[int] = None,
+        owns_pool: bool = False,
+    ):
+        super().__init__(store.name, store.embedder)
+        self.store = store
+        self.format_name = store.format_name
+        self.pool = pool
+        self.owns_pool = owns_pool
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.segments = self._create_segments(store.vectors, shards or pool.processes)
+
+    def _create_segments(self, vectors: np.ndarray, shards: int) -> List[SegmentSpec]:
+        rows, dim = vectors.shape
+        bounds = np.linspace(0, rows, max(1, min(shards, rows)) + 1).astype(int)
+        file_backed = (
+            isinstance(vectors, np.memmap)
+            and vectors.filename is not None
+            and vectors.dtype == np.float32
+            and vectors.flags.c_contiguous
+        )
+        generation = next(_generations)
+        segments = []
+        for start, end in zip(bounds[:-1], bounds[1:], strict=True):
+            row_bytes = dim * 4
+            if file_backed:
+                segments.append(
+                    SegmentSpec(
+                        "file", str(Path(vectors.filename)), vectors.offset + start * row_bytes,
+                        end - start, dim, start, self.name, generation,
+                    )
+                )
+                continue
+            block = shared_memory.SharedMemory(create=True, size=max(1, (end - start) * row_bytes))
+            self._blocks.append(block)
+            target = np.ndarray((end - start, dim), dtype=np.float32, buffer=block.buf)
+            target[:] = vectors[start:end]
+            segments.append(
+                SegmentSpec("shm", block.name, 0, end - start, dim, start, self.name, generation)
+            )
+        return segments
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+    def search_vectors(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query_vector = np.ascontiguousarray(query_vector, dtype=np.float32)
+        masks = None
+        if filters:
+            mask = self.store.chunks.match(filters)
+            masks = [np.packbits(mask[spec.start : spec.start + spec.rows]) for spec in self.segments]
+        results = self.pool.map_segments(self.segments, query_vector, top_k, masks)
+        ids = np.concatenate([shard_ids for shard_ids, _ in results])
+        scores = np.concatenate([shard_scores for _, shard_scores in results])
+        # Shards are in id order and each is sorted by (score, id), so the
+        # positional tie-break of top_k_indices keeps the lower id first
+        order = top_k_indices(scores, top_k)
+        return ids[order], scores[order]
+
+    def index_nbytes(self) -> int:
+        return self.store.index_nbytes()
+
+    def get_documents(self, ids: Sequence[int], scores: Sequence[float]) -> List[Document]:
+        return self.store.get_documents(ids, scores)
+
+    def get_signatures(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.store.get_signatures(ids)
+
+    def save(self, path: Path) -> None:
+        self.store.save(path)
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        manifest: Dict[str, Any],
+        pool: Optional[SearchPool] = None,
+        shards: Optional[int] = None,
+    ) -> "ShardedVectorStore":
+        """
+        Open a saved flat store and shard it.
+
+        A sharded store is saved as the flat store it wraps, so
+        ``open_vector_store`` returns the flat store; this re-shards it.
+
+        Args:
+            path: Store directory
+            manifest: The store's manifest
+            pool: Worker processes to search in (default: a new pool of
+                ``shards`` processes, owned by the store)
+            shards: Number of segments (default: one per pool process, and
+                one process per CPU for a new pool)
+
+        Raises:
+            ValueError: If the saved store is not a flat store
+        """
+        if manifest.get("format") != FlatVectorStore.format_name:
+            raise ValueError(f"Only flat stores can be sharded, not {manifest.get('format')!r}")
+        store = FlatVectorStore.load(path, manifest)
+        if pool is None:
+            return cls(store, SearchPool(shards or os.cpu_count() or 1), shards, owns_pool=True)
+        return cls(store, pool, shards)
+
+    def close(self) -> None:
+        """Release the shared memory blocks (and the pool, if owned)."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+        if self.owns_pool:
+            self.pool.close()
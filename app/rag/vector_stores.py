@@ -0,0 +1,1074 @@
+"""
+Vector store management for the RAG system.
+
+A vector store is a directory under ``Configuration.vector_store_path``
+containing a ``manifest.json`` that names its format, plus the format's data
+files. Stores are opened read-only with memory-mapped arrays so that several
+server workers share one copy of the index through the OS page cache.
+
+Searches work on ids and scores; ``Document`` objects are only built by
+``get_documents`` for the results that are actually returned.
+
+Flat and quantized stores are written once; ``SegmentedVectorStore`` takes
+upserts and deletes through a write-ahead log.
+"""
+
+import fcntl
+import json
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from app.api.models.responses import Document
+from app.rag.chunk_store import ChunkStore
+from app.rag.context import text_signatures
+from app.rag.embeddings import Embedder, HashingEmbedder, create_embedder
+from app.rag.quantization import QUANTIZERS, Quantizer, create_quantizer
+from app.rag.wal import WalRecord, WriteAheadLog, read_log
+
+MANIFEST_FILE = "manifest.json"
+CHUNKS_DIR = "chunks"
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Return the indices of the ``top_k`` highest scores, best first.
+
+    Ties are broken by the lower index so results are deterministic no matter
+    how the candidates were partitioned.
+
+    Args:
+        scores: 1-D array of scores
+        top_k: Number of results to keep
+
+    Returns:
+        np.ndarray: Indices into ``scores``
+    """
+    count = scores.shape[0]
+    if top_k <= 0 or count == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k < count:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        # Pull in every index tied with the k-th score so the tie-break below
+        # sees all of them, not an arbitrary subset chosen by argpartition
+        threshold = scores[candidates].min()
+        candidates = np.flatnonzero(scores >= threshold)
+    else:
+        candidates = np.arange(count)
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order][:top_k].astype(np.int64)
+
+
+class VectorStore(ABC):
+    """Base class for vector stores."""
+
+    format_name: str = ""
+
+    def __init__(self, name: str, embedder: Embedder):
+        self.name = name
+        self.embedder = embedder
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of documents in the store."""
+
+    @abstractmethod
+    def search_vectors(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the store with an embedded query.
+
+        Args:
+            query_vector: 1-D normalised query embedding
+            top_k: Maximum number of results
+            filters: Metadata values every result must have
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Document ids and scores, best first
+        """
+
+    @abstractmethod
+    def get_documents(self, ids: Sequence[int], scores: Sequence[float]) -> List[Document]:
+        """Materialise ``Document`` objects for the given ids and scores."""
+
+    def get_signatures(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        SimHashes and token counts of the given documents, for context packing.
+
+        Stores keeping them in a ``ChunkStore`` look them up; the default
+        computes them from the materialised documents.
+        """
+        documents = self.get_documents(ids, [0.0] * len(ids))
+        return text_signatures([document.content for document in documents])
+
+    @abstractmethod
+    def index_nbytes(self) -> int:
+        """Bytes held by the search structures (vectors, codes, codebooks)."""
+
+    @abstractmethod
+    def save(self, path: Path) -> None:
+        """Write the store to ``path`` including its manifest."""
+
+    @classmethod
+    @abstractmethod
+    def load(cls, path: Path, manifest: Dict[str, Any]) -> "VectorStore":
+        """Open a store previously written with ``save``."""
+
+    def close(self) -> None:  # noqa: B027 - optional hook, most stores hold nothing
+        """Release resources held outside the Python heap (no-op by default)."""
+
+    def search(
+        self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """
+        Embed ``query`` and return the best matching documents.
+
+        Args:
+            query: Query text
+            top_k: Maximum number of documents
+            filters: Metadata values every result must have
+
+        Returns:
+            List[Document]: Matching documents, best first
+        """
+        ids, scores = self.search_vectors(self.embedder.embed_query(query), top_k, filters)
+        return self.get_documents(ids.tolist(), scores.tolist())
+
+    def _write_manifest(self, path: Path, extra: Optional[Dict[str, Any]] = None) -> None:
+        manifest = {
+            "name": self.name,
+            "format": self.format_name,
+            "count": len(self),
+            "embedder": self.embedder.to_config(),
+            **(extra or {}),
+        }
+        _atomic_write_text(path / MANIFEST_FILE, json.dumps(manifest, indent=2))
+
+
+class FlatVectorStore(VectorStore):
+    """Exact (brute-force) inner-product search over float32 vectors."""
+
+    format_name = "flat"
+
+    def __init__(
+        self,
+        name: str,
+        vectors: np.ndarray,
+        chunks: ChunkStore,
+        embedder: Embedder,
+    ):
+        super().__init__(name, embedder)
+        if vectors.shape[0] != len(chunks):
+            raise ValueError("Number of vectors and documents must match")
+        self.vectors = vectors
+        self.chunks = chunks
+
+    @classmethod
+    def from_texts(
+        cls,
+        name: str,
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+        embedder: Optional[Embedder] = None,
+    ) -> "FlatVectorStore":
+        """
+        Build an in-memory store by embedding ``texts``.
+
+        Args:
+            name: Store name
+            texts: Document contents
+            metadatas: Optional metadata per document
+            embedder: Embedder to use (defaults to ``HashingEmbedder``)
+
+        Returns:
+            FlatVectorStore: The new store
+        """
+        embedder = embedder or HashingEmbedder()
+        vectors = embedder.embed(texts)
+        return cls(name, vectors, ChunkStore.from_records(texts, metadatas), embedder)
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search_vectors(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.vectors @ query_vector.astype(np.float32, copy=False)
+        if filters:
+            mask = self.chunks.match(filters)
+            top_k = min(top_k, int(mask.sum()))
+            scores = np.where(mask, scores, -np.inf).astype(np.float32, copy=False)
+        ids = top_k_indices(scores, top_k)
+        return ids, scores[ids]
+
+    def index_nbytes(self) -> int:
+        return int(self.vectors.nbytes)
+
+    def get_documents(self, ids: Sequence[int], scores: Sequence[float]) -> List[Document]:
+        return self.chunks.materialize(ids, scores)
+
+    def get_signatures(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.chunks.signatures(ids)
+
+    def save(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+        self.chunks.save(path / CHUNKS_DIR)
+        self._write_manifest(path, {"dim": int(self.vectors.shape[1]), "chunks": CHUNKS_DIR})
+
+    @classmethod
+    def load(cls, path: Path, manifest: Dict[str, Any]) -> "FlatVectorStore":
+        vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        if "chunks" in manifest:
+            chunks = ChunkStore.load(path / manifest["chunks"])
+        else:
+            chunks = _load_legacy_documents(path / "documents.jsonl")
+        return cls(manifest["name"], vectors, chunks, create_embedder(manifest["embedder"]))
+
+
+def _load_legacy_documents(path: Path) -> ChunkStore:
+    """Read the ``documents.jsonl`` layout written before chunk stores existed."""
+    texts = []
+    metadatas = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                texts.append(record["content"])
+                metadatas.append(record.get("metadata", {}))
+    return ChunkStore.from_records(texts, metadatas)
+
+
+class QuantizedVectorStore(VectorStore):
+    """
+    Search on quantized codes, then rescore a shortlist exactly.
+
+    Only the codes and quantizer parameters need to be resident in memory.
+    The full-precision vectors are memory-mapped from disk and only the
+    ``rescore_factor * top_k`` shortlisted rows are read per query, so the
+    final ranking uses exact scores.
+    """
+
+    format_name = "quantized"
+
+    def __init__(
+        self,
+        name: str,
+        quantizer: Quantizer,
+        codes: np.ndarray,
+        vectors: np.ndarray,
+        chunks: ChunkStore,
+        embedder: Embedder,
+        rescore_factor: int = 4,
+    ):
+        super().__init__(name, embedder)
+        if not codes.shape[0] == vectors.shape[0] == len(chunks):
+            raise ValueError("Number of codes, vectors and documents must match")
+        self.quantizer = quantizer
+        self.codes = codes
+        self.vectors = vectors
+        self.chunks = chunks
+        self.rescore_factor = rescore_factor
+
+    @classmethod
+    def from_flat(
+        cls, store: FlatVectorStore, quantizer: str = "int8", rescore_factor: int = 4, **params: Any
+    ) -> "QuantizedVectorStore":
+        """
+        Quantize an existing flat store.
+
+        Args:
+            store: Store whose vectors are trained on and encoded
+            quantizer: ``"int8"`` or ``"pq"``
+            rescore_factor: Shortlist size as a multiple of ``top_k`` (0
+                disables rescoring)
+            **params: Quantizer settings, e.g. ``subspaces=32``
+
+        Returns:
+            QuantizedVectorStore: Store sharing the vectors and chunks of ``store``
+        """
+        trained = create_quantizer(quantizer, **params)
+        trained.train(store.vectors)
+        return cls(
+            store.name,
+            trained,
+            trained.encode(store.vectors),
+            store.vectors,
+            store.chunks,
+            store.embedder,
+            rescore_factor,
+        )
+
+    def __len__(self) -> int:
+        return len(self.chunks)
+
+    def search_vectors(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+        rescore: bool = True,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query_vector = query_vector.astype(np.float32, copy=False)
+        # Only rows the filter matches are scored, so neither the shortlist
+        # nor the results can contain a chunk the filter excludes
+        candidates = np.flatnonzero(self.chunks.match(filters)) if filters else None
+        codes = self.codes if candidates is None else self.codes[candidates]
+        scores = self.quantizer.score(codes, query_vector)
+        if not rescore or self.rescore_factor <= 0:
+            positions = top_k_indices(scores, top_k)
+            ids = positions if candidates is None else candidates[positions]
+            return ids, scores[positions]
+
+        positions = np.sort(top_k_indices(scores, top_k * self.rescore_factor))
+        shortlist = positions if candidates is None else candidates[positions]
+        exact = np.asarray(self.vectors[shortlist], dtype=np.float32) @ query_vector
+        order = top_k_indices(exact, top_k)
+        return shortlist[order], exact[order]
+
+    def index_nbytes(self) -> int:
+        """Resident bytes: codes and quantizer parameters (vectors stay on disk)."""
+        return int(self.codes.nbytes) + self.quantizer.nbytes()
+
+    def get_documents(self, ids: Sequence[int], scores: Sequence[float]) -> List[Document]:
+        return self.chunks.materialize(ids, scores)
+
+    def get_signatures(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        return self.chunks.signatures(ids)
+
+    def save(self, path: Path) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+        np.save(path / "codes.npy", self.codes)
+        np.savez(path / "quantizer.npz", **self.quantizer.arrays())
+        self.chunks.save(path / CHUNKS_DIR)
+        self._write_manifest(
+            path,
+            {
+                "dim": int(self.vectors.shape[1]),
+                "chunks": CHUNKS_DIR,
+                "quantizer": self.quantizer.to_config(),
+                "rescore_factor": self.rescore_factor,
+            },
+        )
+
+    @classmethod
+    def load(cls, path: Path, manifest: Dict[str, Any]) -> "QuantizedVectorStore":
+        config = manifest["quantizer"]
+        with np.load(path / "quantizer.npz") as saved:
+            quantizer = QUANTIZERS[config["type"]].from_saved(config, dict(saved))
+        return cls(
+            manifest["name"],
+            quantizer,
+            # Codes are what searches scan, so they are read into memory;
+            # the vectors are only touched for the shortlist
+            np.load(path / "codes.npy"),
+            np.load(path / "vectors.npy", mmap_mode="r"),
+            ChunkStore.load(path / manifest["chunks"]),
+            create_embedder(manifest["embedder"]),
+            manifest.get("rescore_factor", 4),
+        )
+
+
+SEGMENT_PREFIX = "seg-"
+SEGMENT_FILE = "segment.json"
+WAL_FILE = "wal.log"
+LOCK_FILE = "writer.lock"
+
+# Document ids of a segmented store are ``segment number << 32 | row``, so
+# they stay valid while later writes, flushes and compactions happen
+SEGMENT_ID_SHIFT = 32
+ROW_MASK = (1 << SEGMENT_ID_SHIFT) - 1
+
+
+class _Segment:
+    """An immutable batch of rows of a ``SegmentedVectorStore``.
+
+    ``tombstones`` are ``(key, position)`` pairs: the key was deleted after
+    the segment's first ``position`` rows were written.
+    """
+
+    def __init__(
+        self,
+        number: int,
+        vectors: np.ndarray,
+        chunks: ChunkStore,
+        keys: List[str],
+        tombstones: List[Tuple[str, int]],
+    ):
+        self.number = number
+        self.vectors = vectors
+        self.chunks = chunks
+        self.keys = keys
+        self.tombstones = tombstones
+
+    @staticmethod
+    def dirname(number: int) -> str:
+        return f"{SEGMENT_PREFIX}{number:06d}"
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def save(self, path: Path) -> None:
+        """Write the segment to ``path`` and fsync it."""
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", np.ascontiguousarray(self.vectors, dtype=np.float32))
+        self.chunks.save(path / CHUNKS_DIR)
+        (path / SEGMENT_FILE).write_text(
+            json.dumps({"keys": self.keys, "tombstones": self.tombstones}), encoding="utf-8"
+        )
+        _fsync_tree(path)
+
+    @classmethod
+    def load(cls, path: Path, number: int) -> "_Segment":
+        with open(path / SEGMENT_FILE, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            number,
+            np.load(path / "vectors.npy", mmap_mode="r"),
+            ChunkStore.load(path / CHUNKS_DIR),
+            data["keys"],
+            [(key, position) for key, position in data["tombstones"]],
+        )
+
+
+class _MemTable:
+    """Rows and tombstones logged since the last flush."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.keys: List[str] = []
+        self.texts: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.vectors: List[np.ndarray] = []
+        self.tombstones: List[Tuple[str, int]] = []
+        self.live: List[bool] = []
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: str, text: str, metadata: Dict[str, Any], vector: np.ndarray) -> int:
+        self.keys.append(key)
+        self.texts.append(text)
+        self.metadatas.append(metadata)
+        self.vectors.append(vector)
+        self.live.append(True)
+        return len(self.keys) - 1
+
+    def to_segment(self, dim: int) -> _Segment:
+        vectors = np.stack(self.vectors) if self.vectors else np.empty((0, dim), dtype=np.float32)
+        return _Segment(
+            self.number,
+            vectors.astype(np.float32, copy=False),
+            ChunkStore.from_records(self.texts, self.metadatas),
+            list(self.keys),
+            list(self.tombstones),
+        )
+
+
+def _live_masks(segments: Sequence[Any]) -> Tuple[List[np.ndarray], Dict[str, Tuple[int, int]]]:
+    """
+    Replay the keys and tombstones of ``segments`` (oldest first).
+
+    Returns:
+        Tuple[List[np.ndarray], Dict[str, Tuple[int, int]]]: Per segment,
+            which rows hold the newest version of a live key; and the
+            (segment index, row) of every live key
+    """
+    masks = [np.zeros(len(segment), dtype=bool) for segment in segments]
+    locations: Dict[str, Tuple[int, int]] = {}
+
+    def kill(key: str) -> None:
+        location = locations.pop(key, None)
+        if location is not None:
+            masks[location[0]][location[1]] = False
+
+    for index, segment in enumerate(segments):
+        tombstones = iter(segment.tombstones)
+        pending = next(tombstones, None)
+        for row, key in enumerate(segment.keys):
+            while pending is not None and pending[1] <= row:
+                kill(pending[0])
+                pending = next(tombstones, None)
+            kill(key)
+            locations[key] = (index, row)
+            masks[index][row] = True
+        while pending is not None:
+            kill(pending[0])
+            pending = next(tombstones, None)
+    return masks, locations
+
+
+class _View(NamedTuple):
+    """What searches read: segments (memtable last), live masks and count."""
+    segments: Tuple[_Segment, ...]
+    masks: Tuple[np.ndarray, ...]
+    count: int
+
+
+class SegmentedVectorStore(VectorStore):
+    """
+    Exact search over an updatable, log-structured store.
+
+    Upserts and deletes are appended to a write-ahead log (``app.rag.wal``)
+    and applied to an in-memory memtable, which is searched next to the
+    immutable on-disk segments and written out as a new delta segment once it
+    holds ``flush_rows`` rows. A delete, or an upsert of an existing key,
+    hides the older row through the live masks; the row itself stays on disk
+    until ``compact`` merges the segments into one.
+
+    Searches read an immutable snapshot that writers swap in after each
+    batch, so they never wait for writes or compactions. Opening a store is
+    read-only; the first write takes an exclusive lock on the directory, so
+    only one process can update a store at a time.
+
+    Layout::
+
+        manifest.json     segment order, checkpointed log sequence number
+        wal.log           updates not yet in a segment
+        seg-000001/       vectors.npy, chunks/ and segment.json (keys, tombstones)
+    """
+
+    format_name = "segmented"
+
+    def __init__(
+        self,
+        name: str,
+        path: Path,
+        embedder: Embedder,
+        segments: List[_Segment],
+        checkpoint_seq: int = 0,
+        next_segment: int = 1,
+        flush_rows: int = 1024,
+        max_segments: int = 4,
+        max_dead_fraction: float = 0.25,
+    ):
+        super().__init__(name, embedder)
+        self.path = Path(path)
+        self.flush_rows = flush_rows
+        self.max_segments = max_segments
+        self.max_dead_fraction = max_dead_fraction
+        self._lock = threading.Lock()
+        self._compaction_lock = threading.Lock()
+        self._writer: Optional[WriteAheadLog] = None
+        self._lock_file: Optional[Any] = None
+
+        self._segments = list(segments)
+        self._checkpoint_seq = checkpoint_seq
+        self._last_seq = checkpoint_seq
+        self._memtable = _MemTable(next_segment)
+        self._next_segment = next_segment + 1
+        # Segments retired by the last compaction stay readable so ids handed
+        # out just before the swap can still be materialised
+        self._retired: Dict[int, _Segment] = {}
+        self._rebuild()
+
+        records, self._wal_bytes = read_log(self.path / WAL_FILE)
+        for record in records:
+            if record.seq > checkpoint_seq:
+                self._apply(record)
+        self._publish()
+
+    @classmethod
+    def create(cls, path: Path, name: str, embedder: Optional[Embedder] = None) -> "SegmentedVectorStore":
+        """
+        Create an empty store in ``path``.
+
+        Raises:
+            FileExistsError: If ``path`` already holds a store
+        """
+        path = Path(path)
+        if (path / MANIFEST_FILE).exists():
+            raise FileExistsError(f"A vector store already exists in {path}")
+        path.mkdir(parents=True, exist_ok=True)
+        store = cls(name, path, embedder or HashingEmbedder(), [])
+        store._write_store_manifest()
+        return store
+
+    @classmethod
+    def from_flat(
+        cls, store: VectorStore, path: Path, keys: Optional[Sequence[str]] = None
+    ) -> "SegmentedVectorStore":
+        """
+        Write a flat or quantized store as the first segment of a new store.
+
+        Args:
+            store: Store providing ``vectors`` and ``chunks``
+            path: Directory of the new store
+            keys: Document keys (default: the row numbers as strings)
+
+        Raises:
+            ValueError: If the keys are not unique
+        """
+        keys = [str(key) for key in keys] if keys is not None else [str(i) for i in range(len(store))]
+        if len(keys) != len(store) or len(set(keys)) != len(keys):
+            raise ValueError("Every document needs a unique key")
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        _Segment(1, store.vectors, store.chunks, keys, []).save(path / _Segment.dirname(1))
+        segment = _Segment.load(path / _Segment.dirname(1), 1)
+        created = cls(store.name, path, store.embedder, [segment], next_segment=2)
+        created._write_store_manifest()
+        return created
+
+    def __len__(self) -> int:
+        return self._view.count
+
+    @property
+    def segment_count(self) -> int:
+        """Number of on-disk segments."""
+        return len(self._view.segments) - 1
+
+    def search_vectors(
+        self,
+        query_vector: np.ndarray,
+        top_k: int = 5,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        view = self._view
+        query_vector = query_vector.astype(np.float32, copy=False)
+        hit_ids = []
+        hit_scores = []
+        for segment, live in zip(view.segments, view.masks, strict=True):
+            mask = live & segment.chunks.match(filters) if filters else live
+            segment_k = min(top_k, int(mask.sum()))
+            if segment_k == 0:
+                continue
+            scores = np.where(mask, segment.vectors @ query_vector, -np.inf).astype(np.float32, copy=False)
+            rows = top_k_indices(scores, segment_k)
+            hit_ids.append((segment.number << SEGMENT_ID_SHIFT) + rows)
+            hit_scores.append(scores[rows])
+        if not hit_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate(hit_ids)
+        scores = np.concatenate(hit_scores)
+        order = top_k_indices(scores, top_k)
+        return ids[order], scores[order]
+
+    def get_documents(self, ids: Sequence[int], scores: Sequence[float]) -> List[Document]:
+        documents = []
+        for doc_id, score in zip(ids, scores, strict=True):
+            segment = self._by_number[int(doc_id) >> SEGMENT_ID_SHIFT]
+            row = int(doc_id) & ROW_MASK
+            document = segment.chunks.materialize([row], [score])[0]
+            document.metadata["id"] = int(doc_id)
+            document.metadata["key"] = segment.keys[row]
+            documents.append(document)
+        return documents
+
+    def get_signatures(self, ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        simhashes = np.empty(len(ids), dtype=np.uint64)
+        token_counts = np.empty(len(ids), dtype=np.int32)
+        for position, doc_id in enumerate(ids):
+            segment = self._by_number[int(doc_id) >> SEGMENT_ID_SHIFT]
+            hashes, tokens = segment.chunks.signatures([int(doc_id) & ROW_MASK])
+            simhashes[position], token_counts[position] = hashes[0], tokens[0]
+        return simhashes, token_counts
+
+    def index_nbytes(self) -> int:
+        return int(sum(segment.vectors.nbytes for segment in self._view.segments))
+
+    def upsert(
+        self,
+        keys: Sequence[str],
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> int:
+        """
+        Insert or replace documents by key.
+
+        Args:
+            keys: Document keys
+            texts: Document contents
+            metadatas: Optional metadata per document
+
+        Returns:
+            int: Number of documents written
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        if not len(keys) == len(texts) == len(metadatas):
+            raise ValueError("Number of keys, texts and metadatas must match")
+        vectors = self.embedder.embed(texts)
+        self._write(
+            [
+                WalRecord(0, "upsert", str(key), text, dict(metadata), vector)
+                for key, text, metadata, vector in zip(keys, texts, metadatas, vectors, strict=True)
+            ]
+        )
+        return len(keys)
+
+    def delete(self, keys: Sequence[str]) -> int:
+        """
+        Delete documents by key.
+
+        Returns:
+            int: Number of keys that were present
+        """
+        return self._write([WalRecord(0, "delete", str(key)) for key in keys])
+
+    def flush(self) -> None:
+        """Write the memtable out as a delta segment and empty the log."""
+        with self._lock:
+            self._open_writer()
+            self._flush()
+
+    def needs_compaction(self) -> bool:
+        """Whether there are too many segments or too many hidden rows."""
+        view = self._view
+        if len(view.segments) - 1 > self.max_segments:
+            return True
+        rows = sum(len(segment) for segment in view.segments[:-1])
+        live = sum(int(mask.sum()) for mask in view.masks[:-1])
+        return rows > 0 and (rows - live) / rows > self.max_dead_fraction
+
+    def compact(self) -> bool:
+        """
+        Merge every on-disk segment into one without hidden rows.
+
+        The merged segment is built and written without holding the write
+        lock; updates made meanwhile are re-applied on top of it when it is
+        swapped in. Searches are never blocked.
+
+        Returns:
+            bool: False if there was nothing to compact or another
+                compaction is running
+        """
+        if not self._compaction_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._lock:
+                self._open_writer()
+                view = self._view
+                count = len(view.segments) - 1
+                if count == 0:
+                    return False
+                number = self._next_segment
+                self._next_segment += 1
+
+            merged = self._merge(
+                view.segments[:count], view.masks[:count], number, self.path / _Segment.dirname(number)
+            )
+
+            with self._lock:
+                replaced = self._segments[:count]
+                self._segments = [merged] + self._segments[count:]
+                self._write_store_manifest()
+                self._retired = {segment.number: segment for segment in replaced}
+                self._rebuild()
+                self._publish()
+        finally:
+            self._compaction_lock.release()
+        for segment in replaced:
+            shutil.rmtree(self.path / _Segment.dirname(segment.number), ignore_errors=True)
+        return True
+
+    def save(self, path: Path) -> None:
+        """Write a compacted copy of the store to ``path``."""
+        view = self._view
+        path.mkdir(parents=True, exist_ok=True)
+        self._merge(view.segments, view.masks, 1, path / _Segment.dirname(1))
+        self._write_manifest(
+            path,
+            {
+                "dim": self.embedder.dim,
+                "segments": [1],
+                "checkpoint_seq": 0,
+                "next_segment": 2,
+            },
+        )
+
+    @classmethod
+    def load(cls, path: Path, manifest: Dict[str, Any]) -> "SegmentedVectorStore":
+        segments = [
+            _Segment.load(path / _Segment.dirname(number), number) for number in manifest["segments"]
+        ]
+        return cls(
+            manifest["name"],
+            path,
+            create_embedder(manifest["embedder"]),
+            segments,
+            manifest.get("checkpoint_seq", 0),
+            manifest.get("next_segment", 1),
+        )
+
+    def close(self) -> None:
+        """Close the log and release the writer lock."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _write(self, records: List[WalRecord]) -> int:
+        with self._lock:
+            writer = self._open_writer()
+            changed = sum(self._apply(record) for record in writer.append(records))
+            self._publish()
+            if len(self._memtable) >= self.flush_rows:
+                self._flush()
+        return changed
+
+    def _apply(self, record: WalRecord) -> bool:
+        """Apply a logged update to the memtable and live masks."""
+        self._last_seq = max(self._last_seq, record.seq)
+        location = self._locations.pop(record.key, None)
+        if location is not None:
+            self._hide(location)
+        if record.op == "upsert":
+            row = self._memtable.add(record.key, record.content, record.metadata, record.vector)
+            self._locations[record.key] = (len(self._segments), row)
+            return True
+        if location is not None:
+            self._memtable.tombstones.append((record.key, len(self._memtable)))
+        return location is not None
+
+    def _hide(self, location: Tuple[int, int]) -> None:
+        index, row = location
+        if index == len(self._segments):
+            self._memtable.live[row] = False
+            return
+        # Published masks are shared with searches; copy before the first change
+        if index not in self._private:
+            self._masks[index] = self._masks[index].copy()
+            self._private.add(index)
+        self._masks[index][row] = False
+
+    def _rebuild(self) -> None:
+        """Recompute the live masks from the segments and the memtable."""
+        masks, self._locations = _live_masks(self._segments + [self._memtable])
+        self._memtable.live = masks.pop().tolist()
+        self._masks = masks
+        self._private = set(range(len(masks)))
+
+    def _publish(self) -> None:
+        memtable = self._memtable.to_segment(self.embedder.dim)
+        self._by_number = {
+            **self._retired,
+            **{segment.number: segment for segment in self._segments},
+            memtable.number: memtable,
+        }
+        self._view = _View(
+            tuple(self._segments) + (memtable,),
+            tuple(self._masks) + (np.array(self._memtable.live, dtype=bool),),
+            len(self._locations),
+        )
+        self._private = set()
+
+    def _open_writer(self) -> WriteAheadLog:
+        """Take the writer lock and finish recovery (called with ``_lock`` held)."""
+        if self._writer is not None:
+            return self._writer
+        lock_file = open(self.path / LOCK_FILE, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f"Vector store {self.name} is being updated by another process") from None
+        with open(self.path / MANIFEST_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if (
+            manifest["segments"] != [segment.number for segment in self._segments]
+            or read_log(self.path / WAL_FILE)[1] != self._wal_bytes
+        ):
+            lock_file.close()
+            raise RuntimeError(f"Vector store {self.name} changed on disk; reopen it to update it")
+        self._lock_file = lock_file
+
+        # Segments written by a flush or compaction that crashed before
+        # updating the manifest
+        listed = {_Segment.dirname(segment.number) for segment in self._segments}
+        for entry in self.path.iterdir():
+            if entry.is_dir() and entry.name.startswith(SEGMENT_PREFIX) and entry.name not in listed:
+                shutil.rmtree(entry, ignore_errors=True)
+        self._writer = WriteAheadLog(self.path / WAL_FILE, self._wal_bytes, self._last_seq)
+        return self._writer
+
+    def _flush(self) -> None:
+        if not len(self._memtable) and not self._memtable.tombstones:
+            return
+        number = self._memtable.number
+        directory = self.path / _Segment.dirname(number)
+        self._memtable.to_segment(self.embedder.dim).save(directory)
+        self._segments.append(_Segment.load(directory, number))
+        self._masks.append(np.array(self._memtable.live, dtype=bool))
+        self._private.add(len(self._masks) - 1)
+        self._checkpoint_seq = self._last_seq
+        self._memtable = _MemTable(self._next_segment)
+        self._next_segment += 1
+        # Once the manifest names the segment, the logged records are
+        # redundant (and skipped by sequence number if the reset is lost)
+        self._write_store_manifest()
+        self._writer.reset()
+        self._wal_bytes = 0
+        self._publish()
+
+    def _merge(
+        self,
+        segments: Sequence[_Segment],
+        masks: Sequence[np.ndarray],
+        number: int,
+        directory: Path,
+    ) -> _Segment:
+        """Write the live rows of ``segments`` as one segment in ``directory``."""
+        keys: List[str] = []
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        vectors = [np.empty((0, self.embedder.dim), dtype=np.float32)]
+        for segment, mask in zip(segments, masks, strict=True):
+            rows = np.flatnonzero(mask)
+            vectors.append(np.asarray(segment.vectors[rows], dtype=np.float32))
+            for row in rows.tolist():
+                keys.append(segment.keys[row])
+                texts.append(segment.chunks.text(row))
+                metadatas.append(segment.chunks.metadata(row))
+        merged = _Segment(
+            number, np.concatenate(vectors), ChunkStore.from_records(texts, metadatas), keys, []
+        )
+        shutil.rmtree(directory, ignore_errors=True)
+        merged.save(directory)
+        return _Segment.load(directory, number)
+
+    def _write_store_manifest(self) -> None:
+        self._write_manifest(
+            self.path,
+            {
+                "dim": self.embedder.dim,
+                "segments": [segment.number for segment in self._segments],
+                "checkpoint_seq": self._checkpoint_seq,
+                "next_segment": self._next_segment,
+            },
+        )
+
+
+STORE_FORMATS: Dict[str, Type[VectorStore]] = {
+    FlatVectorStore.format_name: FlatVectorStore,
+    QuantizedVectorStore.format_name: QuantizedVectorStore,
+    SegmentedVectorStore.format_name: SegmentedVectorStore,
+}
+
+
+# Siblings of a store directory while ``swap_store_directory`` replaces it
+STAGING_SUFFIX = ".staging"
+RETIRED_SUFFIX = ".retired"
+
+
+def open_vector_store(path: Path) -> VectorStore:
+    """
+    Open the vector store stored in ``path``.
+
+    Args:
+        path: Store directory
+
+    Returns:
+        VectorStore: The opened store
+
+    Raises:
+        FileNotFoundError: If the directory has no manifest
+        ValueError: If the manifest names an unknown format
+    """
+    path = Path(path)
+    recover_store_directory(path)
+    with open(path / MANIFEST_FILE, encoding="utf-8") as f:
+        manifest = json.load(f)
+    store_format = manifest.get("format")
+    if store_format not in STORE_FORMATS:
+        raise ValueError(f"Unknown vector store format: {store_format}")
+    return STORE_FORMATS[store_format].load(path, manifest)
+
+
+def discover_vector_stores(root: Path) -> Dict[str, Path]:
+    """
+    Find vector store directories directly under ``root``.
+
+    Args:
+        root: Usually ``Configuration.vector_store_path``
+
+    Returns:
+        Dict[str, Path]: Store directories keyed by directory name
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return {}
+    for entry in root.glob(f"*{RETIRED_SUFFIX}"):
+        recover_store_directory(entry.with_name(entry.name[: -len(RETIRED_SUFFIX)]))
+    return {
+        entry.name: entry
+        for entry in sorted(root.iterdir())
+        if entry.is_dir()
+        and (entry / MANIFEST_FILE).is_file()
+        and not entry.name.endswith((STAGING_SUFFIX, RETIRED_SUFFIX))
+    }
+
+
+def staging_directory(path: Path) -> Path:
+    """An empty sibling of store directory ``path`` to build its replacement in."""
+    staging = path.with_name(path.name + STAGING_SUFFIX)
+    shutil.rmtree(staging, ignore_errors=True)
+    return staging
+
+
+def swap_store_directory(path: Path, staging: Path) -> None:
+    """
+    Replace the store in ``path`` with the one built in ``staging``.
+
+    The old store is renamed aside before the new one takes its place, and
+    open memory maps keep reading the old files. A crash between the two
+    renames leaves no store at ``path``; ``recover_store_directory`` then
+    puts the old one back.
+    """
+    retired = path.with_name(path.name + RETIRED_SUFFIX)
+    shutil.rmtree(retired, ignore_errors=True)
+    path.rename(retired)
+    staging.rename(path)
+    shutil.rmtree(retired)
+
+
+def recover_store_directory(path: Path) -> None:
+    """Restore the old store of a swap interrupted between its renames."""
+    retired = path.with_name(path.name + RETIRED_SUFFIX)
+    if retired.is_dir() and not path.exists():
+        try:
+            retired.rename(path)
+        except FileNotFoundError:
+            # Another process recovered it first
+            pass
+
+
+def _fsync_tree(path: Path) -> None:
+    """Flush every file under ``path``, and the directories, to disk."""
+    for directory, _, files in os.walk(path):
+        for name in files:
+            fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    """Write ``text`` to ``path`` via a temporary file and rename."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
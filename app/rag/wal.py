@@ -0,0 +1,140 @@
+"""
+Write-ahead log for updatable vector stores.
+
+Every upsert and delete is appended to the log, and fsynced, before it
+becomes visible to searches, so a crash never loses an acknowledged update.
+Each record is one line::
+
+    <crc32 of the JSON, 8 hex digits> <JSON record>\\n
+
+A crash can leave a partially written last line. Replay stops at the first
+line that is incomplete or fails its checksum, and the writer truncates the
+log there before appending again.
+"""
+
+import base64
+import json
+import os
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class WalRecord(NamedTuple):
+    """One logged update."""
+    seq: int
+    op: str  # "upsert" or "delete"
+    key: str
+    content: Optional[str] = None
+    metadata: Optional[Dict[str, Any]] = None
+    vector: Optional[np.ndarray] = None
+
+
+def encode_record(record: WalRecord) -> bytes:
+    """Serialise ``record`` as one checksummed log line."""
+    data: Dict[str, Any] = {"seq": record.seq, "op": record.op, "key": record.key}
+    if record.op == "upsert":
+        data["content"] = record.content
+        data["metadata"] = record.metadata or {}
+        # Vectors are logged so recovery does not have to call the embedder
+        data["vector"] = base64.b64encode(
+            np.ascontiguousarray(record.vector, dtype=np.float32).tobytes()
+        ).decode("ascii")
+    payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_record(line: bytes) -> Optional[WalRecord]:
+    """Parse a log line, returning None if it is torn or corrupt."""
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        data = json.loads(payload)
+    except ValueError:
+        return None
+    vector = None
+    if data["op"] == "upsert":
+        vector = np.frombuffer(base64.b64decode(data["vector"]), dtype=np.float32)
+    return WalRecord(
+        data["seq"], data["op"], data["key"], data.get("content"), data.get("metadata"), vector
+    )
+
+
+def read_log(path: Path) -> Tuple[List[WalRecord], int]:
+    """
+    Read the valid prefix of a log.
+
+    Args:
+        path: Log file (a missing file is an empty log)
+
+    Returns:
+        Tuple[List[WalRecord], int]: Records and the byte length of the
+            valid prefix
+    """
+    records: List[WalRecord] = []
+    valid = 0
+    if not Path(path).is_file():
+        return records, valid
+    with open(path, "rb") as f:
+        for line in f:
+            record = decode_record(line)
+            if record is None:
+                break
+            records.append(record)
+            valid += len(line)
+    return records, valid
+
+
+class WriteAheadLog:
+    """
+    Appender for a store's log.
+
+    Args:
+        path: Log file
+        valid_bytes: Length of the valid prefix from ``read_log``; anything
+            after it (a torn record) is cut off
+        last_seq: Sequence number of the last record already applied
+    """
+
+    def __init__(self, path: Path, valid_bytes: int, last_seq: int):
+        self.path = Path(path)
+        self._file = open(self.path, "ab")
+        if self._file.tell() != valid_bytes:
+            self._file.truncate(valid_bytes)
+            self._file.seek(valid_bytes)
+            os.fsync(self._file.fileno())
+        self.last_seq = last_seq
+
+    def append(self, records: List[WalRecord]) -> List[WalRecord]:
+        """
+        Number, write and fsync a batch of records.
+
+        Args:
+            records: Records whose ``seq`` is ignored
+
+        Returns:
+            List[WalRecord]: The records with their assigned sequence numbers
+        """
+        numbered = [
+            record._replace(seq=self.last_seq + offset) for offset, record in enumerate(records, 1)
+        ]
+        self._file.write(b"".join(encode_record(record) for record in numbered))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if numbered:
+            self.last_seq = numbered[-1].seq
+        return numbered
+
+    def reset(self) -> None:
+        """Empty the log once its records are persisted in a segment."""
+        self._file.truncate(0)
+        self._file.seek(0)
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
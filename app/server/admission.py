@@ -0,0 +1,303 @@
+"""
+Priority admission control.
+
+Developer model comparisons and batch evaluations fan out many upstream
+calls on the same event loop that serves interactive chat. The
+``AdmissionMiddleware`` admits each request to the routes that do upstream
+work under its ``UserRole``:
+
+* ``admission_capacity`` bounds the requests running at once, and
+  ``admission_limits`` bounds each role's share of it, so developer and
+  evaluator work can never take the slots left for users;
+* requests over the limits wait in a queue per role, and freed slots go to
+  the highest-priority role first (user, then evaluator, then developer),
+  first come first served within a role;
+* when a role's queue holds ``admission_queue_limits`` requests, new ones
+  are shed with ``429 Too Many Requests`` and a ``Retry-After`` estimated
+  from the queue length and the role's recent service time.
+
+A request's role follows from its route. The unauthenticated ``X-AIS-Role``
+header can only lower it (e.g. batch evaluations sending ``/api/rag/query``
+as ``evaluator``), never claim a higher priority. The time spent queued
+is returned in a ``Server-Timing`` header and summarised per role by
+``GET /api/developer/admission``.
+"""
+
+import asyncio
+import collections
+import math
+import time
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.models.responses import AdmissionReport, RoleAdmission, UserRole
+from app.models.base import Configuration
+
+ROLE_HEADER = "x-ais-role"
+
+# Roles in the order freed slots are handed out
+PRIORITY = (UserRole.USER, UserRole.EVALUATOR, UserRole.DEVELOPER)
+
+# Routes that are admitted, as (method, path prefix, default role); the
+# first match wins and other routes (pages, health, docs) are not queued
+ADMITTED_ROUTES: List[Tuple[str, str, UserRole]] = [
+    ("POST", "/api/chat", UserRole.USER),
+    ("POST", "/api/rag/query", UserRole.USER),
+    ("POST", "/api/models/test", UserRole.DEVELOPER),
+    ("POST", "/api/evaluate", UserRole.EVALUATOR),
+    ("PUT", "/api/rag/stores/", UserRole.DEVELOPER),
+    ("POST", "/api/rag/stores/", UserRole.DEVELOPER),
+]
+
+# Number of recent queue waits kept per role for the percentiles
+WAIT_SAMPLES = 1000
+# Weight of the newest request in a role's mean service time
+SERVICE_TIME_SMOOTHING = 0.1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a role's queue is full."""
+
+    def __init__(self, role: UserRole, retry_after: int):
+        super().__init__(f"Too many queued {role.value} requests, retry in {retry_after}s")
+        self.role = role
+        self.retry_after = retry_after
+
+
+class _RoleQueue:
+    """Limits, waiters and statistics of one role."""
+
+    def __init__(self, role: UserRole):
+        self.role = role
+        self.limit = 0
+        self.max_queue: Optional[int] = None
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = collections.deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.waits: Deque[float] = collections.deque(maxlen=WAIT_SAMPLES)
+        self.service_time = 1.0
+
+    def report(self) -> RoleAdmission:
+        waits = np.asarray(self.waits)
+        return RoleAdmission(
+            role=self.role,
+            limit=self.limit,
+            max_queue=self.max_queue,
+            active=self.active,
+            queued=len(self.waiters),
+            admitted=self.admitted,
+            rejected=self.rejected,
+            queue_wait_mean=float(waits.mean()) if waits.size else 0.0,
+            queue_wait_p50=float(np.percentile(waits, 50)) if waits.size else 0.0,
+            queue_wait_p99=float(np.percentile(waits, 99)) if waits.size else 0.0,
+            service_time=self.service_time,
+        )
+
+
+class AdmissionController:
+    """
+    Per-role concurrency limits with priority queueing and load shedding.
+
+    Args:
+        capacity: Requests allowed to run at once across all roles
+        limits: Maximum running requests per role (missing roles may use
+            the whole capacity)
+        queue_limits: Maximum queued requests per role before new ones are
+            rejected (missing roles queue without bound)
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        limits: Optional[Dict[UserRole, int]] = None,
+        queue_limits: Optional[Dict[UserRole, int]] = None,
+    ):
+        self._roles = {role: _RoleQueue(role) for role in PRIORITY}
+        # Loop the waiters live on, known once a request has been admitted
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.configure(capacity, limits or {}, queue_limits or {})
+
+    @classmethod
+    def from_config(cls, config: Configuration) -> "AdmissionController":
+        return cls(config.admission_capacity, config.admission_limits, config.admission_queue_limits)
+
+    def configure(
+        self, capacity: int, limits: Dict[UserRole, int], queue_limits: Dict[UserRole, int]
+    ) -> None:
+        """
+        Apply new limits; queued requests that now fit are admitted.
+
+        Must run on the event loop that serves requests (or before any).
+        """
+        self.capacity = capacity
+        for role, queue in self._roles.items():
+            queue.limit = min(limits.get(role, capacity), capacity)
+            queue.max_queue = queue_limits.get(role)
+        self._dispatch()
+
+    def on_config_reload(self, config: Configuration) -> None:
+        """
+        Follow limit changes from a configuration reload.
+
+        Reloads may be noticed on a worker thread; the queues and waiters
+        are only touched on the event loop, so the change is handed over.
+        """
+        args = (config.admission_capacity, config.admission_limits, config.admission_queue_limits)
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self.configure(*args)
+            return
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self.configure(*args)
+        else:
+            loop.call_soon_threadsafe(self.configure, *args)
+
+    @property
+    def active(self) -> int:
+        return sum(queue.active for queue in self._roles.values())
+
+    def _can_run(self, queue: _RoleQueue) -> bool:
+        return queue.active < queue.limit and self.active < self.capacity
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters, highest-priority role first."""
+        for queue in self._roles.values():
+            while queue.waiters and self._can_run(queue):
+                waiter = queue.waiters.popleft()
+                if not waiter.done():
+                    queue.active += 1
+                    waiter.set_result(None)
+
+    def retry_after(self, role: UserRole) -> int:
+        """Seconds until a new request of ``role`` would probably get a slot."""
+        queue = self._roles[role]
+        return max(1, math.ceil((len(queue.waiters) + 1) * queue.service_time / max(1, queue.limit)))
+
+    async def acquire(self, role: UserRole) -> float:
+        """
+        Wait for a slot for a request of ``role``.
+
+        Returns:
+            float: Seconds spent queued
+
+        Raises:
+            AdmissionRejected: If the role's queue is full
+        """
+        self._loop = asyncio.get_running_loop()
+        queue = self._roles[role]
+        # Waiting requests could not run when they were queued and every
+        # release re-dispatches, so a request may run now only if none wait
+        if not queue.waiters and self._can_run(queue):
+            queue.active += 1
+            queue.admitted += 1
+            queue.waits.append(0.0)
+            return 0.0
+        if queue.max_queue is not None and len(queue.waiters) >= queue.max_queue:
+            queue.rejected += 1
+            raise AdmissionRejected(role, self.retry_after(role))
+
+        waiter = self._loop.create_future()
+        queue.waiters.append(waiter)
+        start_time = time.perf_counter()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the request was cancelled: give the slot back
+                self.release(role)
+            elif waiter in queue.waiters:
+                queue.waiters.remove(waiter)
+            raise
+        wait = time.perf_counter() - start_time
+        queue.admitted += 1
+        queue.waits.append(wait)
+        return wait
+
+    def release(self, role: UserRole, service_time: Optional[float] = None) -> None:
+        """Free the slot of a finished request of ``role``."""
+        queue = self._roles[role]
+        queue.active -= 1
+        if service_time is not None:
+            queue.service_time += SERVICE_TIME_SMOOTHING * (service_time - queue.service_time)
+        self._dispatch()
+
+    def report(self) -> AdmissionReport:
+        """Current load and queue-wait statistics per role."""
+        return AdmissionReport(
+            capacity=self.capacity,
+            active=self.active,
+            roles=[queue.report() for queue in self._roles.values()],
+        )
+
+
+def request_role(scope: Scope) -> Optional[UserRole]:
+    """
+    The role a request is admitted under, or None if its route is not admitted.
+
+    An ``X-AIS-Role`` header naming a role of lower priority than the
+    route's default demotes the request; it cannot raise its priority.
+    """
+    method = scope["method"]
+    path = scope["path"]
+    role = next(
+        (
+            default
+            for route_method, prefix, default in ADMITTED_ROUTES
+            if method == route_method and path.startswith(prefix)
+        ),
+        None,
+    )
+    if role is None:
+        return None
+    for name, value in scope.get("headers", []):
+        if name == ROLE_HEADER.encode():
+            try:
+                claimed = UserRole(value.decode().strip().lower())
+            except ValueError:
+                return role
+            return claimed if PRIORITY.index(claimed) > PRIORITY.index(role) else role
+    return role
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting requests through an ``AdmissionController``."""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        role = request_role(scope) if scope["type"] == "http" else None
+        if role is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            wait = await self.controller.acquire(role)
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": str(e)}, status_code=429, headers={"Retry-After": str(e.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"queue;dur={wait * 1000:.1f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.controller.release(role, time.perf_counter() - start_time)
@@ -7,18 +7,30 @@ the FastUI interface with embedded Plotly components.
 Note: This is NOT a main.py file - studio/main.py is the only main entry point.
 """
 
+import asyncio
+import contextlib
+import time
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
-from fastui import FastUI, AnyComponent, prebuilt_html
-from fastui.components import Page, Heading, Paragraph, Div
-from typing import List
+from fastui import FastUI, prebuilt_html
+
+from app import __version__
+from app.api.models.responses import HealthReport
+from app.api.routes import router as api_router
+from app.api.serialization import ModelResponse, fastui_response
+from app.core.config import get_config_manager
+from app.models.manager import ModelManager
+from app.rag.engine import RAGEngine
+from app.server.admission import AdmissionController, AdmissionMiddleware
+from app.server.health import HealthChecker
+from app.server.profiling import ProfileStore, ProfilingMiddleware
+from app.server.traces import TraceStore
 
-# Import FastUI page modules
-from app.frontend.app import create_fastui_app
-from app.frontend.pages.developer import create_developer_page
-from app.frontend.pages.evaluator import create_evaluator_page
-from app.frontend.pages.user import create_user_page
+# FastUI page modules are imported inside their routes: each one rebuilds a
+# batch of component models at import time, which only a request should pay for.
 
 
 def create_app() -> FastAPI:
@@ -28,14 +40,54 @@ def create_app() -> FastAPI:
     Returns:
         FastAPI: Configured FastAPI application instance
     """
+    config_manager = get_config_manager()
+    config = config_manager.get()
+    model_manager = ModelManager.from_config(config)
+    rag_engine = RAGEngine.from_config(config, model_manager)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        # Hot-reload configuration and keys without a restart
+        watcher = asyncio.create_task(config_manager.watch())
+        # Merge the segments of updatable stores in the background
+        compactor = asyncio.create_task(app.state.rag_engine.compact_periodically())
+        try:
+            yield
+        finally:
+            for task in (watcher, compactor):
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+            await app.state.model_manager.aclose()
+            app.state.rag_engine.close()
+            if app.state.trace_store is not None:
+                app.state.trace_store.close()
+
     app = FastAPI(
         title="AI Studio",
         description="FastUI와 Plotly를 통합한 RAG와 MCP 대화형 AI 스튜디오",
         version="0.1.0",
         docs_url="/api/docs",
         redoc_url="/api/redoc",
+        lifespan=lifespan,
     )
+    app.state.config_manager = config_manager
+    app.state.model_manager = model_manager
+    app.state.rag_engine = rag_engine
+    app.state.health_checker = HealthChecker(config)
+    app.state.admission = AdmissionController.from_config(config)
+    # Request traces are persisted only when enabled
+    app.state.trace_store = TraceStore.from_config(config) if config.traces_enabled else None
+    # Components holding pooled clients or config-derived state follow reloads
+    config_manager.subscribe(model_manager.on_config_reload)
+    config_manager.subscribe(rag_engine.on_config_reload)
+    config_manager.subscribe(app.state.health_checker.on_config_reload)
+    config_manager.subscribe(app.state.admission.on_config_reload)
     
+    # Queue and shed model and RAG requests by role so developer fan-out
+    # cannot starve interactive chat (inside CORS so 429s carry its headers)
+    app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+
     # Add CORS middleware for development
     from fastapi.middleware.cors import CORSMiddleware
     app.add_middleware(
@@ -45,6 +97,19 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+    # Request profiling is opt-in; when disabled the middleware is not
+    # installed so the request path pays nothing for it
+    app.state.profile_store = None
+    if config.profiling_enabled:
+        app.state.profile_store = ProfileStore(config.profile_capacity)
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=app.state.profile_store,
+            sample_rate=config.profile_sample_rate,
+            token=config.profile_token,
+            config_manager=config_manager,
+        )
     
     # Mount static files for FastUI
     try:
@@ -54,39 +119,63 @@ def create_app() -> FastAPI:
         # If static files are not available, continue without them
         pass
     
-    # Health check endpoint
+    # Health check endpoints
     @app.get("/api/health")
-    async def health_check():
-        """Health check endpoint for monitoring"""
-        return {
-            "status": "healthy",
-            "service": "AI Studio",
-            "version": "0.1.0"
-        }
+    async def health_check() -> ModelResponse:
+        """
+        Liveness check for load balancers.
+
+        Answers without touching any dependency, so an outage of a provider
+        or MCP server never takes the instance out of rotation.
+        """
+        return ModelResponse(HealthReport(status="healthy", version=__version__, checked_at=time.time()))
+
+    @app.get("/api/health/ready")
+    async def readiness_check(force: bool = False) -> ModelResponse:
+        """
+        Readiness check with the deep dependency probes.
+
+        Probes are cached for a few seconds unless ``force`` is set. Answers
+        503 only when an instance-local dependency (a vector store) fails;
+        failing external dependencies are reported as "degraded".
+        """
+        report = await app.state.health_checker.check(force=force)
+        return ModelResponse(report, status_code=503 if report.status == "unhealthy" else 200)
     
     # FastUI API routes (for component data)
     @app.get("/api/", response_model=FastUI, response_model_exclude_none=True)
-    async def homepage_api() -> List[AnyComponent]:
+    async def homepage_api() -> ModelResponse:
         """
         FastUI homepage API with role selection interface
         """
-        return create_fastui_app()
+        from app.frontend.app import create_fastui_app
+
+        return fastui_response(create_fastui_app())
     
     # Role-specific API routes
     @app.get("/api/developer", response_model=FastUI, response_model_exclude_none=True)
-    async def developer_api() -> List[AnyComponent]:
+    async def developer_api() -> ModelResponse:
         """FastUI developer interface API"""
-        return create_developer_page()
+        from app.frontend.pages.developer import create_developer_page
+
+        return fastui_response(create_developer_page())
     
     @app.get("/api/evaluator", response_model=FastUI, response_model_exclude_none=True)
-    async def evaluator_api() -> List[AnyComponent]:
+    async def evaluator_api() -> ModelResponse:
         """FastUI evaluator interface API"""
-        return create_evaluator_page()
+        from app.frontend.pages.evaluator import create_evaluator_page
+
+        return fastui_response(create_evaluator_page())
     
     @app.get("/api/user", response_model=FastUI, response_model_exclude_none=True)
-    async def user_api() -> List[AnyComponent]:
+    async def user_api() -> ModelResponse:
         """FastUI user interface API"""
-        return create_user_page()
+        from app.frontend.pages.user import create_user_page
+
+        return fastui_response(create_user_page())
+    
+    # JSON and form API routes
+    app.include_router(api_router)
     
     # Catch-all route for FastUI HTML page (must be last)
     @app.get("/{path:path}")
@@ -0,0 +1,192 @@
+"""
+Deep health checks for AI Studio.
+
+The ``HealthChecker`` runs one probe per configured dependency -- each vector
+store under ``vector_store_path``, each MCP server and each model provider --
+concurrently, with a timeout per probe. Results are cached for a short TTL so
+load-balancer polling does not hammer the backends.
+
+Only instance-local dependencies (the vector stores) make a report
+"unhealthy"; an MCP server or provider that is down makes it "degraded",
+since taking every instance out of rotation would not bring it back. A probe
+that outlives its timeout keeps running (a thread cannot be cancelled) and
+later checks wait on it instead of starting another, so slow dependencies
+never accumulate probe threads.
+"""
+
+import asyncio
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app import __version__
+from app.api.models.responses import HealthReport, ProbeResult
+from app.mcp.client import MCPClient
+from app.models.base import Configuration
+from app.rag.vector_stores import discover_vector_stores, open_vector_store
+
+DEFAULT_PROVIDER_ENDPOINTS = {
+    "openai": "https://api.openai.com/v1",
+}
+
+# Query used to exercise each vector store end to end
+PROBE_QUERY = "health check"
+
+# Probe kinds whose failure means this instance cannot serve requests
+LOCAL_PROBE_KINDS = {"vector_store"}
+
+
+class HealthProbe:
+    """A named asynchronous check that returns a short status message."""
+
+    def __init__(self, name: str, kind: str, check: Callable[[], Awaitable[str]]):
+        self.name = name
+        self.kind = kind
+        self.check = check
+
+
+class HealthChecker:
+    """Runs health probes concurrently and caches the aggregated report."""
+
+    def __init__(
+        self,
+        config: Configuration,
+        ttl: float = 5.0,
+        probe_timeout: float = 2.0,
+    ):
+        self.config = config
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self._cached: Optional[HealthReport] = None
+        self._cached_at = 0.0
+        self._lock = asyncio.Lock()
+        # Probe runs that have not finished yet, by (kind, name)
+        self._running: Dict[Tuple[str, str], asyncio.Future] = {}
+
+    def provider_endpoints(self) -> Dict[str, str]:
+        """Return the provider endpoints that should be probed."""
+        endpoints = dict(self.config.provider_endpoints)
+        if self.config.openai_api_key and "openai" not in endpoints:
+            endpoints["openai"] = DEFAULT_PROVIDER_ENDPOINTS["openai"]
+        return endpoints
+
+    def build_probes(self) -> List[HealthProbe]:
+        """Create one probe per vector store, MCP server and provider."""
+        probes = []
+        for store_name, path in discover_vector_stores(Path(self.config.vector_store_path)).items():
+            probes.append(
+                HealthProbe(store_name, "vector_store", lambda path=path: self._probe_vector_store(path))
+            )
+        for server_name, server_config in self.config.mcp_servers.items():
+            probes.append(
+                HealthProbe(
+                    server_name,
+                    "mcp_server",
+                    lambda n=server_name, c=server_config: self._probe_mcp_server(n, c),
+                )
+            )
+        for provider, url in self.provider_endpoints().items():
+            probes.append(
+                HealthProbe(provider, "provider", lambda p=provider, u=url: self._probe_provider(p, u))
+            )
+        return probes
+
+    async def _probe_vector_store(self, path: Path) -> str:
+        def open_and_query() -> str:
+            store = open_vector_store(path)
+            try:
+                documents = store.search(PROBE_QUERY, top_k=1)
+                return f"{len(store)} documents, test query returned {len(documents)}"
+            finally:
+                store.close()
+
+        return await asyncio.to_thread(open_and_query)
+
+    async def _probe_mcp_server(self, name: str, server_config: Dict) -> str:
+        await MCPClient(name, server_config).ping(timeout=self.probe_timeout)
+        return "ping ok"
+
+    async def _probe_provider(self, provider: str, url: str) -> str:
+        headers = {}
+        if provider == "openai" and self.config.openai_api_key:
+            headers["Authorization"] = f"Bearer {self.config.openai_api_key}"
+        async with httpx.AsyncClient(timeout=self.probe_timeout) as client:
+            response = await client.get(f"{url.rstrip('/')}/models", headers=headers)
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return f"reachable (HTTP {response.status_code})"
+
+    async def _run_probe(self, probe: HealthProbe) -> ProbeResult:
+        start_time = time.perf_counter()
+        key = (probe.kind, probe.name)
+        running = self._running.get(key)
+        if running is None or running.done():
+            running = self._running[key] = asyncio.ensure_future(probe.check())
+            # Retrieve the outcome of runs nobody waits for any more
+            running.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            # Shielded: a timed-out run continues, and the next check reuses it
+            message = await asyncio.wait_for(asyncio.shield(running), timeout=self.probe_timeout)
+            healthy = True
+        except TimeoutError:
+            message = f"timed out after {self.probe_timeout:.1f}s"
+            healthy = False
+        except Exception as e:
+            message = str(e) or type(e).__name__
+            healthy = False
+        return ProbeResult(
+            name=probe.name,
+            kind=probe.kind,
+            healthy=healthy,
+            latency=time.perf_counter() - start_time,
+            message=message,
+        )
+
+    async def check(self, force: bool = False) -> HealthReport:
+        """
+        Return the health report, running the probes if the cache is stale.
+
+        Concurrent callers during a refresh wait for the same run instead of
+        starting their own.
+
+        Args:
+            force: Ignore the cached report
+
+        Returns:
+            HealthReport: Aggregated probe results
+        """
+        if not force and self._is_fresh():
+            return self._cached
+
+        async with self._lock:
+            if not force and self._is_fresh():
+                return self._cached
+            results = await asyncio.gather(*(self._run_probe(p) for p in self.build_probes()))
+            failed = {result.kind for result in results if not result.healthy}
+            if failed & LOCAL_PROBE_KINDS:
+                status = "unhealthy"
+            else:
+                status = "degraded" if failed else "healthy"
+            report = HealthReport(
+                status=status,
+                version=__version__,
+                checked_at=time.time(),
+                probes=list(results),
+            )
+            self._cached = report
+            self._cached_at = time.monotonic()
+            return report
+
+    def on_config_reload(self, config: Configuration) -> None:
+        """Switch to a reloaded configuration and drop the stale report."""
+        self.config = config
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop the cached report so the next check re-runs all probes."""
+        self._cached = None
+
+    def _is_fresh(self) -> bool:
+        return self._cached is not None and time.monotonic() - self._cached_at < self.ttl
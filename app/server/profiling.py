@@ -0,0 +1,338 @@
+"""
+On-demand request profiling.
+
+When profiling is enabled (``ais run --profile`` or ``AIS_PROFILING_ENABLED``)
+``ProfilingMiddleware`` wraps the application. A request is profiled when it
+is picked by ``profile_sample_rate`` or carries the ``X-AIS-Profile`` header
+(whose value must match ``profile_token`` if one is configured). While a
+request runs, a background thread samples the interpreter's stacks; the
+result is kept in a bounded in-memory ring and can be downloaded from the
+developer endpoints as a folded-stack flamegraph or a speedscope file.
+
+On the event loop thread only the profiled request's tasks (the request's
+own task and the tasks it creates) are sampled, so concurrent unprofiled
+requests stay out of its flamegraph. Worker threads cannot be told apart
+by request: any busy worker thread is sampled, including work offloaded
+by other requests. Profiles reveal code paths and timings, so a server
+others can reach must set ``profile_token`` (``ais run --profile``
+refuses to start off the loopback interface without one).
+
+When profiling is disabled the middleware is not installed at all, so the
+request path is unchanged.
+"""
+
+import asyncio
+import collections
+import contextvars
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from types import CodeType, FrameType
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.api.models.responses import ProfileSummary
+from app.core.config import ConfigManager
+from app.models.base import Configuration
+
+PROFILE_HEADER = "x-ais-profile"
+PROFILE_ID_HEADER = "x-ais-profile-id"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+# Leaf functions of threads that are parked rather than working; those
+# threads are left out of the samples (except the request's own thread).
+# An executor worker whose leaf is ``_worker`` is blocked on its C work queue.
+IDLE_FUNCTIONS = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+Stack = Tuple[str, ...]
+
+# Id of the profile the current request (and the tasks it creates) belongs to
+_profile_id: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar(
+    "ais_profile_id", default=None
+)
+
+
+def _task_profile_id(task: "asyncio.Task[Any]") -> Optional[int]:
+    # Task.get_context is new in Python 3.12; without it only the request's
+    # own task is recognised
+    get_context = getattr(task, "get_context", None)
+    return None if get_context is None else get_context().get(_profile_id)
+
+
+class StackSampler:
+    """
+    Sample the Python stacks of running threads from a background thread.
+
+    Frames are labelled ``function (module/file.py:first_line)`` so that all
+    samples inside one function merge into a single flamegraph node. Stacks
+    are stored root first, prefixed with the thread name.
+
+    With ``target_task``, samples of the target thread are kept only while
+    no task or one of the profile's tasks runs on its event loop.
+    """
+
+    def __init__(
+        self,
+        target_thread: int,
+        interval: float = 0.001,
+        target_task: "Optional[asyncio.Task[Any]]" = None,
+        profile_id: Optional[int] = None,
+    ):
+        self.target_thread = target_thread
+        self.interval = interval
+        self.target_task = target_task
+        self.profile_id = profile_id
+        self._loop = target_task.get_loop() if target_task is not None else None
+        self.samples: Dict[Stack, int] = collections.Counter()
+        self._labels: Dict[CodeType, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ais-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Dict[Stack, int]:
+        """Stop sampling and return the sample count per stack."""
+        self._stop.set()
+        self._thread.join()
+        return dict(self.samples)
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            parent, filename = os.path.split(code.co_filename)
+            label = f"{code.co_name} ({os.path.basename(parent)}/{filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _stack(self, frame: Optional[FrameType]) -> List[str]:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _other_task_running(self) -> bool:
+        """Whether the target loop is running a task of another request."""
+        if self._loop is None:
+            return False
+        task = asyncio.current_task(self._loop)
+        return (
+            task is not None
+            and task is not self.target_task
+            and _task_profile_id(task) != self.profile_id
+        )
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                if thread_id == self.target_thread and self._other_task_running():
+                    continue
+                code = frame.f_code
+                if (
+                    thread_id != self.target_thread
+                    and (os.path.basename(code.co_filename), code.co_name) in IDLE_FUNCTIONS
+                ):
+                    continue
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                thread_name = names.get(thread_id, str(thread_id))
+                self.samples[(f"thread {thread_name}", *self._stack(frame))] += 1
+
+
+class Profile:
+    """A captured request profile."""
+
+    def __init__(
+        self,
+        profile_id: int,
+        method: str,
+        path: str,
+        trigger: str,
+        started_at: float,
+        interval: float,
+    ):
+        self.profile_id = profile_id
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = started_at
+        self.interval = interval
+        self.status_code = 0
+        self.duration = 0.0
+        self.samples: Dict[Stack, int] = {}
+
+    def summary(self) -> ProfileSummary:
+        return ProfileSummary(
+            id=self.profile_id,
+            method=self.method,
+            path=self.path,
+            status_code=self.status_code,
+            trigger=self.trigger,
+            started_at=self.started_at,
+            duration=self.duration,
+            samples=sum(self.samples.values()),
+        )
+
+    def to_folded(self) -> str:
+        """Render as folded stacks (input for flamegraph.pl, speedscope and others)."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.samples.items()))
+
+    def to_speedscope(self) -> Dict[str, Any]:
+        """Render as a speedscope sampled profile."""
+        frames: List[Dict[str, Any]] = []
+        frame_index: Dict[str, int] = {}
+        samples = []
+        weights = []
+        for stack, count in sorted(self.samples.items()):
+            indices = []
+            for label in stack:
+                if label not in frame_index:
+                    frame_index[label] = len(frames)
+                    frames.append({"name": label})
+                indices.append(frame_index[label])
+            samples.append(indices)
+            weights.append(count * self.interval)
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": f"{self.method} {self.path}",
+            "exporter": "ai-studio",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"{self.method} {self.path}",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": self.duration,
+                    "samples": samples,
+                    "weights": weights,
+                }
+            ],
+        }
+
+
+class ProfileStore:
+    """Bounded ring of the most recent profiles."""
+
+    def __init__(self, capacity: int = 50):
+        self._profiles: Deque[Profile] = collections.deque(maxlen=capacity)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile: Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[ProfileSummary]:
+        """Summaries of the stored profiles, newest first."""
+        with self._lock:
+            return [profile.summary() for profile in reversed(self._profiles)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            return next((p for p in self._profiles if p.profile_id == profile_id), None)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling sampled or header-triggered requests.
+
+    Only one request is profiled at a time: sampling sees every worker
+    thread, so overlapping profiles would attribute each other's work.
+    Requests picked while a profile is running are served unprofiled.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        token: Optional[str] = None,
+        interval: float = 0.001,
+        config_manager: Optional[ConfigManager] = None,
+    ):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.token = token
+        self.interval = interval
+        self._busy = threading.Lock()
+        if config_manager is not None:
+            config_manager.subscribe(self.on_config_reload)
+
+    def on_config_reload(self, config: Configuration) -> None:
+        """Follow sample rate and token changes from a configuration reload."""
+        self.sample_rate = config.profile_sample_rate
+        self.token = config.profile_token
+
+    def _trigger(self, scope: Scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode():
+                if self.token is None or value.decode() == self.token:
+                    return "header"
+                return None
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        trigger = self._trigger(scope)
+        if trigger is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            profile = Profile(
+                self.store.next_id(),
+                scope["method"],
+                scope["path"],
+                trigger,
+                time.time(),
+                self.interval,
+            )
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    profile.status_code = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((PROFILE_ID_HEADER.encode(), str(profile.profile_id).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            sampler = StackSampler(
+                threading.get_ident(), self.interval, asyncio.current_task(), profile.profile_id
+            )
+            start_time = time.perf_counter()
+            sampler.start()
+            token = _profile_id.set(profile.profile_id)
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                _profile_id.reset(token)
+                profile.samples = sampler.stop()
+                profile.duration = time.perf_counter() - start_time
+                self.store.add(profile)
+        finally:
+            self._busy.release()
@@ -0,0 +1,353 @@
+"""
+Persistent store of request execution traces.
+
+When ``traces_enabled`` is set, the ``ExecutionTrace`` of every request
+that ran pipeline stages or MCP calls is appended to a ``TraceStore`` under
+``trace_store_path`` instead of being kept in memory. The developer views
+query the history through ``/api/developer/traces``.
+
+The store is a directory of append-only segments. Each worker process
+writes its own segment, named after the time span it may cover::
+
+    <start ms>-<end ms>-<pid>.seg   zlib-compressed records, each framed as
+                                    <length:u32><crc32:u32><payload>
+    <start ms>-<end ms>-<pid>.idx   one JSON line per record: timestamp,
+                                    offset, length, success flag and the
+                                    (tool, duration, success) of its MCP calls
+
+Records are placed by the time they are appended, when the request
+finishes. A segment is rotated when its time span is over or it reaches
+``trace_segment_bytes``, and segments that ended more than
+``trace_retention_hours`` ago are deleted. Queries select segments by the
+span in their names and records by the sidecar index, and only read the
+records they return. A torn last record or index line (a crash mid-append)
+is ignored.
+
+There is no separate index by tool name: a tool query filters the index
+lines of the segments its time range selects. Those lines carry the
+timestamps and offsets any index would have to point back to, and a
+segment's index is bounded by ``trace_segment_bytes``.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.api.models.responses import ExecutionTrace, StoredTrace, TracedMCPCall
+from app.models.base import Configuration
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+SEGMENT_NAME = re.compile(r"^(\d{13})-(\d{13})-(\d+)$")
+
+_HEADER = struct.Struct(">II")
+
+
+class SegmentInfo(NamedTuple):
+    """A segment and the time span (epoch seconds) its records fall into."""
+    path: Path
+    start: float
+    end: float
+
+
+class IndexEntry(NamedTuple):
+    """Sidecar index line of one record."""
+    timestamp: float
+    offset: int
+    length: int
+    success: bool
+    tools: List[Tuple[str, float, bool]]
+
+
+def _segment_stem(start: float, end: float) -> str:
+    # Rounded outwards so the span in the name covers the exact one
+    return f"{math.floor(start * 1000):013d}-{math.ceil(end * 1000):013d}-{os.getpid()}"
+
+
+class TraceStore:
+    """
+    Append-only, indexed store of execution traces.
+
+    Args:
+        path: Directory holding the segments
+        segment_seconds: Time span of a segment before it is rotated
+        segment_bytes: Size at which a segment is rotated early
+        retention: Seconds a segment is kept after its span ends
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        segment_seconds: float = 3600.0,
+        segment_bytes: int = 16 * 1024 * 1024,
+        retention: float = 7 * 24 * 3600.0,
+    ):
+        self.path = Path(path)
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.retention = retention
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._segment: Optional[SegmentInfo] = None
+        self._data = None
+        self._index = None
+
+    @classmethod
+    def from_config(cls, config: Configuration) -> "TraceStore":
+        return cls(
+            Path(config.trace_store_path),
+            segment_seconds=config.trace_segment_seconds,
+            segment_bytes=config.trace_segment_bytes,
+            retention=config.trace_retention_hours * 3600,
+        )
+
+    def append(self, path: str, trace: ExecutionTrace, timestamp: Optional[float] = None) -> None:
+        """
+        Append the trace of a finished request.
+
+        Args:
+            path: Request path the trace belongs to
+            trace: The request's execution trace
+            timestamp: When the request finished (default: now)
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        payload = zlib.compress(
+            json.dumps(
+                {"timestamp": timestamp, "path": path, "trace": trace.model_dump(mode="json")},
+                separators=(",", ":"),
+            ).encode("utf-8")
+        )
+        tools = [[call.tool_name, call.execution_time, call.success] for call in trace.mcp_calls]
+        with self._lock:
+            self._rotate_if_needed(timestamp)
+            offset = self._data.tell() + _HEADER.size
+            self._data.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._data.flush()
+            # The index line is written after its record, so a line never
+            # points at bytes that did not reach the segment
+            self._index.write(
+                json.dumps([timestamp, offset, len(payload), trace.success, tools], separators=(",", ":"))
+                + "\n"
+            )
+            self._index.flush()
+
+    def _rotate_if_needed(self, timestamp: float) -> None:
+        segment = self._segment
+        if (
+            segment is not None
+            and segment.start <= timestamp < segment.end
+            and self._data.tell() < self.segment_bytes
+        ):
+            return
+        self._close_segment()
+        stem = _segment_stem(timestamp, timestamp + self.segment_seconds)
+        self._segment = SegmentInfo(
+            self.path / f"{stem}{SEGMENT_SUFFIX}", timestamp, timestamp + self.segment_seconds
+        )
+        self._data = open(self._segment.path, "ab")
+        self._index = open(self._segment.path.with_suffix(INDEX_SUFFIX), "a", encoding="utf-8")
+        self.enforce_retention()
+
+    def _close_segment(self) -> None:
+        for f in (self._data, self._index):
+            if f is not None:
+                f.close()
+        self._data = self._index = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_segment()
+            self._segment = None
+
+    def segments(self) -> List[SegmentInfo]:
+        """All segments of all writers, oldest first."""
+        segments = []
+        for entry in self.path.glob(f"*{SEGMENT_SUFFIX}"):
+            match = SEGMENT_NAME.match(entry.stem)
+            if match:
+                segments.append(
+                    SegmentInfo(entry, int(match.group(1)) / 1000, int(match.group(2)) / 1000)
+                )
+        return sorted(segments, key=lambda segment: (segment.start, segment.path.name))
+
+    def enforce_retention(self, now: Optional[float] = None) -> int:
+        """
+        Delete segments whose span ended more than ``retention`` seconds ago.
+
+        Returns:
+            int: Number of segments deleted
+        """
+        cutoff = (time.time() if now is None else now) - self.retention
+        deleted = 0
+        for segment in self.segments():
+            if segment.end < cutoff:
+                for path in (segment.path, segment.path.with_suffix(INDEX_SUFFIX)):
+                    path.unlink(missing_ok=True)
+                deleted += 1
+        return deleted
+
+    def _select(self, since: Optional[float], until: Optional[float]) -> List[SegmentInfo]:
+        """Segments whose span overlaps [since, until], latest ending first."""
+        segments = [
+            segment
+            for segment in self.segments()
+            if (since is None or segment.end > since) and (until is None or segment.start <= until)
+        ]
+        return sorted(segments, key=lambda segment: segment.end, reverse=True)
+
+    @staticmethod
+    def _read_index(segment: SegmentInfo) -> List[IndexEntry]:
+        entries = []
+        try:
+            with open(segment.path.with_suffix(INDEX_SUFFIX), encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        break
+                    try:
+                        timestamp, offset, length, success, tools = json.loads(line)
+                    except ValueError:
+                        break
+                    entries.append(
+                        IndexEntry(timestamp, offset, length, success, [tuple(tool) for tool in tools])
+                    )
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def _read_records(
+        self, segment: SegmentInfo, entries: List[IndexEntry]
+    ) -> Iterator[Tuple[IndexEntry, Dict[str, Any]]]:
+        """Read and decode the records of ``entries`` from a segment, skipping corrupt ones."""
+        with open(segment.path, "rb") as f:
+            for entry in entries:
+                f.seek(entry.offset - _HEADER.size)
+                header = f.read(_HEADER.size)
+                payload = f.read(entry.length)
+                if len(header) < _HEADER.size or len(payload) < entry.length:
+                    continue
+                length, checksum = _HEADER.unpack(header)
+                if length != entry.length or zlib.crc32(payload) != checksum:
+                    continue
+                yield entry, json.loads(zlib.decompress(payload))
+
+    def query(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        tool: Optional[str] = None,
+        success: Optional[bool] = None,
+        limit: int = 100,
+    ) -> List[StoredTrace]:
+        """
+        Find traces, newest first.
+
+        Args:
+            since: Earliest finish time (epoch seconds)
+            until: Latest finish time (epoch seconds)
+            tool: Only traces that called this MCP tool
+            success: Only successful (True) or failed (False) traces
+            limit: Maximum number of traces
+
+        Returns:
+            List[StoredTrace]: Matching traces
+        """
+        # Min-heap of the newest matches so far: (timestamp, tiebreak, segment, entry).
+        # Writers keep their own segments, so the spans of different pids
+        # overlap and every selected segment may hold newer matches; only a
+        # segment ending before the oldest of ``limit`` matches (and those
+        # ending earlier still) can be skipped.
+        newest: List[Tuple[float, int, SegmentInfo, IndexEntry]] = []
+        counter = 0
+        for segment in self._select(since, until):
+            if len(newest) >= limit and segment.end <= newest[0][0]:
+                break
+            for entry in self._read_index(segment):
+                if (
+                    (since is None or entry.timestamp >= since)
+                    and (until is None or entry.timestamp <= until)
+                    and (success is None or entry.success == success)
+                    and (tool is None or any(name == tool for name, _, _ in entry.tools))
+                ):
+                    counter += 1
+                    item = (entry.timestamp, counter, segment, entry)
+                    if len(newest) < limit:
+                        heapq.heappush(newest, item)
+                    else:
+                        heapq.heappushpop(newest, item)
+
+        by_segment: Dict[Path, Tuple[SegmentInfo, List[IndexEntry]]] = {}
+        for _, _, segment, entry in newest:
+            by_segment.setdefault(segment.path, (segment, []))[1].append(entry)
+        results: List[StoredTrace] = []
+        for segment, entries in by_segment.values():
+            entries.sort(key=lambda entry: entry.offset)
+            results.extend(StoredTrace(**record) for _, record in self._read_records(segment, entries))
+        results.sort(key=lambda stored: stored.timestamp, reverse=True)
+        return results
+
+    def slowest_calls(
+        self,
+        tool: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 10,
+    ) -> List[TracedMCPCall]:
+        """
+        Find the slowest calls of an MCP tool.
+
+        The calls are ranked from the sidecar indexes; only the records
+        holding the slowest ones are read.
+
+        Args:
+            tool: MCP tool name
+            since: Earliest finish time (epoch seconds)
+            until: Latest finish time (epoch seconds)
+            limit: Maximum number of calls
+
+        Returns:
+            List[TracedMCPCall]: Calls, slowest first
+        """
+        # Min-heap of the slowest calls so far: (duration, tiebreak, segment, entry, occurrence)
+        slowest: List[Tuple[float, int, SegmentInfo, IndexEntry, int]] = []
+        counter = 0
+        for segment in self._select(since, until):
+            for entry in self._read_index(segment):
+                if (since is not None and entry.timestamp < since) or (
+                    until is not None and entry.timestamp > until
+                ):
+                    continue
+                durations = [duration for name, duration, _ in entry.tools if name == tool]
+                for occurrence, duration in enumerate(durations):
+                    counter += 1
+                    item = (duration, counter, segment, entry, occurrence)
+                    if len(slowest) < limit:
+                        heapq.heappush(slowest, item)
+                    else:
+                        heapq.heappushpop(slowest, item)
+
+        # Read each record holding one of the calls once
+        by_segment: Dict[Path, Dict[int, Tuple[SegmentInfo, IndexEntry, List[int]]]] = {}
+        for _, _, segment, entry, occurrence in slowest:
+            records = by_segment.setdefault(segment.path, {})
+            records.setdefault(entry.offset, (segment, entry, []))[2].append(occurrence)
+        calls: List[TracedMCPCall] = []
+        for records in by_segment.values():
+            segment = next(iter(records.values()))[0]
+            entries = sorted((entry for _, entry, _ in records.values()), key=lambda entry: entry.offset)
+            for entry, record in self._read_records(segment, entries):
+                tool_calls = [call for call in record["trace"]["mcp_calls"] if call["tool_name"] == tool]
+                for occurrence in records[entry.offset][2]:
+                    calls.append(
+                        TracedMCPCall(timestamp=record["timestamp"], path=record["path"], **tool_calls[occurrence])
+                    )
+        calls.sort(key=lambda call: call.execution_time, reverse=True)
+        return calls
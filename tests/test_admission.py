@@ -0,0 +1,154 @@
+"""
+Test priority admission control.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.api.models.responses import UserRole
+from app.bench.runner import FAKE_MODELS, build_bench_app
+from app.core.config import get_config_manager
+from app.models.base import Configuration
+from app.server.admission import AdmissionController, AdmissionRejected, request_role
+
+USER, EVALUATOR, DEVELOPER = UserRole.USER, UserRole.EVALUATOR, UserRole.DEVELOPER
+
+
+async def _admit(controller, role, order, hold):
+    await controller.acquire(role)
+    order.append(role)
+    await hold.wait()
+    controller.release(role)
+
+
+def test_freed_slots_go_to_users_first():
+    """Test that a queued user request overtakes developer requests queued earlier."""
+    async def run():
+        controller = AdmissionController(capacity=1)
+        order = []
+        hold = asyncio.Event()
+        tasks = [asyncio.create_task(_admit(controller, DEVELOPER, order, hold))]
+        await asyncio.sleep(0)
+        for role in (DEVELOPER, EVALUATOR, USER):
+            tasks.append(asyncio.create_task(_admit(controller, role, order, hold)))
+            await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(*tasks)
+        assert order == [DEVELOPER, USER, EVALUATOR, DEVELOPER]
+
+    asyncio.run(run())
+
+
+def test_role_limits_keep_capacity_for_users():
+    """Test that developers wait at their limit while users are still admitted."""
+    async def run():
+        controller = AdmissionController(capacity=3, limits={DEVELOPER: 1})
+        assert await controller.acquire(DEVELOPER) == 0.0
+        waiting = asyncio.create_task(controller.acquire(DEVELOPER))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert await controller.acquire(USER) == 0.0
+        assert await controller.acquire(USER) == 0.0
+
+        await asyncio.sleep(0.01)
+        controller.release(DEVELOPER)
+        assert await waiting >= 0.01
+        report = {role.role: role for role in controller.report().roles}
+        assert report[DEVELOPER].active == 1 and report[USER].active == 2
+        assert report[DEVELOPER].queue_wait_p99 >= 0.01
+
+    asyncio.run(run())
+
+
+def test_full_queue_is_shed_and_cancelled_waiters_leave():
+    """Test load shedding with a Retry-After estimate, and that cancelled waiters free nothing twice."""
+    async def run():
+        controller = AdmissionController(capacity=1, queue_limits={DEVELOPER: 1})
+        await controller.acquire(DEVELOPER)
+        queued = asyncio.create_task(controller.acquire(DEVELOPER))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(DEVELOPER)
+        assert rejected.value.retry_after >= 1
+
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        controller.release(DEVELOPER)
+        report = controller.report()
+        assert report.active == 0 and report.roles[2].queued == 0 and report.roles[2].rejected == 1
+        assert await controller.acquire(USER) == 0.0
+
+    asyncio.run(run())
+
+
+def test_roles_follow_routes_and_header():
+    """Test that routes pick the default role and X-AIS-Role can only lower it."""
+    def scope(method, path, role=None):
+        headers = [(b"x-ais-role", role.encode())] if role else []
+        return {"method": method, "path": path, "headers": headers}
+
+    assert request_role(scope("POST", "/api/chat")) == USER
+    assert request_role(scope("POST", "/api/models/test")) == DEVELOPER
+    assert request_role(scope("POST", "/api/rag/query", "Evaluator")) == EVALUATOR
+    assert request_role(scope("POST", "/api/rag/query", "admin")) == USER
+    # Claiming a higher priority than the route's default is ignored
+    assert request_role(scope("POST", "/api/models/test", "user")) == DEVELOPER
+    assert request_role(scope("POST", "/api/evaluate", "user")) == EVALUATOR
+    assert request_role(scope("POST", "/api/models/test", "evaluator")) == DEVELOPER
+    assert request_role(scope("GET", "/api/health")) is None
+
+
+def test_reload_on_another_thread_admits_waiters_on_the_loop():
+    """Test that a config reload noticed on a worker thread hands the new limits to the loop."""
+    controller = AdmissionController(capacity=1)
+    config = Configuration(admission_capacity=2, admission_limits={}, admission_queue_limits={})
+
+    async def run():
+        await controller.acquire(USER)
+        waiter = asyncio.create_task(controller.acquire(USER))
+        await asyncio.sleep(0)
+        assert controller.report().roles[0].queued == 1
+
+        # As ConfigManager.watch does; loop debug mode rejects cross-thread use
+        await asyncio.to_thread(controller.on_config_reload, config)
+        await asyncio.wait_for(waiter, timeout=1.0)
+        assert controller.capacity == 2 and controller.active == 2
+
+    asyncio.run(run(), debug=True)
+
+
+def test_developer_fan_out_does_not_queue_chat(tmp_path, monkeypatch):
+    """Test end to end that excess developer load gets 429 while chat is admitted at once."""
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    monkeypatch.setenv("AIS_ADMISSION_LIMITS", '{"developer": 1}')
+    monkeypatch.setenv("AIS_ADMISSION_QUEUE_LIMITS", '{"developer": 1}')
+    get_config_manager.cache_clear()
+    try:
+        app = build_bench_app(num_documents=40, provider_latency=0.1)
+    finally:
+        get_config_manager.cache_clear()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            form = {"query": "compare", "models": FAKE_MODELS}
+            developer = [
+                asyncio.create_task(client.post("/api/models/test", json=form)) for _ in range(3)
+            ]
+            await asyncio.sleep(0.02)
+            chat = await client.post("/api/rag/query", json={"query": "t1w1"})
+            responses = await asyncio.gather(*developer)
+            report = (await client.get("/api/developer/admission")).json()
+        return chat, responses, report
+
+    chat, responses, report = asyncio.run(run())
+
+    assert chat.status_code == 200 and chat.headers["server-timing"] == "queue;dur=0.0"
+    assert sorted(response.status_code for response in responses) == [200, 200, 429]
+    rejected = next(response for response in responses if response.status_code == 429)
+    assert int(rejected.headers["retry-after"]) >= 1
+    roles = {role["role"]: role for role in report["roles"]}
+    assert roles["developer"]["rejected"] == 1 and roles["developer"]["admitted"] == 2
+    assert roles["developer"]["queue_wait_p99"] > 0.05
@@ -0,0 +1,65 @@
+"""
+Test the RAG, model comparison and chat API endpoints.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.bench.runner import FAKE_MODELS, build_bench_app
+
+
+@pytest.fixture(scope="module")
+def client():
+    """Client for an app backed by fake providers and synthetic stores."""
+    return TestClient(build_bench_app(num_documents=400))
+
+
+def test_rag_query_returns_sources_from_all_stores(client):
+    """Test that a RAG query searches every store and answers."""
+    response = client.post("/api/rag/query", json={"query": "t5w2 t5w9", "max_results": 3})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["sources"]) == 3
+    assert set(data["vector_store_results"]) == {"store_a", "store_b", "store_c", "common"}
+    assert data["answer"].startswith(f"[{FAKE_MODELS[0]}]")
+    scores = [source["score"] for source in data["sources"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_rag_query_filters_on_metadata(client):
+    """Test that metadata filters restrict the sources."""
+    response = client.post(
+        "/api/rag/query", json={"query": "t5w2 t5w9", "max_results": 5, "filters": {"topic": 3}}
+    )
+
+    assert response.status_code == 200
+    sources = response.json()["sources"]
+    assert sources and all(source["metadata"]["topic"] == 3 for source in sources)
+
+
+def test_rag_query_rejects_unknown_store(client):
+    """Test that unknown vector stores are a client error."""
+    response = client.post("/api/rag/query", json={"query": "x", "vector_stores": ["nope"]})
+    assert response.status_code == 400
+
+
+def test_model_comparison(client):
+    """Test that models are compared side by side, including failures."""
+    response = client.post(
+        "/api/models/test", json={"query": "hello", "models": [*FAKE_MODELS, "missing"]}
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert all(results[name]["success"] for name in FAKE_MODELS)
+    assert results["missing"]["success"] is False
+    assert response.json()["best_model"] in FAKE_MODELS
+
+
+def test_chat_form(client):
+    """Test that the user page chat form gets FastUI components back."""
+    response = client.post("/api/chat", data={"message": "t3w1 vector store"})
+
+    assert response.status_code == 200
+    assert response.json()[0]["type"] == "Div"
@@ -0,0 +1,58 @@
+"""
+Test the `ais bench` load benchmark suite.
+"""
+
+import asyncio
+
+from app.bench.runner import (
+    DEFAULT_SCENARIOS,
+    BenchReport,
+    ScenarioResult,
+    build_bench_app,
+    compare_to_baseline,
+    load_report,
+    run_benchmarks,
+    save_report,
+)
+
+
+def make_report(rps: float, p50_ms: float, errors: int = 0) -> BenchReport:
+    result = ScenarioResult(
+        name="chat", requests=100, errors=errors, rps=rps, mean_ms=p50_ms,
+        p50_ms=p50_ms, p99_ms=p50_ms * 3, alloc_kib_per_request=10.0,
+    )
+    return BenchReport(created_at=0.0, python="3", machine="x", scenarios={"chat": result})
+
+
+def test_benchmarks_cover_all_scenarios(tmp_path):
+    """Test a short run of every scenario and its JSON round-trip."""
+    app = build_bench_app(num_documents=200)
+    report = asyncio.run(
+        run_benchmarks(app, DEFAULT_SCENARIOS, requests=5, concurrency=2, rounds=1)
+    )
+
+    assert set(report.scenarios) == {scenario.name for scenario in DEFAULT_SCENARIOS}
+    for result in report.scenarios.values():
+        assert result.errors == 0
+        assert result.rps > 0
+        assert result.p99_ms >= result.p50_ms > 0
+        assert result.alloc_kib_per_request > 0
+
+    save_report(report, tmp_path / "result.json")
+    assert load_report(tmp_path / "result.json") == report
+
+
+def test_regressions_are_detected():
+    """Test that throughput, latency and error regressions fail the comparison."""
+    baseline = make_report(rps=1000, p50_ms=10)
+
+    assert compare_to_baseline(make_report(rps=900, p50_ms=11), baseline) == []
+    assert len(compare_to_baseline(make_report(rps=500, p50_ms=10), baseline)) == 1
+    assert len(compare_to_baseline(make_report(rps=1000, p50_ms=20), baseline)) == 1
+    assert len(compare_to_baseline(make_report(rps=1000, p50_ms=10, errors=1), baseline)) == 1
+
+
+def test_small_latency_changes_are_noise():
+    """Test that sub-millisecond latency changes are not regressions."""
+    baseline = make_report(rps=1000, p50_ms=0.2)
+    assert compare_to_baseline(make_report(rps=1000, p50_ms=0.5), baseline) == []
@@ -0,0 +1,109 @@
+"""
+Test the columnar chunk store and lazy document materialisation.
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from app.models.llm import FakeProvider
+from app.models.manager import ModelManager
+from app.rag.chunk_store import ChunkStore
+from app.rag.engine import RAGEngine
+from app.rag.vector_stores import FlatVectorStore, open_vector_store
+
+TEXTS = ["alpha beta", "감마 델타 🚀", "", "epsilon"]
+METADATAS = [
+    {"topic": 1, "lang": "en", "score": 0.5, "draft": False, "tags": ["a", "b"]},
+    {"topic": 2, "lang": "ko", "score": 1, "draft": True},
+    {"lang": "en", "tags": {"nested": 1}},
+    {"topic": 1},
+]
+
+
+def test_round_trip_through_memory_mapped_files(tmp_path):
+    """Test that texts and typed metadata survive save/load, read via mmap."""
+    ChunkStore.from_records(TEXTS, METADATAS).save(tmp_path)
+    store = ChunkStore.load(tmp_path)
+
+    assert len(store) == 4
+    assert [store.text(i) for i in range(4)] == TEXTS
+    assert [store.metadata(i) for i in range(4)] == METADATAS
+    assert isinstance(store.text_view(1), memoryview)
+    assert isinstance(store.offsets, np.memmap)
+    assert store.columns["topic"].kind == "int"
+    assert store.columns["score"].kind == "float"
+    assert store.columns["lang"].kind == "str"
+    assert store.columns["tags"].kind == "json"
+
+
+def test_filters_run_on_columns():
+    """Test equality filters per column kind, including absent values."""
+    store = ChunkStore.from_records(TEXTS, METADATAS)
+
+    assert store.match({"topic": 1}).tolist() == [True, False, False, True]
+    assert store.match({"lang": "en", "topic": 1}).tolist() == [True, False, False, False]
+    assert store.match({"draft": True}).tolist() == [False, True, False, False]
+    assert store.match({"topic": True}).tolist() == [False] * 4
+    assert store.match({"tags": {"nested": 1}}).tolist() == [False, False, True, False]
+    assert store.match({"missing": 1}).tolist() == [False] * 4
+
+
+def test_flat_store_filters_and_reads_legacy_layout(tmp_path):
+    """Test filtered search and opening a store saved as documents.jsonl."""
+    store = FlatVectorStore.from_texts("s", TEXTS, METADATAS)
+    ids, _ = store.search_vectors(store.embedder.embed_query("alpha"), top_k=10, filters={"topic": 1})
+    assert sorted(ids.tolist()) == [0, 3]
+
+    store.save(tmp_path / "new")
+    reopened = open_vector_store(tmp_path / "new")
+    assert reopened.search("alpha beta", top_k=1)[0].metadata == {**METADATAS[0], "id": 0}
+
+    legacy = tmp_path / "legacy"
+    store.save(legacy)
+    manifest = json.loads((legacy / "manifest.json").read_text())
+    del manifest["chunks"]
+    (legacy / "manifest.json").write_text(json.dumps(manifest))
+    (legacy / "documents.jsonl").write_text(
+        "\n".join(json.dumps({"content": t, "metadata": m}) for t, m in zip(TEXTS, METADATAS, strict=True))
+    )
+    assert open_vector_store(legacy).search("epsilon", top_k=1)[0].content == "epsilon"
+
+
+def test_query_materializes_only_final_sources(monkeypatch):
+    """Test that the engine builds Document objects for the sources only."""
+    texts = [f"shared word{i} topic" for i in range(50)]
+    stores = {
+        name: FlatVectorStore.from_texts(name, texts, [{"n": i} for i in range(50)])
+        for name in ("a", "b", "c")
+    }
+    materialized = []
+    original = ChunkStore.materialize
+    monkeypatch.setattr(
+        ChunkStore,
+        "materialize",
+        lambda self, ids, scores: materialized.extend(ids) or original(self, ids, scores),
+    )
+    engine = RAGEngine(stores, ModelManager({"fake": FakeProvider()}), "fake")
+
+    response = asyncio.run(engine.query("shared topic word7", max_results=4))
+
+    assert len(response.sources) == 4
+    assert len(materialized) == 4
+    assert response.sources[0].metadata["n"] == 7
+    scores = [source.score for source in response.sources]
+    assert scores == sorted(scores, reverse=True)
+    assert sum(len(r.documents) for r in response.vector_store_results.values()) == 4
+    assert all(len(r.scores) == 4 for r in response.vector_store_results.values())
+
+
+@pytest.mark.parametrize("count", [0, 1])
+def test_tiny_stores(tmp_path, count):
+    """Test empty and single-chunk stores, which cannot mmap an empty file."""
+    ChunkStore.from_records(TEXTS[:count], METADATAS[:count]).save(tmp_path)
+    store = ChunkStore.load(tmp_path)
+
+    assert len(store) == count
+    assert [store.text(i) for i in range(count)] == TEXTS[:count]
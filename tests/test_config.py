@@ -0,0 +1,206 @@
+"""
+Test the encrypted key store and hot-reloading configuration.
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from app.core import keystore as keystore_module
+from app.core.config import ConfigManager, get_config_manager
+from app.core.keystore import KeyStore, KeyStoreError
+from app.models import manager as manager_module
+from app.models.base import Configuration
+from app.models.llm import CompletionRequest, FakeProvider
+from app.models.manager import ModelManager
+
+
+class ClosingProvider(FakeProvider):
+    """Fake provider standing in for a pooled client; records when it is closed."""
+
+    def __init__(self, api_key="", base_url=""):
+        super().__init__(latency=0.05)
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    """Point AI Studio at an empty configuration directory."""
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    monkeypatch.delenv("AIS_MASTER_KEY", raising=False)
+    monkeypatch.delenv("AIS_MASTER_KEY_FILE", raising=False)
+    get_config_manager.cache_clear()
+    yield tmp_path
+    get_config_manager.cache_clear()
+
+
+def test_keys_are_encrypted_at_rest(config_dir):
+    """Test that stored keys round-trip but never hit disk in plaintext."""
+    store = KeyStore(config_dir)
+    store.set_key("openai", "sk-secret-value")
+
+    assert "sk-secret-value" not in (config_dir / "keys.json").read_text()
+    assert oct((config_dir / "keys.json").stat().st_mode & 0o777) == "0o600"
+    assert KeyStore(config_dir).get_key("openai") == "sk-secret-value"
+
+
+def test_key_derivation_runs_once_per_process(config_dir, monkeypatch):
+    """Test that scrypt runs once and later reads hit the decrypted cache."""
+    derivations = []
+    real_scrypt = keystore_module.Scrypt
+
+    def counting_scrypt(**kwargs):
+        derivations.append(1)
+        return real_scrypt(**kwargs)
+
+    monkeypatch.setattr(keystore_module, "Scrypt", counting_scrypt)
+    monkeypatch.setattr(keystore_module, "_derived_keys", {})
+
+    KeyStore(config_dir).set_key("openai", "sk-1")
+    store = KeyStore(config_dir)
+    for _ in range(100):
+        assert store.get_key("openai") == "sk-1"
+
+    assert len(derivations) == 1
+
+
+def test_wrong_master_key_is_rejected(config_dir):
+    """Test that a store cannot be read with a different master secret."""
+    KeyStore(config_dir, master_secret="right").set_key("openai", "sk-1")
+
+    with pytest.raises(KeyStoreError):
+        KeyStore(config_dir, master_secret="wrong").get_key("openai")
+
+
+def test_master_key_file_can_live_outside_the_config_dir(config_dir, tmp_path_factory, monkeypatch):
+    """Test that AIS_MASTER_KEY_FILE moves the generated master key away from keys.json."""
+    master_file = tmp_path_factory.mktemp("secrets") / "ais.key"
+    monkeypatch.setenv("AIS_MASTER_KEY_FILE", str(master_file))
+    KeyStore(config_dir).set_key("openai", "sk-1")
+
+    assert oct(master_file.stat().st_mode & 0o777) == "0o600"
+    assert not (config_dir / "master.key").exists()
+    assert KeyStore(config_dir).get_key("openai") == "sk-1"
+    monkeypatch.delenv("AIS_MASTER_KEY_FILE")
+    with pytest.raises(KeyStoreError):
+        KeyStore(config_dir).get_key("openai")
+
+
+def test_config_file_and_environment_precedence(config_dir, monkeypatch):
+    """Test that config.json is loaded and environment variables override it."""
+    (config_dir / "config.json").write_text(
+        json.dumps({"default_model": "from-file", "api_port": 9000})
+    )
+    monkeypatch.setenv("AIS_API_PORT", "9100")
+
+    config = ConfigManager().get()
+
+    assert config.default_model == "from-file"
+    assert config.api_port == 9100
+
+
+def test_hot_reload_notifies_listeners(config_dir):
+    """Test that on-disk changes are picked up without a restart."""
+    manager = ConfigManager(check_interval=0)
+    reloaded = []
+    manager.subscribe(reloaded.append)
+
+    assert manager.get().default_model == "gpt-3.5-turbo"
+    assert manager.reload_if_changed() is False
+
+    config_file = config_dir / "config.json"
+    config_file.write_text(json.dumps({"default_model": "gpt-4o"}))
+    os.utime(config_file, ns=(1, 1))
+
+    assert manager.get().default_model == "gpt-4o"
+    assert [config.default_model for config in reloaded] == ["gpt-4o"]
+
+
+def test_api_key_from_key_store_is_hot_reloaded(config_dir):
+    """Test that a key stored by another process reaches a running manager."""
+    manager = ConfigManager(check_interval=0)
+    assert manager.get().openai_api_key is None
+
+    KeyStore(config_dir).set_key("openai", "sk-new")
+
+    assert manager.get().openai_api_key == "sk-new"
+
+
+def test_invalid_config_keeps_last_good_configuration(config_dir):
+    """Test that a broken config file does not take the server down."""
+    manager = ConfigManager(check_interval=0)
+    (config_dir / "config.json").write_text("{not json")
+
+    assert manager.reload_if_changed() is False
+    assert manager.get().default_model == "gpt-3.5-turbo"
+
+
+def test_model_manager_reload_closes_replaced_providers(config_dir, monkeypatch):
+    """Test that reloads close replaced clients after their requests and keep registered ones."""
+    monkeypatch.setattr(manager_module, "OpenAIProvider", ClosingProvider)
+    registered = ClosingProvider()
+
+    async def run():
+        manager = ModelManager.from_config(Configuration(openai_api_key="sk-one"))
+        manager.register("fake", registered)
+        old = manager.providers["gpt-4o"]
+        request = asyncio.create_task(manager.complete(CompletionRequest(model="gpt-4o", prompt="hi")))
+        await asyncio.sleep(0.01)
+
+        manager.on_config_reload(Configuration(openai_api_key="sk-two"))
+        await asyncio.sleep(0)
+        assert not old.closed
+        assert (await request).text
+        assert old.closed
+        assert manager.get_provider("fake") is registered
+
+        # With nothing in flight the replaced client is closed right away
+        new = manager.providers["gpt-4o"]
+        manager.on_config_reload(Configuration())
+        await asyncio.sleep(0.01)
+        assert new.closed and "gpt-4o" not in manager.providers
+        assert manager.available_models() == ["fake"] and not registered.closed
+
+        await manager.aclose()
+        assert registered.closed
+
+    asyncio.run(run())
+
+
+def test_reload_during_provider_lookup_keeps_the_request_in_flight(config_dir, monkeypatch):
+    """Test that a request counts against the provider it is served by, even if a reload swaps the map."""
+    monkeypatch.setattr(manager_module, "OpenAIProvider", ClosingProvider)
+    manager = ModelManager.from_config(Configuration(openai_api_key="sk-one"))
+    old = manager.providers["gpt-4o"]
+
+    class ReloadOnLookup(dict):
+        def get(self, key, default=None):
+            # The config-watch thread swaps the map right after this lookup
+            manager.on_config_reload(Configuration(openai_api_key="sk-two"))
+            return super().get(key, default)
+
+    manager.providers = ReloadOnLookup(manager.providers)
+
+    async def run():
+        response = await manager.complete(CompletionRequest(model="gpt-4o", prompt="hi"))
+        assert response.text
+        await asyncio.sleep(0)
+        # Closed after its request finished, not while it was running
+        assert old.closed
+        await manager.aclose()
+
+    in_flight = []
+    real_complete = ClosingProvider.complete
+
+    async def checking_complete(self, request):
+        in_flight.append(manager._in_flight[self])
+        return await real_complete(self, request)
+
+    monkeypatch.setattr(ClosingProvider, "complete", checking_complete)
+    asyncio.run(run())
+    assert in_flight == [1]
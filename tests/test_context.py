@@ -0,0 +1,113 @@
+"""
+Test context packing: near-duplicate elimination and the token budget.
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.bench.corpus import generate_corpus
+from app.models.llm import FakeProvider
+from app.models.manager import ModelManager
+from app.rag.chunk_store import ChunkStore
+from app.rag.context import count_tokens, pack_context, simhash
+from app.rag.engine import RAGEngine
+from app.rag.vector_stores import FlatVectorStore, open_vector_store
+
+TEXTS, METADATAS = generate_corpus(num_documents=120)
+
+
+class RecordingProvider(FakeProvider):
+    """Fake provider that keeps the prompts it was sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    async def stream(self, request):
+        self.prompts.append(request.prompt)
+        async for chunk in super().stream(request):
+            yield chunk
+
+
+def test_simhash_separates_near_duplicates_from_other_chunks():
+    """Test that copies and small edits are close and unrelated chunks are far apart."""
+    words = TEXTS[0].split()
+    edited = " ".join(words[:20] + ["changed"] + words[21:])
+
+    assert simhash(TEXTS[0]) == simhash(TEXTS[0].upper())
+    assert (simhash(TEXTS[0]) ^ simhash(edited)).bit_count() <= 8
+    assert min((simhash(TEXTS[0]) ^ simhash(text)).bit_count() for text in TEXTS[1:]) > 8
+    assert count_tokens("Vectors, stores; and 3 answers.") == 8
+
+
+def test_packing_drops_duplicates_and_respects_the_budget():
+    """Test that packing keeps the best copy, skips chunks over budget and stops at max_results."""
+    hashes = np.array([0b1111, 0b1110, 1 << 40, 1 << 50, 1 << 60, 1 << 30], dtype=np.uint64)
+    tokens = np.array([50, 50, 80, 30, 10, 10], dtype=np.int32)
+
+    packed = pack_context(hashes, tokens, max_results=3, token_budget=100, max_distance=1)
+
+    assert packed.kept == [0, 3, 4]
+    assert packed.duplicates == [(1, 0, 1)]
+    assert packed.over_budget == [2]
+    assert packed.tokens == 90
+    assert pack_context(hashes, tokens, 6, None, None).kept == list(range(6))
+
+
+def test_query_drops_chunks_repeated_across_stores():
+    """Test that a chunk found in two stores is sent once and the drop is traced."""
+    shared = TEXTS[:30]
+    stores = {
+        "store_a": FlatVectorStore.from_texts("store_a", shared + TEXTS[30:60]),
+        "common": FlatVectorStore.from_texts("common", shared + TEXTS[60:90]),
+    }
+
+    async def run(engine):
+        return await engine.query(TEXTS[5], max_results=4)
+
+    provider = RecordingProvider()
+    engine = RAGEngine(stores, ModelManager({"fake": provider}), "fake")
+    response = asyncio.run(run(engine))
+
+    contents = [source.content for source in response.sources]
+    assert contents[0] == TEXTS[5] and len(set(contents)) == len(contents) == 4
+    context_step = response.trace.steps[1]
+    assert context_step.step_type == "context"
+    duplicate = context_step.details["duplicates"][0]
+    assert duplicate["store"] == "common" and duplicate["duplicate_of"]["store"] == "store_a"
+    assert duplicate["distance"] == 0
+    assert response.retrieval_metrics["dropped_duplicates"] >= 1
+    assert response.retrieval_metrics["context_tokens"] == sum(count_tokens(text) for text in contents)
+
+    # Without deduplication the copy takes a place in the prompt
+    engine.context_dedup_distance = None
+    undeduplicated = asyncio.run(run(engine))
+    assert [source.content for source in undeduplicated.sources][:2] == [TEXTS[5], TEXTS[5]]
+
+    # A budget of two chunks' worth of tokens keeps the prompt to two chunks
+    engine.context_dedup_distance = 8
+    engine.context_token_budget = 2 * count_tokens(TEXTS[5]) + 1
+    budgeted = asyncio.run(run(engine))
+    assert len(budgeted.sources) == 2
+    assert len(provider.prompts[-1]) < len(provider.prompts[0])
+
+
+def test_signatures_are_stored_and_recomputed_for_older_stores(tmp_path):
+    """Test that saved stores keep their signatures and stores without them compute the same."""
+    store = FlatVectorStore.from_texts("docs", TEXTS, METADATAS)
+    store.save(tmp_path / "docs")
+    expected = store.get_signatures([3, 7])
+
+    loaded = open_vector_store(tmp_path / "docs")
+    assert isinstance(loaded.chunks.simhashes, np.memmap)
+    for path in tmp_path.glob("docs/**/*.npy"):
+        if path.name in ("simhash.npy", "tokens.npy"):
+            path.unlink()
+    older = open_vector_store(tmp_path / "docs")
+    assert older.chunks.simhashes is None
+
+    for signatures in (loaded.get_signatures([3, 7]), older.get_signatures([3, 7])):
+        assert signatures[0].tolist() == expected[0].tolist()
+        assert signatures[1].tolist() == expected[1].tolist()
+    assert ChunkStore.from_records(["a b"]).signatures([0])[1].tolist() == [2]
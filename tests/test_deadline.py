@@ -0,0 +1,202 @@
+"""
+Test request deadlines and cancellation through the query pipeline.
+"""
+
+import asyncio
+import time
+
+import httpx
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.dependencies import _watch_disconnect
+from app.bench.runner import FAKE_MODELS, build_bench_app, build_bench_stores
+from app.core.deadline import DeadlineExceeded, RequestCancelled, RequestContext
+from app.mcp.client import MCPClient
+from app.models.llm import FakeProvider
+from app.models.manager import ModelManager
+from app.rag.engine import RAGEngine
+
+
+class SlowStore:
+    """Wraps a store and sleeps before searching, like an overloaded backend."""
+
+    def __init__(self, store, delay):
+        self.store = store
+        self.delay = delay
+        self.embedder = store.embedder
+
+    def search_vectors(self, query_vector, top_k=5, filters=None):
+        time.sleep(self.delay)
+        return self.store.search_vectors(query_vector, top_k, filters)
+
+    def get_documents(self, ids, scores):
+        return self.store.get_documents(ids, scores)
+
+    def get_signatures(self, ids):
+        return self.store.get_signatures(ids)
+
+
+class TrackingProvider(FakeProvider):
+    """Fake provider that records whether its stream was closed early."""
+
+    closed_early = False
+
+    async def stream(self, request):
+        finished = False
+        try:
+            async for chunk in super().stream(request):
+                yield chunk
+            finished = True
+        finally:
+            self.closed_early = not finished
+
+
+def _engine(provider, stores=None):
+    manager = ModelManager({FAKE_MODELS[0]: provider})
+    return RAGEngine(stores or build_bench_stores(200), manager, FAKE_MODELS[0])
+
+
+def test_deadline_during_generation_returns_the_partial_answer():
+    """Test that generation stops at the deadline and keeps the streamed text."""
+    async def run():
+        provider = TrackingProvider(chunk_delay=0.05, chunk_words=1)
+        engine = _engine(provider)
+        context = RequestContext(timeout=0.2)
+
+        start_time = time.perf_counter()
+        with context.activate():
+            response = await engine.query("t5w2 t5w9 t5w11 model answer", max_results=5)
+
+        assert time.perf_counter() - start_time < 0.5
+        assert response.partial
+        assert response.answer.startswith(f"[{FAKE_MODELS[0]}] Answer")
+        assert provider.closed_early
+        retrieval, _, generation = response.trace.steps
+        assert retrieval.success and retrieval.details["time_left_start"] > retrieval.details["time_left_end"] > 0
+        assert not generation.success and generation.details["time_left_end"] == 0.0
+        assert "exceeded" in generation.details["interrupted"]
+
+    asyncio.run(run())
+
+
+def test_slow_store_is_left_out_at_the_deadline():
+    """Test that stores answering after the deadline are skipped, not waited for."""
+    async def run():
+        stores = build_bench_stores(200)
+        stores["store_b"] = SlowStore(stores["store_b"], delay=0.5)
+        engine = _engine(FakeProvider(), stores)
+        context = RequestContext(timeout=0.2)
+
+        with context.activate():
+            response = await engine.query("t5w2 t5w9", max_results=3)
+
+        assert response.partial
+        assert "store_b" not in response.vector_store_results
+        assert set(response.vector_store_results) == {"store_a", "store_c", "common"}
+        assert response.trace.steps[0].details["timed_out"] == ["store_b"]
+        # No time was left for the model
+        assert response.answer == ""
+
+    asyncio.run(run())
+
+
+def test_cancellation_stops_generation_promptly():
+    """Test that cancelling the context (e.g. on disconnect) closes the model stream."""
+    async def run():
+        provider = TrackingProvider(chunk_delay=0.05, chunk_words=1)
+        engine = _engine(provider)
+        context = RequestContext()
+
+        async def disconnect():
+            await asyncio.sleep(0.1)
+            context.cancel("client disconnected")
+
+        with context.activate():
+            canceller = asyncio.create_task(disconnect())
+            response = await engine.query("t5w2 t5w9 t5w11 model answer")
+            await canceller
+
+        assert response.partial and provider.closed_early
+        assert response.trace.steps[-1].details["interrupted"] == "client disconnected"
+
+    asyncio.run(run())
+
+
+def test_unbounded_queries_are_complete_and_traced():
+    """Test that without a deadline the answer is complete and the stages are recorded."""
+    async def run():
+        response = await _engine(FakeProvider()).query("t5w2 t5w9")
+
+        assert not response.partial
+        assert [step.step_type for step in response.trace.steps] == ["retrieval", "context", "generation"]
+        assert all(step.details["time_left_start"] is None for step in response.trace.steps)
+
+    asyncio.run(run())
+
+
+def test_guard_raises_the_interruption_reason():
+    """Test that guarded work reports whether the deadline or a cancellation stopped it."""
+    async def run():
+        context = RequestContext(timeout=0.05)
+        with pytest.raises(DeadlineExceeded):
+            await context.guard(asyncio.sleep(1))
+        context = RequestContext()
+        context.cancel("stop")
+        with pytest.raises(RequestCancelled):
+            await context.guard(asyncio.sleep(1))
+
+    asyncio.run(run())
+
+
+def test_mcp_call_is_cut_at_the_deadline():
+    """Test that a slow MCP tool call fails at the deadline and is recorded in the trace."""
+    async def run():
+        async def slow_server(request):
+            await asyncio.sleep(1)
+            return httpx.Response(200, json={"jsonrpc": "2.0", "id": 1, "result": {}})
+
+        async with httpx.AsyncClient(transport=httpx.MockTransport(slow_server)) as http:
+            client = MCPClient("tools", {"url": "http://mcp.test/mcp"}, http_client=http)
+            context = RequestContext(timeout=0.1)
+            start_time = time.perf_counter()
+            with context.activate():
+                call = await client.call_tool("search", {"q": "x"})
+
+        assert time.perf_counter() - start_time < 0.5
+        assert not call.success and "exceeded" in call.result["error"]
+        assert context.trace().mcp_calls == [call]
+
+    asyncio.run(run())
+
+
+def test_disconnect_watcher_cancels_the_context():
+    """Test that a client disconnect cancels the request context."""
+    async def run():
+        class Request:
+            def __init__(self):
+                self.polls = 0
+
+            async def is_disconnected(self):
+                self.polls += 1
+                return self.polls > 2
+
+        context = RequestContext()
+        await asyncio.wait_for(_watch_disconnect(Request(), context), 1)
+        assert context.cancel_reason == "client disconnected"
+
+    asyncio.run(run())
+
+
+def test_timeout_header_bounds_the_request():
+    """Test that X-AIS-Timeout shortens the request deadline end to end."""
+    client = TestClient(build_bench_app(num_documents=40, provider_latency=0.5))
+
+    response = client.post("/api/rag/query", json={"query": "t1w1"}, headers={"X-AIS-Timeout": "0.1"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["partial"] is True and data["answer"] == ""
+    assert [step["step_type"] for step in data["trace"]["steps"]] == ["retrieval", "context", "generation"]
+    assert np.isclose(data["trace"]["steps"][0]["details"]["time_left_start"], 0.1, atol=0.05)
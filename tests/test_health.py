@@ -0,0 +1,167 @@
+"""
+Test the deep health check subsystem.
+"""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.cli.commands import check_health
+from app.models.base import Configuration
+from app.rag.vector_stores import FlatVectorStore
+from app.server.app import create_app
+from app.server.health import HealthChecker, HealthProbe
+
+
+def build_store(path):
+    store = FlatVectorStore.from_texts(
+        "store_a", ["health check document", "another document"]
+    )
+    store.save(path)
+
+
+def test_vector_store_probe_opens_and_queries(tmp_path, monkeypatch):
+    """Test that each store under vector_store_path is opened, queried and closed."""
+    build_store(tmp_path / "store_a")
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "manifest.json").write_text(json.dumps({"format": "nope"}))
+    closed = []
+    monkeypatch.setattr(FlatVectorStore, "close", lambda self: closed.append(self.name))
+
+    checker = HealthChecker(Configuration(vector_store_path=str(tmp_path)))
+    report = asyncio.run(checker.check())
+    assert closed == ["store_a"]
+
+    probes = {probe.name: probe for probe in report.probes}
+    assert probes["store_a"].healthy
+    assert "2 documents" in probes["store_a"].message
+    assert not probes["broken"].healthy
+    assert report.status == "unhealthy"
+    assert all(probe.latency >= 0 for probe in report.probes)
+
+
+def test_unreachable_mcp_server_is_reported():
+    """Test that an unreachable MCP server marks the report degraded."""
+    config = Configuration(mcp_servers={"tools": {"url": "http://127.0.0.1:9/mcp"}})
+    report = asyncio.run(HealthChecker(config, probe_timeout=1.0).check())
+
+    assert report.probes[0].kind == "mcp_server"
+    assert not report.probes[0].healthy
+    # An external dependency does not make the instance itself unhealthy
+    assert report.status == "degraded"
+
+
+def test_probes_run_concurrently_with_timeout():
+    """Test that slow probes time out without delaying the others."""
+    checker = HealthChecker(Configuration(), probe_timeout=0.2)
+
+    async def slow() -> str:
+        await asyncio.sleep(5)
+        return "never"
+
+    async def fast() -> str:
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    checker.build_probes = lambda: [
+        HealthProbe("slow", "provider", slow),
+        HealthProbe("fast-1", "provider", fast),
+        HealthProbe("fast-2", "provider", fast),
+    ]
+    report = asyncio.run(checker.check())
+
+    probes = {probe.name: probe for probe in report.probes}
+    assert not probes["slow"].healthy
+    assert "timed out" in probes["slow"].message
+    assert probes["fast-1"].healthy and probes["fast-2"].healthy
+    assert max(probe.latency for probe in report.probes) < 0.5
+
+
+def test_report_is_cached_for_ttl():
+    """Test that repeated checks within the TTL reuse the report."""
+    checker = HealthChecker(Configuration(), ttl=60)
+    runs = []
+
+    async def probe() -> str:
+        runs.append(1)
+        return "ok"
+
+    checker.build_probes = lambda: [HealthProbe("p", "provider", probe)]
+
+    async def run():
+        await asyncio.gather(checker.check(), checker.check())
+        await checker.check()
+        await checker.check(force=True)
+
+    asyncio.run(run())
+    assert len(runs) == 2
+
+
+def test_timed_out_probe_is_reused_instead_of_restarted():
+    """Test that a probe still running after its timeout is not started again."""
+    checker = HealthChecker(Configuration(), probe_timeout=0.05)
+    starts = []
+
+    async def stuck() -> str:
+        starts.append(1)
+        # Only the first run hangs past the timeout
+        await asyncio.sleep(0.3 if len(starts) == 1 else 0)
+        return "ok"
+
+    checker.build_probes = lambda: [HealthProbe("store", "vector_store", stuck)]
+
+    async def run():
+        first = await checker.check(force=True)
+        second = await checker.check(force=True)
+        await asyncio.sleep(0.3)
+        third = await checker.check(force=True)
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert not first.probes[0].healthy and not second.probes[0].healthy
+    # The second check waited on the first run; the third started a new one
+    assert third.probes[0].healthy
+    assert len(starts) == 2
+
+
+def test_liveness_ignores_dependencies_and_readiness_reports_them(tmp_path):
+    """Test that /api/health stays up and /api/health/ready fails only for local dependencies."""
+    (tmp_path / "broken").mkdir()
+    (tmp_path / "broken" / "manifest.json").write_text("{}")
+
+    app = create_app()
+    app.state.health_checker = HealthChecker(Configuration(vector_store_path=str(tmp_path)))
+    client = TestClient(app)
+
+    assert client.get("/api/health").status_code == 200
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 503
+    assert ready.json()["status"] == "unhealthy"
+
+    # A provider that is down degrades readiness without failing it
+    app.state.health_checker = HealthChecker(
+        Configuration(vector_store_path=str(tmp_path / "missing"), provider_endpoints={"local": "http://127.0.0.1:9"}),
+        probe_timeout=1.0,
+    )
+    ready = client.get("/api/health/ready")
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "degraded"
+
+
+def test_cli_json_output(capsys):
+    """Test that `ais health --json` prints a machine-readable report."""
+    check_health(json_output=True)
+
+    payload = json.loads(capsys.readouterr().out)
+    assert payload["status"] == "healthy"
+    assert payload["dependencies"]["fastapi"] is True
+
+
+def test_cli_exits_zero_when_only_degraded(capsys, monkeypatch):
+    """Test that `ais health` agrees with /api/health/ready: degraded still serves."""
+    unreachable = {"tools": {"url": "http://127.0.0.1:9/mcp"}}
+    monkeypatch.setattr("app.models.base.Configuration", lambda: Configuration(mcp_servers=unreachable))
+    check_health(json_output=True, timeout=1.0)
+
+    assert json.loads(capsys.readouterr().out)["status"] == "degraded"
@@ -0,0 +1,148 @@
+"""
+Test on-demand request profiling.
+"""
+
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.bench.runner import build_bench_app
+from app.core.config import get_config_manager
+from app.server.profiling import ProfileStore, ProfilingMiddleware
+
+
+@pytest.fixture
+def profiling_env(tmp_path, monkeypatch):
+    """Enable profiling through the environment, as `ais run --profile` does."""
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    monkeypatch.setenv("AIS_PROFILING_ENABLED", "true")
+    monkeypatch.setenv("AIS_PROFILE_CAPACITY", "2")
+    get_config_manager.cache_clear()
+    yield monkeypatch
+    get_config_manager.cache_clear()
+
+
+def test_disabled_profiling_installs_nothing(tmp_path, monkeypatch):
+    """Test that the middleware is absent and the endpoints 404 by default."""
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    get_config_manager.cache_clear()
+    app = build_bench_app(num_documents=40)
+    get_config_manager.cache_clear()
+
+    assert all(m.cls is not ProfilingMiddleware for m in app.user_middleware)
+    response = TestClient(app).get("/api/developer/profiles")
+    assert response.status_code == 404
+
+
+def test_header_triggered_profile_downloads(profiling_env):
+    """Test that a header-triggered request is captured and downloadable."""
+    client = TestClient(build_bench_app(num_documents=40, provider_latency=0.02))
+
+    plain = client.post("/api/rag/query", json={"query": "t1w1"})
+    assert "x-ais-profile-id" not in plain.headers
+
+    response = client.post(
+        "/api/rag/query", json={"query": "t1w1 t1w2"}, headers={"X-AIS-Profile": "1"}
+    )
+    assert response.status_code == 200
+    profile_id = int(response.headers["x-ais-profile-id"])
+
+    profiles = client.get("/api/developer/profiles").json()
+    assert [p["id"] for p in profiles] == [profile_id]
+    assert profiles[0]["path"] == "/api/rag/query"
+    assert profiles[0]["trigger"] == "header"
+    assert profiles[0]["status_code"] == 200
+    assert profiles[0]["samples"] > 0
+
+    speedscope = client.get(f"/api/developer/profiles/{profile_id}").json()
+    profile = speedscope["profiles"][0]
+    assert profile["type"] == "sampled"
+    assert len(profile["samples"]) == len(profile["weights"]) > 0
+    frames = speedscope["shared"]["frames"]
+    assert all(0 <= i < len(frames) for sample in profile["samples"] for i in sample)
+
+    folded = client.get(f"/api/developer/profiles/{profile_id}?format=folded").text
+    line = folded.splitlines()[0]
+    assert line.startswith("thread ") and line.rsplit(" ", 1)[1].isdigit()
+    assert client.get("/api/developer/profiles/999").status_code == 404
+
+
+def test_sampling_and_ring_capacity(profiling_env):
+    """Test sampled profiling and that only the newest profiles are kept."""
+    profiling_env.setenv("AIS_PROFILE_SAMPLE_RATE", "1.0")
+    client = TestClient(build_bench_app(num_documents=40))
+
+    ids = [int(client.get("/api/health").headers["x-ais-profile-id"]) for _ in range(3)]
+    profiles = client.get("/api/developer/profiles").json()
+    assert [p["id"] for p in profiles][:2] == list(reversed(ids))[:2]
+    assert all(p["trigger"] == "sampled" for p in profiles)
+
+
+def test_profile_token_is_required(profiling_env):
+    """Test that a configured token gates both triggering and downloading."""
+    profiling_env.setenv("AIS_PROFILE_TOKEN", "s3cret")
+    client = TestClient(build_bench_app(num_documents=40))
+
+    wrong = client.get("/api/health", headers={"X-AIS-Profile": "guess"})
+    assert "x-ais-profile-id" not in wrong.headers
+    assert client.get("/api/developer/profiles").status_code == 403
+
+    right = client.get("/api/health", headers={"X-AIS-Profile": "s3cret"})
+    assert "x-ais-profile-id" in right.headers
+    listed = client.get("/api/developer/profiles", headers={"X-AIS-Profile": "s3cret"})
+    assert json.loads(listed.text)[0]["trigger"] == "header"
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def profiled_work():
+    _spin(0.03)
+
+
+def unprofiled_work():
+    _spin(0.05)
+
+
+def test_concurrent_requests_stay_out_of_the_profile():
+    """Test that work of an unprofiled request on the event loop is not sampled."""
+    store = ProfileStore()
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/profiled":
+            await asyncio.sleep(0.02)
+            profiled_work()
+            await asyncio.sleep(0.08)
+        else:
+            await asyncio.sleep(0.04)
+            unprofiled_work()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = ProfilingMiddleware(app, store, token="s3cret")
+
+    async def request(path, headers):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "method": "GET", "path": path, "headers": headers}
+        await middleware(scope, receive, send)
+
+    async def run():
+        await asyncio.gather(
+            request("/profiled", [(b"x-ais-profile", b"s3cret")]), request("/other", [])
+        )
+
+    asyncio.run(run())
+    folded = store.get(store.list()[0].id).to_folded()
+    assert "profiled_work" in folded
+    assert "unprofiled_work" not in folded
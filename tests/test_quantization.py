@@ -0,0 +1,100 @@
+"""
+Test quantized vector stores.
+"""
+
+import numpy as np
+import pytest
+
+from app.bench.corpus import generate_corpus
+from app.bench.retrieval import quantization_report
+from app.cli import commands
+from app.rag.quantization import ProductQuantizer
+from app.rag.vector_stores import (
+    FlatVectorStore,
+    QuantizedVectorStore,
+    discover_vector_stores,
+    open_vector_store,
+    staging_directory,
+)
+
+
+@pytest.fixture(scope="module")
+def flat_store():
+    texts, metadatas = generate_corpus(num_documents=1500)
+    return FlatVectorStore.from_texts("store", texts, metadatas)
+
+
+@pytest.mark.parametrize("method, params, min_ratio", [("int8", {}, 3.9), ("pq", {"subspaces": 32}, 4.5)])
+def test_rescored_search_matches_exact_search(flat_store, method, params, min_ratio):
+    """Test that rescoring recovers exact top-k while codes use far less memory."""
+    quantized = QuantizedVectorStore.from_flat(flat_store, method, **params)
+    report = quantization_report(flat_store, quantized, k=10, sample=100)
+
+    assert report.recall_at_k >= 0.98
+    assert report.recall_at_k >= report.recall_at_k_codes_only
+    assert report.float_bytes / report.resident_bytes >= min_ratio
+
+    query = flat_store.embedder.embed_query("t4w1 t4w2 t4w3")
+    ids, scores = quantized.search_vectors(query, 5)
+    exact_ids, exact_scores = flat_store.search_vectors(query, 5)
+    assert ids.tolist() == exact_ids.tolist()
+    np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+
+def test_saved_store_keeps_codes_resident_and_vectors_on_disk(flat_store, tmp_path):
+    """Test the quantized on-disk format and filtered search after reopening."""
+    QuantizedVectorStore.from_flat(flat_store, "pq", subspaces=16).save(tmp_path)
+    store = open_vector_store(tmp_path)
+
+    assert isinstance(store, QuantizedVectorStore)
+    assert not isinstance(store.codes, np.memmap)
+    assert isinstance(store.vectors, np.memmap)
+    documents = store.search("t2w5 t2w6", top_k=3, filters={"topic": 2})
+    assert documents and all(doc.metadata["topic"] == 2 for doc in documents)
+
+
+@pytest.mark.parametrize("rescore", [True, False])
+def test_filter_matching_fewer_rows_than_the_shortlist(flat_store, rescore):
+    """Test that rows excluded by a filter never fill up the rescoring shortlist."""
+    texts = [flat_store.chunks.text(i) for i in range(40)]
+    metadatas = [{"lang": "en" if i % 13 == 0 else "fr"} for i in range(40)]
+    quantized = QuantizedVectorStore.from_flat(FlatVectorStore.from_texts("store", texts, metadatas), "int8")
+
+    query = flat_store.embedder.embed_query(texts[1])
+    ids, _ = quantized.search_vectors(query, top_k=5, filters={"lang": "en"}, rescore=rescore)
+
+    assert sorted(ids.tolist()) == [0, 13, 26, 39]
+
+
+def test_pq_requires_divisible_dimension():
+    """Test that an incompatible subspace count is rejected."""
+    with pytest.raises(ValueError):
+        ProductQuantizer(subspaces=7).train(np.ones((10, 256), dtype=np.float32))
+
+
+def test_quantize_command_rewrites_store(flat_store, tmp_path):
+    """Test that `ais quantize --write` swaps a flat store for a quantized one."""
+    path = tmp_path / "store"
+    flat_store.save(path)
+    commands.quantize_stores(
+        stores=[str(path)], method="int8", subspaces=32, rescore_factor=4,
+        k=10, sample=20, write=True,
+    )
+
+    assert open_vector_store(path).format_name == "quantized"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["store"]
+
+
+def test_swap_interrupted_between_renames_restores_the_old_store(flat_store, tmp_path):
+    """Test that a crash after the old store was renamed aside leaves it openable."""
+    path = tmp_path / "store"
+    flat_store.save(path)
+    staging = staging_directory(path)
+    QuantizedVectorStore.from_flat(flat_store, "int8").save(staging)
+    # As if the process died right after renaming the old store aside
+    path.rename(tmp_path / "store.retired")
+
+    assert list(discover_vector_stores(tmp_path)) == ["store"]
+    assert not (tmp_path / "store.retired").exists()
+    path.rename(tmp_path / "store.retired")
+    assert open_vector_store(path).format_name == "flat"
@@ -0,0 +1,231 @@
+"""
+Test recording and replaying model responses.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.config import get_config_manager
+from app.models.llm import CompletionRequest, FakeProvider
+from app.models.manager import ModelManager
+from app.models.replay import (
+    INDEX_SUFFIX,
+    SEGMENT_SUFFIX,
+    ReplayMiss,
+    ReplayStore,
+    request_key,
+)
+
+
+class CountingProvider(FakeProvider):
+    """Fake provider that counts the requests it serves."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    async def stream(self, request):
+        self.calls += 1
+        async for chunk in super().stream(request):
+            yield chunk
+
+
+def _request(prompt, **kwargs):
+    return CompletionRequest(model="fake", prompt=prompt, **kwargs)
+
+
+async def _collect(provider, request):
+    start = time.perf_counter()
+    chunks = [chunk async for chunk in provider.stream(request)]
+    return chunks, time.perf_counter() - start
+
+
+def test_request_key_covers_model_and_parameters():
+    """Test that the key is stable and changes with every request field."""
+    base = _request("What is RAG?")
+    assert request_key(base) == request_key(_request("What is RAG?"))
+    variants = [
+        _request("What is RAG?", temperature=0.2),
+        _request("What is RAG?", system="Be brief"),
+        _request("What is RAG?", max_tokens=5),
+        CompletionRequest(model="other", prompt="What is RAG?"),
+    ]
+    assert len({request_key(request) for request in [base, *variants]}) == 5
+
+
+def test_streams_are_recorded_and_replayed_with_their_timing(tmp_path):
+    """Test that replay returns the recorded chunks, paced only when asked."""
+    upstream = CountingProvider(latency=0.05, chunk_delay=0.02, chunk_words=2)
+    store = ReplayStore(tmp_path, mode="auto")
+    provider = store.wrap(upstream)
+    request = _request("how are vector stores sharded across workers")
+
+    recorded, _ = asyncio.run(_collect(provider, request))
+    replayed, fast = asyncio.run(_collect(provider, request))
+    recording = store.get(request)
+
+    assert upstream.calls == 1
+    assert replayed == recorded == recording.chunks
+    assert recording.offsets[0] >= 0.05 and recording.latency >= recording.offsets[-1]
+    assert fast < 0.05
+
+    store.reproduce_latency = True
+    paced, elapsed = asyncio.run(_collect(provider, request))
+    assert paced == recorded and elapsed >= recording.offsets[-1]
+
+    # A completion replays the recorded latency without waiting for it
+    store.reproduce_latency = False
+    response = asyncio.run(provider.complete(request))
+    assert response.text == "".join(recorded) and response.latency == recording.latency
+    assert upstream.calls == 1
+
+
+def test_modes_decide_between_provider_and_recordings(tmp_path):
+    """Test that record always calls the provider and replay never does."""
+    upstream = CountingProvider()
+    store = ReplayStore(tmp_path, mode="record")
+    request = _request("compare the models")
+
+    asyncio.run(store.wrap(upstream).complete(request))
+    asyncio.run(store.wrap(upstream).complete(request))
+    assert upstream.calls == 2
+
+    store.mode = "replay"
+    assert asyncio.run(store.wrap(None).complete(request)).text.startswith("[fake] Answer")
+    with pytest.raises(ReplayMiss):
+        asyncio.run(store.wrap(upstream).complete(_request("never recorded")))
+    assert upstream.calls == 2
+
+
+def test_store_reopens_rotates_and_ignores_torn_appends(tmp_path):
+    """Test that recordings survive reopening, across segments, and after a crash."""
+    store = ReplayStore(tmp_path, mode="auto", segment_bytes=4096)
+    provider = store.wrap(FakeProvider())
+    requests = [_request(f"question number {i} about chunk stores") for i in range(300)]
+
+    async def record():
+        for request in requests:
+            await provider.complete(request)
+
+    asyncio.run(record())
+    # Re-recording a request replaces the earlier recording
+    store.mode = "record"
+    asyncio.run(_collect(store.wrap(FakeProvider(chunk_words=1)), requests[0]))
+    store.close()
+
+    segments = sorted(tmp_path.glob(f"*{SEGMENT_SUFFIX}"))
+    assert len(segments) > 1
+    with open(segments[-1], "ab") as f:
+        f.write(b"\x00\x00\x10\x00torn")
+    with open(segments[-1].with_suffix(INDEX_SUFFIX), "ab") as f:
+        f.write(b"\x01" * 7)
+
+    reopened = ReplayStore(tmp_path, mode="replay")
+    assert len(reopened) == 300
+    assert all(reopened.get(request) is not None for request in requests)
+    assert len(reopened.get(requests[0]).chunks) > 1
+    assert reopened.get(_request("unknown")) is None
+    # Compressed recordings take less space than their JSON
+    stored = sum(path.stat().st_size for path in segments)
+    raw = sum(len(reopened.get(request).model_dump_json()) for request in requests)
+    assert stored < raw
+    reopened.close()
+
+
+def test_workers_replay_each_others_recordings(tmp_path, monkeypatch):
+    """Test that a store opened earlier finds what another worker recorded since."""
+    monkeypatch.setattr("app.models.replay.os.getpid", lambda: 1001)
+    first = ReplayStore(tmp_path, mode="auto")
+    asyncio.run(first.wrap(FakeProvider()).complete(_request("what is a segment")))
+    monkeypatch.setattr("app.models.replay.os.getpid", lambda: 1002)
+    second = ReplayStore(tmp_path, mode="replay")
+    request = _request("what is a shard")
+    asyncio.run(first.wrap(FakeProvider()).complete(request))
+
+    assert second.get(request) is not None
+    asyncio.run(_collect(first.wrap(FakeProvider()), _request("what is a wal")))
+    assert second.get(_request("what is a wal")) is not None
+    assert len(second) == 3
+    # A re-recording of a request the second store loaded is still one request
+    first.mode = "record"
+    asyncio.run(first.wrap(FakeProvider()).complete(_request("what is a segment")))
+    assert second.get(_request("never recorded")) is None
+    assert len(second._recent) == 3 and len(second) == 3
+    first.close()
+    second.close()
+
+
+def test_recordings_are_read_and_written_off_the_event_loop(tmp_path, monkeypatch):
+    """Test that lookups and recordings run in worker threads, not on the loop."""
+    threads = {"get": [], "put": []}
+    get, put = ReplayStore.get, ReplayStore.put
+
+    def recording_get(self, request):
+        threads["get"].append(threading.current_thread())
+        return get(self, request)
+
+    def recording_put(self, recording):
+        threads["put"].append(threading.current_thread())
+        put(self, recording)
+
+    monkeypatch.setattr(ReplayStore, "get", recording_get)
+    monkeypatch.setattr(ReplayStore, "put", recording_put)
+    provider = ReplayStore(tmp_path, mode="auto").wrap(FakeProvider())
+
+    async def serve():
+        await provider.complete(_request("what is a shard"))
+        await _collect(provider, _request("what is a wal"))
+        await provider.complete(_request("what is a shard"))
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(serve())
+    assert len(threads["get"]) == 3 and len(threads["put"]) == 2
+    assert loop_thread not in threads["get"] + threads["put"]
+    provider.store.close()
+
+
+def test_close_leaves_in_flight_requests_working(tmp_path):
+    """Test that recordings are still read and written after the store is closed."""
+    store = ReplayStore(tmp_path, mode="auto")
+    provider = store.wrap(FakeProvider())
+    request = _request("what is a shard")
+    asyncio.run(provider.complete(request))
+    assert store.get(request) is not None
+    store.close()
+
+    assert store.get(request) is not None
+    assert store._fds == {}
+    asyncio.run(provider.complete(_request("what is a wal")))
+    assert store._data is None
+    assert ReplayStore(tmp_path, mode="replay").get(_request("what is a wal")) is not None
+
+
+def test_model_comparisons_replay_offline(tmp_path, monkeypatch):
+    """Test that a rerun in replay mode makes no provider calls and keeps response times."""
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    monkeypatch.setenv("AIS_REPLAY_MODE", "record")
+    monkeypatch.setenv("AIS_REPLAY_STORE_PATH", str(tmp_path / "replay"))
+    get_config_manager.cache_clear()
+    try:
+        config = get_config_manager().get()
+        upstream = CountingProvider(latency=0.02)
+        manager = ModelManager.from_config(config)
+        manager.register("fake", upstream)
+        recorded = asyncio.run(manager.test_models("what is a shard", ["fake"]))
+
+        # A fresh process: replay only, and no provider for the model at all
+        config = config.model_copy(update={"replay_mode": "replay"})
+        offline = ModelManager.from_config(config)
+        replayed = asyncio.run(offline.test_models("what is a shard", ["fake"]))
+        asyncio.run(manager.aclose())
+        asyncio.run(offline.aclose())
+    finally:
+        get_config_manager.cache_clear()
+
+    assert upstream.calls == 1
+    assert replayed.results["fake"].success
+    assert replayed.results["fake"].response == recorded.results["fake"].response
+    assert replayed.results["fake"].response_time == recorded.results["fake"].response_time
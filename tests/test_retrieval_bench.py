@@ -0,0 +1,67 @@
+"""
+Test the retrieval quality and latency harness.
+"""
+
+import json
+
+import pytest
+
+from app.bench.retrieval import (
+    IndexConfig,
+    evaluate_index,
+    generate_dataset,
+    load_dataset,
+    run_retrieval_benchmark,
+)
+from app.frontend.components.charts import ChartFactory
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return generate_dataset(num_documents=300, num_queries=40, query_words=10, noise_words=0)
+
+
+def test_flat_index_finds_labelled_documents(dataset):
+    """Test that exact search ranks the source document highly for clean queries."""
+    result = evaluate_index(IndexConfig(name="flat", embedding_dim=512), dataset, k=10)
+
+    assert result.documents == 300
+    assert result.queries == 40
+    assert result.recall_at_k >= 0.8
+    assert 0.0 < result.mrr <= 1.0
+    assert result.p99_ms >= result.p50_ms > 0
+    assert result.index_bytes == 300 * 512 * 4
+
+
+def test_unknown_index_type_is_rejected(dataset):
+    """Test that an unregistered index type raises ValueError."""
+    with pytest.raises(ValueError):
+        evaluate_index(IndexConfig(name="x", index_type="missing"), dataset)
+
+
+def test_results_feed_the_comparison_chart(dataset):
+    """Test conversion to VectorStoreResult and the chart data built from it."""
+    configs = [IndexConfig(name="d64", embedding_dim=64), IndexConfig(name="d256")]
+    results = run_retrieval_benchmark(dataset, configs, k=5)
+    store_results = [result.to_vector_store_result() for result in results]
+
+    assert store_results[0].quality_score == results[0].recall_at_k
+    assert store_results[0].metrics["recall@5"] == results[0].recall_at_k
+    data = ChartFactory.vector_comparison_data(store_results)
+    assert data["stores"] == ["d64", "d256"]
+    assert len(data["relevance_scores"]) == len(data["retrieval_times"]) == 2
+
+
+def test_load_dataset(tmp_path):
+    """Test loading a labelled dataset from JSON."""
+    path = tmp_path / "dataset.json"
+    path.write_text(json.dumps({
+        "documents": [{"content": "alpha beta"}, {"content": "gamma delta", "metadata": {"a": 1}}],
+        "queries": [{"text": "gamma", "relevant_ids": [1]}],
+    }))
+    data = load_dataset(path)
+
+    assert data.texts == ["alpha beta", "gamma delta"]
+    assert data.metadatas[1] == {"a": 1}
+    result = evaluate_index(IndexConfig(name="flat"), data, k=1)
+    assert result.recall_at_k == 1.0 and result.mrr == 1.0
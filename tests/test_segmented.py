@@ -0,0 +1,214 @@
+"""
+Test updatable (segmented) vector stores and their crash recovery.
+"""
+
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.bench.corpus import generate_corpus
+from app.bench.runner import build_bench_app
+from app.cli import commands
+from app.core.config import get_config_manager
+from app.rag.vector_stores import (
+    WAL_FILE,
+    FlatVectorStore,
+    SegmentedVectorStore,
+    open_vector_store,
+)
+from app.rag.wal import WriteAheadLog
+from app.server.app import create_app
+
+TEXTS, METADATAS = generate_corpus(num_documents=200)
+
+
+@pytest.fixture
+def store(tmp_path):
+    flat = FlatVectorStore.from_texts("docs", TEXTS, METADATAS)
+    segmented = SegmentedVectorStore.from_flat(flat, tmp_path / "docs")
+    segmented.flush_rows = 20
+    yield segmented
+    segmented.close()
+
+
+def _keys(store, query, top_k=5, filters=None):
+    return [document.metadata["key"] for document in store.search(query, top_k, filters)]
+
+
+def _expected_keys(store, documents, query, top_k=5, filters=None):
+    """Search a flat store rebuilt from scratch from ``documents`` (key -> (text, metadata))."""
+    keys = list(documents)
+    flat = FlatVectorStore.from_texts(
+        "rebuilt", [documents[key][0] for key in keys], [documents[key][1] for key in keys]
+    )
+    ids, _ = flat.search_vectors(store.embedder.embed_query(query), top_k, filters)
+    return [keys[doc_id] for doc_id in ids.tolist()]
+
+
+def test_updates_match_a_rebuilt_store(store):
+    """Test that upserts, deletes, flushes and compaction give the rebuilt store's results."""
+    documents = {str(row): (text, metadata) for row, (text, metadata) in enumerate(zip(TEXTS, METADATAS, strict=True))}
+    for round_number in range(3):
+        replaced = [str(row) for row in range(round_number * 30, round_number * 30 + 25)]
+        texts = [f"updated alpha beta {key} round {round_number}" for key in replaced]
+        store.upsert(replaced, texts, [{"topic": 1} for _ in replaced])
+        documents.update({key: (text, {"topic": 1}) for key, text in zip(replaced, texts, strict=True)})
+        deleted = [str(row) for row in range(150 + round_number * 10, 155 + round_number * 10)]
+        assert store.delete(deleted + ["missing"]) == 5
+        for key in deleted:
+            documents.pop(key)
+
+    assert store.segment_count > 1
+    assert len(store) == len(documents)
+    for query, filters in [("updated alpha beta round 2", None), ("t1w1 t1w4 t1w9", {"topic": 1})]:
+        assert _keys(store, query, filters=filters) == _expected_keys(store, documents, query, filters=filters)
+
+    assert store.compact()
+    assert store.segment_count == 1
+    reopened = open_vector_store(store.path)
+    assert len(reopened) == len(documents)
+    assert _keys(reopened, "updated alpha beta round 1") == _expected_keys(
+        store, documents, "updated alpha beta round 1"
+    )
+
+
+def test_unflushed_updates_survive_a_crash(store):
+    """Test that logged updates are recovered by replaying the log."""
+    store.upsert(["new"], ["zeta eta theta"])
+    store.delete(["0", "1"])
+    # No close or flush: the next open sees only what reached the disk
+    recovered = open_vector_store(store.path)
+    assert len(recovered) == 199
+    assert _keys(recovered, "zeta eta theta", 1) == ["new"]
+    assert "0" not in _keys(recovered, TEXTS[0], 3)
+
+
+def test_torn_log_record_is_dropped(store):
+    """Test that a partially written record is ignored and cut off before the next write."""
+    store.upsert(["kept"], ["kappa lambda"])
+    store.close()
+    with open(store.path / WAL_FILE, "ab") as f:
+        f.write(b'0badc0de {"seq": 99, "op": "del')
+
+    recovered = open_vector_store(store.path)
+    assert _keys(recovered, "kappa lambda", 1) == ["kept"]
+    recovered.upsert(["after"], ["mu nu"])
+    recovered.close()
+
+    reopened = open_vector_store(store.path)
+    assert _keys(reopened, "mu nu", 1) == ["after"]
+    assert len(reopened) == 202
+
+
+def test_crash_during_flush_recovers_from_the_log(store, monkeypatch):
+    """Test a crash after writing a segment but before the manifest names it."""
+    def crash(self):
+        raise OSError("power loss")
+
+    store.upsert([f"n{i}" for i in range(5)], [f"omicron {i}" for i in range(5)])
+    monkeypatch.setattr(SegmentedVectorStore, "_write_store_manifest", crash)
+    with pytest.raises(OSError):
+        store.flush()
+    monkeypatch.undo()
+    store.close()
+
+    recovered = open_vector_store(store.path)
+    assert len(recovered) == 205 and recovered.segment_count == 1
+    recovered.upsert(["later"], ["pi rho"])
+    # The orphaned segment directory is removed once the store is written to
+    assert sorted(entry.name for entry in store.path.glob("seg-*")) == ["seg-000001"]
+    recovered.close()
+
+
+def test_crash_before_log_reset_applies_records_once(store, monkeypatch):
+    """Test a crash after the manifest update but before the log is emptied."""
+    store.upsert(["a", "b"], ["sigma tau", "upsilon phi"])
+    store.delete(["a", "5"])
+    monkeypatch.setattr(WriteAheadLog, "reset", lambda self: None)
+    store.flush()
+    monkeypatch.undo()
+    store.close()
+
+    recovered = open_vector_store(store.path)
+    assert recovered.segment_count == 2
+    assert len(recovered) == 200
+    assert _keys(recovered, "sigma tau", 1) != ["a"]
+
+
+def test_compaction_keeps_concurrent_updates_and_serves_reads(store, monkeypatch):
+    """Test that reads and writes proceed while the merged segment is being built."""
+    store.upsert([f"n{i}" for i in range(30)], [f"chi psi {i}" for i in range(30)])
+    store.delete(["3"])
+    merging = threading.Event()
+    release = threading.Event()
+    original_merge = SegmentedVectorStore._merge
+
+    def slow_merge(self, *args, **kwargs):
+        merging.set()
+        release.wait(5)
+        return original_merge(self, *args, **kwargs)
+
+    monkeypatch.setattr(SegmentedVectorStore, "_merge", slow_merge)
+    compaction = threading.Thread(target=store.compact)
+    compaction.start()
+    assert merging.wait(5)
+    assert _keys(store, "chi psi 7", 1) == ["n7"]
+    store.upsert(["n7"], ["omega replaced"])
+    store.delete(["n8", "4"])
+    release.set()
+    compaction.join(5)
+
+    assert store.segment_count == 1
+    assert len(store) == 200 + 30 - 3
+    assert _keys(store, "omega replaced", 1) == ["n7"]
+    assert "n8" not in _keys(store, "chi psi 8", 3)
+    reopened = open_vector_store(store.path)
+    assert len(reopened) == len(store)
+
+
+def test_one_writer_per_store(store):
+    """Test that a second instance cannot update a store that is being written."""
+    store.upsert(["x"], ["first writer"])
+    other = open_vector_store(store.path)
+    with pytest.raises(RuntimeError):
+        other.upsert(["y"], ["second writer"])
+    other.close()
+
+
+def test_document_update_endpoints(store, tmp_path, monkeypatch):
+    """Test upserts and deletes over HTTP, and that read-only stores reject them."""
+    store.close()
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    monkeypatch.setenv("AIS_VECTOR_STORE_PATH", str(tmp_path))
+    get_config_manager.cache_clear()
+    try:
+        with TestClient(create_app()) as client:
+            response = client.put(
+                "/api/rag/stores/docs/documents",
+                json={"documents": [{"key": "new", "content": "alpha omega", "metadata": {"lang": "en"}}]},
+            )
+            assert response.status_code == 200
+            assert response.json()["written"] == 1 and response.json()["documents"] == 201
+
+            response = client.post("/api/rag/stores/docs/documents/delete", json={"keys": ["new", "0"]})
+            assert response.json()["deleted"] == 2 and response.json()["documents"] == 199
+    finally:
+        get_config_manager.cache_clear()
+
+    response = TestClient(build_bench_app(num_documents=40)).post(
+        "/api/rag/stores/common/documents/delete", json={"keys": ["0"]}
+    )
+    assert response.status_code == 400
+
+
+def test_segment_command_swaps_in_the_converted_store(tmp_path):
+    """Test that `ais segment` replaces a flat store in place and leaves no siblings."""
+    path = tmp_path / "docs"
+    FlatVectorStore.from_texts("docs", TEXTS, METADATAS).save(path)
+    commands.segment_stores(stores=[str(path)], key_field="source")
+
+    converted = open_vector_store(path)
+    assert converted.format_name == SegmentedVectorStore.format_name
+    converted.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["docs"]
@@ -0,0 +1,68 @@
+"""
+Test the direct model response path.
+"""
+
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from app.api.models.responses import ProfileSummary
+from app.api.serialization import ModelResponse, iter_json_array
+from app.bench.serialization import (
+    build_payloads,
+    build_serialization_app,
+    measure_serialization,
+    validated_response,
+)
+
+
+def test_direct_path_matches_response_model_output():
+    """Test that ModelResponse renders the same bytes FastAPI would."""
+    payloads = asyncio.run(build_payloads(max_results=5))
+    client = TestClient(build_serialization_app(payloads))
+
+    for name in payloads:
+        validated = client.get(f"/validated/{name}")
+        direct = client.get(f"/direct/{name}")
+        assert direct.headers["content-type"] == "application/json"
+        assert json.loads(direct.content) == json.loads(validated.content), name
+
+
+def test_benchmark_times_the_response_fastapi_builds():
+    """Test that the benchmarked validated step renders what the route serves."""
+    payloads = asyncio.run(build_payloads(max_results=5))
+    app = build_serialization_app(payloads)
+    client = TestClient(app)
+    routes = {route.path: route for route in app.routes}
+
+    for name, (_, value, _) in payloads.items():
+        response = asyncio.run(validated_response(routes[f"/validated/{name}"], value))
+        assert json.loads(response.body) == json.loads(client.get(f"/validated/{name}").content)
+
+    results = asyncio.run(measure_serialization(requests=5, rounds=1))
+    assert [result.name for result in results] == list(payloads)
+    assert all(result.validated_ms >= 0 and result.direct_ms >= 0 for result in results)
+
+
+def test_json_array_is_streamed_in_chunks():
+    """Test that chunked arrays are valid JSON for empty, partial and full chunks."""
+    items = [
+        ProfileSummary(
+            id=i, method="GET", path="/", status_code=200, trigger="header",
+            started_at=0.0, duration=0.1, samples=i,
+        )
+        for i in range(5)
+    ]
+    for count in (0, 1, 2, 5):
+        chunks = list(iter_json_array(items[:count], chunk_size=2))
+        assert len(chunks) == 2 + (count + 1) // 2
+        assert json.loads(b"".join(chunks)) == [item.model_dump() for item in items[:count]]
+
+
+def test_model_response_keeps_status_code():
+    """Test that status codes pass through, as used by the health endpoint."""
+    response = ModelResponse({"status": "degraded"}, status_code=503)
+
+    assert response.status_code == 503
+    assert response.body == b'{"status":"degraded"}'
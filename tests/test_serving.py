@@ -0,0 +1,164 @@
+"""
+Test the `ais run` serving modes.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+import typer
+import uvicorn
+
+from app.cli import commands
+
+
+@pytest.fixture
+def uvicorn_calls(monkeypatch):
+    """Capture uvicorn.run calls instead of starting a server."""
+    calls = []
+    monkeypatch.setattr(
+        uvicorn, "run", lambda app, **kwargs: calls.append((app, kwargs))
+    )
+    return calls
+
+
+def test_single_worker_uses_app_object(uvicorn_calls):
+    """Test that the default mode serves an app object in-process."""
+    commands.run_server(host="127.0.0.1", port=8000, debug=False, reload=False)
+
+    app, kwargs = uvicorn_calls[0]
+    assert not isinstance(app, str)
+    assert "workers" not in kwargs
+    assert kwargs["loop"] == "auto"
+    assert kwargs["timeout_graceful_shutdown"] == 30
+
+
+def test_multi_worker_uses_factory_and_fast_implementations(uvicorn_calls):
+    """Test that production mode preforks workers with explicit loop/http."""
+    commands.run_server(
+        host="127.0.0.1", port=8000, debug=False, reload=False,
+        workers=4, graceful_timeout=5,
+    )
+
+    app, kwargs = uvicorn_calls[0]
+    assert app == "app.server.app:create_app"
+    assert kwargs["factory"] is True
+    assert kwargs["workers"] == 4
+    assert kwargs["loop"] in ("uvloop", "asyncio")
+    assert kwargs["http"] in ("httptools", "h11")
+    assert kwargs["timeout_graceful_shutdown"] == 5
+
+
+def test_invalid_worker_options_exit(uvicorn_calls):
+    """Test that conflicting or unknown options are rejected."""
+    with pytest.raises(typer.Exit):
+        commands.run_server(
+            host="127.0.0.1", port=8000, debug=False, reload=True, workers=2
+        )
+    with pytest.raises(typer.Exit):
+        commands.run_server(
+            host="127.0.0.1", port=8000, debug=False, reload=False, loop="trio"
+        )
+    assert uvicorn_calls == []
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _measure_throughput(workers: int, duration: float = 3.0) -> float:
+    """Start `ais run` with the given worker count and return requests/second."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "app.main", "run",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}/api/developer"
+    try:
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline:
+            try:
+                httpx.get(url, timeout=1.0)
+                break
+            except httpx.TransportError:
+                time.sleep(0.2)
+
+        count = 0
+        lock = threading.Lock()
+        stop_at = time.monotonic() + duration
+
+        def client() -> None:
+            nonlocal count
+            with httpx.Client(timeout=5.0) as http:
+                while time.monotonic() < stop_at:
+                    http.get(url)
+                    with lock:
+                        count += 1
+
+        threads = [threading.Thread(target=client) for _ in range(workers * 4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return count / duration
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+@pytest.mark.slow
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason="needs at least 4 cores")
+def test_throughput_scales_with_workers():
+    """Load test: two workers should serve clearly more than one."""
+    single = _measure_throughput(workers=1)
+    double = _measure_throughput(workers=2)
+    assert double > single * 1.3, f"1 worker: {single:.0f} rps, 2 workers: {double:.0f} rps"
+
+
+def test_profile_option_reaches_workers_through_environment(monkeypatch):
+    """Test that --profile is passed on to (preforked) workers via AIS_* variables."""
+    monkeypatch.delenv("AIS_PROFILING_ENABLED", raising=False)
+    monkeypatch.setenv("AIS_PROFILE_SAMPLE_RATE", "0.5")
+    environments = []
+    monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: environments.append(dict(os.environ)))
+    commands.run_server(
+        host="127.0.0.1", port=8000, debug=False, reload=False,
+        workers=2, profile=True, profile_sample_rate=0.05,
+    )
+
+    assert environments[0]["AIS_PROFILING_ENABLED"] == "true"
+    assert environments[0]["AIS_PROFILE_SAMPLE_RATE"] == "0.05"
+    # The caller's environment is left as it was
+    assert "AIS_PROFILING_ENABLED" not in os.environ
+    assert os.environ["AIS_PROFILE_SAMPLE_RATE"] == "0.5"
+
+
+def test_profiling_a_shared_server_requires_a_token(uvicorn_calls, tmp_path, monkeypatch):
+    """Test that --profile off the loopback interface needs a profile token."""
+    from app.core.config import get_config_manager
+
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    monkeypatch.delenv("AIS_PROFILE_TOKEN", raising=False)
+    get_config_manager.cache_clear()
+    try:
+        with pytest.raises(typer.Exit):
+            commands.run_server(host="0.0.0.0", port=8000, debug=False, reload=False, profile=True)
+        assert uvicorn_calls == []
+
+        monkeypatch.setenv("AIS_PROFILE_TOKEN", "s3cret")
+        get_config_manager.cache_clear()
+        commands.run_server(host="0.0.0.0", port=8000, debug=False, reload=False, profile=True)
+        assert len(uvicorn_calls) == 1
+    finally:
+        get_config_manager.cache_clear()
@@ -0,0 +1,169 @@
+"""
+Test sharded vector search across a process pool.
+"""
+
+import json
+import os
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from app.bench.corpus import generate_corpus
+from app.models.base import Configuration
+from app.models.manager import ModelManager
+from app.rag import sharded as sharded_module
+from app.rag.chunk_store import ChunkStore
+from app.rag.engine import RAGEngine
+from app.rag.sharded import SearchPool, ShardedVectorStore
+from app.rag.vector_stores import (
+    FlatVectorStore,
+    QuantizedVectorStore,
+    open_vector_store,
+)
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SearchPool(2)
+    pool.warm_up()
+    yield pool
+    pool.close()
+
+
+@pytest.fixture(scope="module")
+def flat_store():
+    texts, metadatas = generate_corpus(num_documents=1200)
+    return FlatVectorStore.from_texts("store", texts, metadatas)
+
+
+def _assert_same_results(flat, sharded, queries, top_k=10, filters=None):
+    for query in queries:
+        vector = flat.embedder.embed([query])[0]
+        expected_ids, expected_scores = flat.search_vectors(vector, top_k, filters)
+        ids, scores = sharded.search_vectors(vector, top_k, filters)
+        assert ids.tolist() == expected_ids.tolist()
+        np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_shared_memory_segments_match_flat_search(flat_store, pool):
+    """Test that an in-memory store searched in shards returns the flat results."""
+    sharded = ShardedVectorStore(flat_store, pool, shards=3)
+    try:
+        assert {spec.source for spec in sharded.segments} == {"shm"}
+        assert sum(spec.rows for spec in sharded.segments) == len(flat_store)
+        queries = [flat_store.chunks.text(index) for index in range(0, 1200, 97)]
+        _assert_same_results(flat_store, sharded, queries)
+        _assert_same_results(flat_store, sharded, queries, filters={"topic": 3})
+        assert len(sharded.search_vectors(flat_store.embedder.embed(["x"])[0], 5, {"topic": -1})[0]) == 0
+    finally:
+        sharded.close()
+
+
+def test_saved_store_shards_map_the_vector_file(flat_store, pool, tmp_path):
+    """Test that a store opened from disk is sharded without copying its vectors."""
+    flat_store.save(tmp_path / "store")
+    opened = open_vector_store(tmp_path / "store")
+    sharded = ShardedVectorStore(opened, pool)
+    try:
+        assert {spec.source for spec in sharded.segments} == {"file"}
+        assert sharded.index_nbytes() == opened.index_nbytes()
+        queries = [flat_store.chunks.text(index) for index in range(5, 1200, 131)]
+        _assert_same_results(opened, sharded, queries)
+        assert sharded.search("topic words", top_k=3) == opened.search("topic words", top_k=3)
+    finally:
+        sharded.close()
+
+
+def test_close_releases_shared_memory(flat_store, pool):
+    """Test that closing a sharded store unlinks its shared memory blocks."""
+    sharded = ShardedVectorStore(flat_store, pool, shards=2)
+    names = [spec.name for spec in sharded.segments]
+    sharded.close()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
+
+
+def test_load_reshards_the_saved_store(flat_store, pool, tmp_path):
+    """Test that load opens a saved flat store sharded, and refuses other formats."""
+    flat_store.save(tmp_path / "store")
+    manifest = json.loads((tmp_path / "store" / "manifest.json").read_text())
+    sharded = ShardedVectorStore.load(tmp_path / "store", manifest, pool, shards=3)
+    try:
+        assert len(sharded.segments) == 3 and {spec.source for spec in sharded.segments} == {"file"}
+        _assert_same_results(flat_store, sharded, [flat_store.chunks.text(index) for index in (0, 600)])
+    finally:
+        sharded.close()
+
+    QuantizedVectorStore.from_flat(flat_store, "int8").save(tmp_path / "quantized")
+    manifest = json.loads((tmp_path / "quantized" / "manifest.json").read_text())
+    with pytest.raises(ValueError):
+        ShardedVectorStore.load(tmp_path / "quantized", manifest, pool)
+
+
+def test_attached_segments_are_released_by_newer_generations(flat_store, pool, tmp_path, monkeypatch):
+    """Test that a worker's cache drops re-sharded stores' segments and stays bounded."""
+    flat_store.save(tmp_path / "store")
+    opened = open_vector_store(tmp_path / "store")
+    first = ShardedVectorStore(opened, pool, shards=2)
+    second = ShardedVectorStore(opened, pool, shards=2)
+    attached = sharded_module._ATTACHED
+    try:
+        for spec in first.segments:
+            sharded_module._attach(spec)
+        assert all(spec in attached for spec in first.segments)
+
+        sharded_module._attach(second.segments[0])
+        assert not any(spec in attached for spec in first.segments)
+        # An older generation attached later does not evict the newer one
+        sharded_module._attach(first.segments[0])
+        assert second.segments[0] in attached
+
+        monkeypatch.setattr(sharded_module, "MAX_ATTACHED", 1)
+        sharded_module._attach(second.segments[1])
+        assert list(attached) == [second.segments[1]]
+    finally:
+        for spec in list(attached):
+            sharded_module._release(spec)
+        first.close()
+        second.close()
+
+
+def test_engine_shards_flat_stores_when_configured(flat_store, tmp_path):
+    """Test that search_shards > 1 wraps flat stores and close stops the pool."""
+    flat_store.save(tmp_path / "stores" / "docs")
+    config = Configuration(vector_store_path=str(tmp_path / "stores"), search_shards=2)
+    engine = RAGEngine.from_config(config, ModelManager({}))
+    try:
+        assert isinstance(engine.vector_stores["docs"], ShardedVectorStore)
+        assert engine.search_pool is not None
+    finally:
+        engine.close()
+
+
+@pytest.mark.slow
+@pytest.mark.skipif((os.cpu_count() or 1) < 4, reason="needs at least 4 cores")
+def test_throughput_scales_with_shards():
+    """Load test: four shards should search a large store clearly faster than one process."""
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((400_000, 256)).astype(np.float32)
+    flat = FlatVectorStore("large", vectors, ChunkStore.from_records([""] * len(vectors)), None)
+    queries = rng.standard_normal((50, 256)).astype(np.float32)
+
+    def qps(store) -> float:
+        start_time = time.perf_counter()
+        for query in queries:
+            store.search_vectors(query, 10)
+        return len(queries) / (time.perf_counter() - start_time)
+
+    pool = SearchPool(4)
+    pool.warm_up()
+    sharded = ShardedVectorStore(flat, pool)
+    try:
+        sharded.search_vectors(queries[0], 10)
+        assert qps(sharded) > qps(flat) * 1.5
+    finally:
+        sharded.close()
+        pool.close()
@@ -0,0 +1,87 @@
+"""
+Test CLI startup cost with `python -X importtime`.
+
+Lightweight commands must not import the web stack, and their total import
+time must stay under a budget. Budgets can be overridden on slow machines
+with the AIS_IMPORT_BUDGET_SCALE environment variable (e.g. ``2.0``).
+"""
+
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import pytest
+
+# Total import time budget per command, in milliseconds
+IMPORT_BUDGETS_MS = {
+    "version": 400,
+    "config --show": 600,
+    "--help": 800,
+}
+
+# Modules that only `ais run` (or a route) should ever pull in
+HEAVY_MODULES = ["uvicorn", "fastapi", "fastui", "plotly", "app.server", "app.frontend"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def record_imports(args: List[str]) -> List[Tuple[str, int, int]]:
+    """
+    Run `ais <args>` under -X importtime.
+
+    Returns:
+        List[Tuple[str, int, int]]: (module name, cumulative import time in
+        microseconds, nesting depth) for every import, nested ones included;
+        depth 0 is a top-level import
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         f"from app.main import app; app({args!r})"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            # Each nesting level indents the module name by two more spaces
+            depth = (len(match.group(3)) - 1) // 2
+            imports.append((match.group(4), int(match.group(2)), depth))
+    return imports
+
+
+def record_import_times(args: List[str]) -> Dict[str, int]:
+    """Cumulative import time in microseconds per top-level import."""
+    return {name: cumulative for name, cumulative, depth in record_imports(args) if depth == 0}
+
+
+@pytest.mark.parametrize("command", list(IMPORT_BUDGETS_MS))
+def test_command_skips_web_stack(command):
+    """Test that lightweight commands never import the web stack."""
+    imports = record_imports(command.split())
+    assert imports, "no -X importtime output recorded"
+
+    # Checked at every depth: a heavy module pulled in by a nested import
+    # costs as much as a direct one
+    heavy = [
+        name for name, _, _ in imports
+        if any(name == module or name.startswith(module + ".") for module in HEAVY_MODULES)
+    ]
+    assert heavy == []
+
+
+@pytest.mark.parametrize("command,budget_ms", list(IMPORT_BUDGETS_MS.items()))
+def test_command_import_time_budget(command, budget_ms):
+    """Test that lightweight commands start within their import-time budget."""
+    budget_ms *= float(os.environ.get("AIS_IMPORT_BUDGET_SCALE", "1.0"))
+    timings = record_import_times(command.split())
+
+    total_ms = sum(timings.values()) / 1000
+    slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:5]
+    assert total_ms <= budget_ms, (
+        f"`ais {command}` imports took {total_ms:.0f} ms (budget {budget_ms:.0f} ms); "
+        f"slowest: {', '.join(f'{name}={us / 1000:.0f}ms' for name, us in slowest)}"
+    )
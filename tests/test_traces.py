@@ -0,0 +1,180 @@
+"""
+Test the persistent trace store.
+"""
+
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.models.responses import ExecutionStep, ExecutionTrace, MCPCall
+from app.bench.runner import build_bench_app
+from app.core.config import get_config_manager
+from app.server.traces import INDEX_SUFFIX, TraceStore
+
+HOUR = 3600.0
+# Three hours ago, on a whole second
+BASE = float(int(time.time()) - 3 * 3600)
+
+
+def _trace(calls, success=True):
+    """A trace with one step and ``calls`` as (tool, execution time) pairs."""
+    return ExecutionTrace(
+        steps=[
+            ExecutionStep(
+                step_id="1-retrieval",
+                step_type="retrieval",
+                description="Search",
+                timestamp=BASE,
+                duration=0.01,
+                success=success,
+            )
+        ],
+        mcp_calls=[
+            MCPCall(tool_name=tool, parameters={"q": tool}, result={}, execution_time=duration, success=True)
+            for tool, duration in calls
+        ],
+        total_time=0.1,
+        success=success,
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TraceStore(tmp_path / "traces", segment_seconds=HOUR, retention=24 * HOUR)
+    # Three hours of traffic, one segment per hour
+    for hour in range(3):
+        for minute in range(0, 60, 10):
+            timestamp = BASE + hour * HOUR + minute * 60
+            calls = [("search", hour + minute / 100), ("fetch", 0.5)]
+            store.append(f"/api/rag/query/{hour}", _trace(calls, success=minute != 30), timestamp)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def reads(store, monkeypatch):
+    """Record which segments had their index or records read."""
+    reads = {"index": [], "records": 0}
+    read_index, read_records = TraceStore._read_index, TraceStore._read_records
+
+    def counting_index(segment):
+        reads["index"].append(segment.start)
+        return read_index(segment)
+
+    def counting_records(self, segment, entries):
+        reads["records"] += len(entries)
+        return read_records(self, segment, entries)
+
+    monkeypatch.setattr(TraceStore, "_read_index", staticmethod(counting_index))
+    monkeypatch.setattr(TraceStore, "_read_records", counting_records)
+    return reads
+
+
+def test_queries_filter_by_time_tool_and_success(store):
+    """Test that traces round-trip and the filters select the right ones."""
+    assert len(store.segments()) == 3
+    everything = store.query(limit=1000)
+    assert len(everything) == 18
+    assert everything[0].timestamp == BASE + 2 * HOUR + 50 * 60
+    assert everything[0].trace.mcp_calls[0].tool_name == "search"
+
+    failed = store.query(success=False)
+    assert [stored.path for stored in failed] == ["/api/rag/query/2", "/api/rag/query/1", "/api/rag/query/0"]
+    assert store.query(tool="missing") == []
+    window = store.query(since=BASE + HOUR, until=BASE + HOUR + 25 * 60)
+    assert [stored.timestamp for stored in window] == [BASE + HOUR + m * 60 for m in (20, 10, 0)]
+
+
+def test_last_hour_reads_only_the_last_segment(store, reads):
+    """Test that a time-bounded query skips older segments and reads only its records."""
+    since = BASE + 2 * HOUR
+    calls = store.slowest_calls("search", since=since, limit=2)
+
+    assert [call.execution_time for call in calls] == [2.5, 2.4]
+    assert all(call.timestamp >= since and call.path == "/api/rag/query/2" for call in calls)
+    assert reads["index"] == [since]
+    assert reads["records"] == 2
+
+
+def test_query_merges_overlapping_segments_of_other_writers(tmp_path, monkeypatch):
+    """Test that the newest traces are found when the segments of two workers overlap."""
+    monkeypatch.setattr("app.server.traces.os.getpid", lambda: 1001)
+    first = TraceStore(tmp_path, segment_seconds=HOUR)
+    first.append("/early", _trace([]), BASE)
+    monkeypatch.setattr("app.server.traces.os.getpid", lambda: 1002)
+    second = TraceStore(tmp_path, segment_seconds=HOUR)
+    # Starts (and ends) after the first worker's segment but holds older traces
+    second.append("/b", _trace([]), BASE + 1800)
+    first.append("/a", _trace([]), BASE + 3000)
+    first.close()
+    second.close()
+
+    assert len(first.segments()) == 2
+    assert [stored.path for stored in first.query(limit=1)] == ["/a"]
+    assert [stored.path for stored in first.query(limit=2)] == ["/a", "/b"]
+    assert [stored.path for stored in first.query(until=BASE + 2000)] == ["/b", "/early"]
+
+
+def test_rotation_and_retention(tmp_path):
+    """Test size-based rotation and that expired segments are deleted."""
+    now = time.time()
+    store = TraceStore(tmp_path, segment_seconds=HOUR, segment_bytes=1, retention=HOUR)
+    store.append("/a", _trace([]), now)
+    store.append("/b", _trace([]), now + 1)
+    assert len(store.segments()) == 2
+
+    store.append("/c", _trace([]), now + 3 * HOUR)
+    store.close()
+    # Segments that ended more than an hour before the newest one are gone
+    assert store.enforce_retention(now=now + 3 * HOUR) == 2
+    assert [stored.path for stored in store.query()] == ["/c"]
+
+
+def test_torn_appends_are_ignored(store):
+    """Test that a partially written index line and record are skipped."""
+    store.close()
+    newest = store.segments()[-1].path
+    with open(newest, "ab") as f:
+        f.write(b"\x00\x00\x01\x00torn")
+    with open(newest.with_suffix(INDEX_SUFFIX), "a") as f:
+        f.write(f'[{BASE + 2 * HOUR},9999,256,true,[["sea')
+
+    assert len(store.query(limit=1000)) == 18
+    store.append("/after", _trace([("search", 9.0)]), BASE + 2 * HOUR + 55 * 60)
+    assert store.slowest_calls("search", limit=1)[0].path == "/after"
+
+
+def test_requests_are_traced_when_enabled(tmp_path, monkeypatch):
+    """Test that API requests append their traces and the developer endpoints query them."""
+    monkeypatch.setenv("AIS_CONFIG_DIR", str(tmp_path))
+    client = TestClient(build_bench_app(num_documents=40))
+    assert client.get("/api/developer/traces").status_code == 404
+
+    monkeypatch.setenv("AIS_TRACES_ENABLED", "true")
+    monkeypatch.setenv("AIS_TRACE_STORE_PATH", str(tmp_path / "traces"))
+    appended_on = []
+    append = TraceStore.append
+
+    def recording_append(self, path, trace, timestamp=None):
+        appended_on.append(threading.current_thread())
+        append(self, path, trace, timestamp)
+
+    monkeypatch.setattr(TraceStore, "append", recording_append)
+    get_config_manager.cache_clear()
+    try:
+        with TestClient(build_bench_app(num_documents=40)) as client:
+            loop_thread = client.portal.call(threading.current_thread)
+            client.post("/api/rag/query", json={"query": "t1w1"})
+            client.get("/api/")
+            traces = client.get("/api/developer/traces").json()
+            calls = client.get("/api/developer/traces/slowest-calls", params={"tool": "search"}).json()
+    finally:
+        get_config_manager.cache_clear()
+
+    assert [stored["path"] for stored in traces] == ["/api/rag/query"]
+    assert [step["step_type"] for step in traces[0]["trace"]["steps"]] == ["retrieval", "context", "generation"]
+    assert calls == []
+    # Appended off the event loop
+    assert appended_on and loop_thread not in appended_on